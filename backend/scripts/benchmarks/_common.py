@@ -0,0 +1,82 @@
+"""
+Shared helpers for the NewsHub ingestion benchmarks
+"""
+
+import importlib.util
+import sqlite3
+import sys
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent
+# feed-parser.py imports its sibling modules by name
+if str(SCRIPTS_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+# Mirrors the tables TypeORM synchronises for the entities the parser touches
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS categories (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name varchar NOT NULL,
+    slug varchar NOT NULL UNIQUE,
+    description varchar,
+    color varchar NOT NULL DEFAULT '#3B82F6',
+    priority integer NOT NULL DEFAULT 0,
+    isActive boolean NOT NULL DEFAULT 1,
+    createdAt datetime NOT NULL DEFAULT (datetime('now')),
+    updatedAt datetime NOT NULL DEFAULT (datetime('now'))
+);
+CREATE TABLE IF NOT EXISTS feeds (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name varchar NOT NULL,
+    url varchar NOT NULL UNIQUE,
+    description varchar,
+    isActive boolean NOT NULL DEFAULT 1,
+    lastFetched datetime,
+    fetchCount integer NOT NULL DEFAULT 0,
+    errorCount integer NOT NULL DEFAULT 0,
+    lastError varchar,
+    fetchIntervalMinutes integer NOT NULL DEFAULT 30,
+    createdAt datetime NOT NULL DEFAULT (datetime('now')),
+    updatedAt datetime NOT NULL DEFAULT (datetime('now')),
+    categoryId integer NOT NULL
+);
+CREATE TABLE IF NOT EXISTS articles (
+    id varchar PRIMARY KEY NOT NULL,
+    title varchar NOT NULL,
+    description text,
+    content text,
+    url varchar NOT NULL UNIQUE,
+    imageUrl varchar,
+    author varchar,
+    publishedAt datetime,
+    viewCount integer NOT NULL DEFAULT 0,
+    bookmarkCount integer NOT NULL DEFAULT 0,
+    tags text,
+    isActive boolean NOT NULL DEFAULT 1,
+    createdAt datetime NOT NULL DEFAULT (datetime('now')),
+    updatedAt datetime NOT NULL DEFAULT (datetime('now')),
+    feedId integer NOT NULL,
+    categoryId integer NOT NULL
+);
+CREATE INDEX IF NOT EXISTS IDX_articles_publishedAt ON articles (publishedAt);
+CREATE INDEX IF NOT EXISTS IDX_articles_createdAt ON articles (createdAt);
+"""
+
+
+def load_feed_parser():
+    """Import feed-parser.py, whose file name is not a valid module name"""
+    if 'feed_parser' in sys.modules:
+        return sys.modules['feed_parser']
+    spec = importlib.util.spec_from_file_location('feed_parser', SCRIPTS_DIR / 'feed-parser.py')
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['feed_parser'] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def create_database(db_path: str):
+    """Create an empty NewsHub schema at db_path"""
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA)
+    conn.commit()
+    conn.close()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark HTML cleaning: the old regex + str.replace cleaner versus text_cleaning
+
+Usage: python scripts/benchmarks/bench_clean_html.py [--corpus DIR] [--repeat 20]
+
+--corpus points at a directory of saved feed documents (*.xml, e.g. fetched with
+curl); without it a synthetic corpus with WordPress-sized content:encoded bodies
+is used. Each entry's title, description and content are cleaned the way
+normalise_entry does: legacy cleans everything and truncates afterwards, the
+new cleaner stops at the kept length.
+"""
+
+import argparse
+import json
+import re
+import time
+from pathlib import Path
+
+import feedparser
+
+from _common import SCRIPTS_DIR  # noqa: F401 (puts the scripts directory on sys.path)
+from text_cleaning import html_to_text
+
+# A news-style paragraph: a curly apostrophe, a link with an escaped query string, emphasis
+PARAGRAPH = ('<p>The council&#8217;s new plan, published on Tuesday, sets out how the city will cut emissions '
+             'by 2030. It covers <a href="https://example.com/plan?id=4&amp;src=rss">transport, housing and '
+             'energy</a>, and officials say the first projects will start <em>this year</em>. Critics argue '
+             'the timetable is too slow and that funding has not been secured.</p>\n')
+
+# (field, kept length) as in normalise_entry
+FIELDS = (('title', 500), ('description', 1000), ('content', 5000))
+
+
+def synthetic_corpus(entries: int, paragraphs: int) -> list:
+    items = []
+    for i in range(entries):
+        body = PARAGRAPH * paragraphs
+        items.append(
+            f'<item><title>Story {i} &#8211; what&#8217;s next</title><link>https://example.com/{i}</link>'
+            f'<description><![CDATA[{PARAGRAPH * 3}]]></description>'
+            f'<content:encoded><![CDATA[{body}]]></content:encoded></item>'
+        )
+    document = (
+        '<?xml version="1.0"?><rss version="2.0" '
+        'xmlns:content="http://purl.org/rss/1.0/modules/content/"><channel><title>Bench</title>'
+        + ''.join(items) + '</channel></rss>'
+    )
+    return entry_fields(feedparser.parse(document).entries)
+
+
+def saved_corpus(directory: str) -> list:
+    entries = []
+    for path in sorted(Path(directory).glob('*.xml')):
+        entries.extend(feedparser.parse(path.read_bytes()).entries)
+    return entry_fields(entries)
+
+
+def entry_fields(entries: list) -> list:
+    """(title, description, content) strings per entry"""
+    corpus = []
+    for entry in entries:
+        content = entry.content[0].get('value', '') if 'content' in entry else entry.get('summary', '')
+        corpus.append((entry.get('title', ''), entry.get('description', ''), content))
+    return corpus
+
+
+def legacy_clean_html(text: str) -> str:
+    """The cleaner as it was inlined in RSSParser before text_cleaning existed"""
+    if not text:
+        return ""
+    clean = re.sub(r'<[^>]+>', '', text)
+    clean = clean.replace('&amp;', '&')
+    clean = clean.replace('&lt;', '<')
+    clean = clean.replace('&gt;', '>')
+    clean = clean.replace('&quot;', '"')
+    clean = clean.replace('&#39;', "'")
+    clean = clean.replace('&nbsp;', ' ')
+    return clean.strip()
+
+
+def legacy(corpus: list):
+    for fields in corpus:
+        for text, (_, limit) in zip(fields, FIELDS):
+            legacy_clean_html(text)[:limit]
+
+
+def bounded(corpus: list):
+    for fields in corpus:
+        for text, (_, limit) in zip(fields, FIELDS):
+            html_to_text(text, limit)
+
+
+def unbounded(corpus: list):
+    for fields in corpus:
+        for text, (_, limit) in zip(fields, FIELDS):
+            html_to_text(text)[:limit]
+
+
+def bench(clean, corpus: list, repeat: int) -> dict:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        clean(corpus)
+    elapsed = time.perf_counter() - start
+    calls = len(corpus) * repeat
+    return {'entries_per_sec': round(calls / elapsed, 1),
+            'usec_per_entry': round(elapsed / calls * 1e6, 2)}
+
+
+def leaked_entities(clean, corpus: list) -> int:
+    """Entries whose cleaned text still contains an HTML entity"""
+    entity = re.compile(r'&(#[0-9]+|#x[0-9a-f]+|[a-z]+);', re.IGNORECASE)
+    return sum(1 for fields in corpus if any(entity.search(clean(text)) for text in fields))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='HTML cleaning micro-benchmark')
+    parser.add_argument('--corpus', help='Directory of saved feed documents (*.xml)')
+    parser.add_argument('--entries', type=int, default=300, help='Synthetic corpus size')
+    parser.add_argument('--paragraphs', type=int, default=40, help='Paragraphs per synthetic content body')
+    parser.add_argument('--repeat', type=int, default=20, help='Passes over the corpus')
+    args = parser.parse_args()
+
+    corpus = saved_corpus(args.corpus) if args.corpus else synthetic_corpus(args.entries, args.paragraphs)
+    results = {
+        'entries': len(corpus),
+        'mean_input_chars': round(sum(map(len, (t for f in corpus for t in f))) / max(len(corpus), 1)),
+        'legacy': bench(legacy, corpus, args.repeat),
+        'text_cleaning_unbounded': bench(unbounded, corpus, args.repeat),
+        'text_cleaning_bounded': bench(bounded, corpus, args.repeat),
+        'entries_with_leaked_entities': {
+            'legacy': leaked_entities(legacy_clean_html, corpus),
+            'text_cleaning': leaked_entities(html_to_text, corpus),
+        },
+    }
+    results['speedup'] = round(
+        results['text_cleaning_bounded']['entries_per_sec'] / results['legacy']['entries_per_sec'], 2
+    )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Bulk feed import: OPML import speed, validation throughput and feed memory
+
+Usage: python scripts/benchmarks/bench_feed_import.py [--feeds 10000] [--validate 1000]
+
+Writes an OPML file of --feeds feeds in 20 folders, with one in ten listed
+twice under another URL spelling, and imports it into an empty database twice:
+first into empty tables, then again when every feed is already stored. Then it
+measures what the parser's active feed list costs in memory as FeedRecords
+against the dicts it used to build. With --validate N, it also starts the
+fixture server and validates N feeds, one in five of them HTML pages.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from xml.sax.saxutils import quoteattr
+
+from _common import create_database, load_feed_parser
+from feed_import import FeedImporter, FeedValidator, read_opml
+from fixture_server import FixtureConfig, run_server
+
+feed_parser = load_feed_parser()
+
+DICT_KEYS = ('id', 'name', 'url', 'category_id', 'interval', 'etag', 'last_modified',
+             'content_hash', 'error_count', 'last_fetched')
+
+
+def write_opml(path: Path, feeds: int):
+    with open(path, 'w') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<opml version="2.0"><head><title>Bench</title></head><body>\n')
+        for folder in range(20):
+            f.write(f'<outline text="Folder {folder}">\n')
+            for feed in range(folder, feeds, 20):
+                url = f'https://feeds{feed % 97}.example.com/rss/{feed}?format=xml'
+                f.write(f'<outline type="rss" text="Feed {feed}" xmlUrl={quoteattr(url)}/>\n')
+                if feed % 10 == 0:
+                    # The same feed over http, with www. and a tracking parameter
+                    alias = url.replace('https://', 'http://www.') + '&utm_source=opml'
+                    f.write(f'<outline type="rss" text="Feed {feed} again" xmlUrl={quoteattr(alias)}/>\n')
+            f.write('</outline>\n')
+        f.write('</body></opml>\n')
+
+
+def timed_import(db_path: str, opml: Path) -> dict:
+    conn = sqlite3.connect(db_path)
+    stats = FeedImporter(conn).run(read_opml(str(opml)))
+    conn.close()
+    return {'seconds': stats.seconds, 'feeds_per_second': round(stats.read / max(stats.seconds, 1e-9)),
+            'inserted': stats.inserted, 'existing': stats.existing, 'duplicates': stats.duplicates}
+
+
+def traced_mb(build) -> tuple:
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, round(current / 1e6, 2)
+
+
+def bench_feed_memory(db_path: str) -> dict:
+    """Memory held by the active feed list beyond the row values, which both share"""
+    rss_parser = feed_parser.RSSParser(db_path, parse_workers=0)
+    rows = rss_parser.store.conn.execute(
+        f"SELECT {', '.join(feed_parser.FEED_COLUMNS)} FROM feeds f WHERE f.isActive = 1").fetchall()
+    rss_parser.store.close()
+    records, records_mb = traced_mb(lambda: [feed_parser.FeedRecord(*row) for row in rows])
+    dicts, dicts_mb = traced_mb(lambda: [dict(zip(DICT_KEYS, row)) for row in rows])
+    return {'feeds': len(records), 'feed_records_mb': records_mb, 'dicts_mb': dicts_mb}
+
+
+def bench_validation(count: int, port: int) -> dict:
+    config = FixtureConfig(entries=20, latency_ms=20.0)
+    context = multiprocessing.get_context('spawn')
+    ready = context.Event()
+    server = context.Process(target=run_server, args=(config, ['127.0.0.1'], port, ready), daemon=True)
+    server.start()
+    try:
+        if not ready.wait(timeout=30):
+            raise RuntimeError('Fixture server did not start')
+        base = f'http://127.0.0.1:{port}'
+        urls = [f'{base}/article/0/{i}' if i % 5 == 0 else f'{base}/feed/{i}' for i in range(count)]
+        validator = FeedValidator(concurrency=50, per_host_limit=50)
+        start = time.perf_counter()
+        errors = asyncio.run(validator.validate(urls))
+        seconds = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.join()
+    return {'feeds': count, 'seconds': round(seconds, 3), 'feeds_per_second': round(count / seconds),
+            'invalid': sum(error is not None for error in errors), 'expected_invalid': len(range(0, count, 5))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Feed import benchmark')
+    parser.add_argument('--feeds', type=int, default=10000, help='Distinct feeds in the OPML file')
+    parser.add_argument('--validate', type=int, default=0, help='Feeds to validate against the fixture server')
+    parser.add_argument('--port', type=int, default=8733, help='Fixture server port')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        opml = Path(tmp) / 'feeds.opml'
+        db_path = str(Path(tmp) / 'bench.sqlite')
+        write_opml(opml, args.feeds)
+        create_database(db_path)
+        results = {
+            'opml_bytes': opml.stat().st_size,
+            'first_import': timed_import(db_path, opml),
+            'reimport': timed_import(db_path, opml),
+            'active_feeds_memory': bench_feed_memory(db_path),
+        }
+    if args.validate:
+        results['validation'] = bench_validation(args.validate, args.port)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
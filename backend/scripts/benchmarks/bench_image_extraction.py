@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark entry image extraction: the old inline extractor versus image_extraction
+
+Usage: python scripts/benchmarks/bench_image_extraction.py [--corpus DIR] [--repeat 20]
+
+--corpus points at a directory of saved feed documents (*.xml, e.g. fetched with
+curl); without it a synthetic corpus mixing the common entry shapes is used.
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+from pathlib import Path
+from urllib.parse import urljoin
+
+import feedparser
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from image_extraction import extract_entry_image, is_valid_image_url
+
+FILLER = '<p>' + 'Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * 40 + '</p>'
+ESCAPED_FILLER = FILLER.replace('<', '&lt;').replace('>', '&gt;')
+
+ENTRY_SHAPES = [
+    # media:content, as BBC and CNN publish
+    '<media:content url="https://cdn.example.com/{i}/hero.jpg" medium="image"/>'
+    '<description>{escaped}</description>',
+    # image enclosure
+    '<enclosure url="https://cdn.example.com/{i}/enc.jpg" type="image/jpeg" length="1"/>'
+    '<description>{escaped}</description>',
+    # media:thumbnail
+    '<media:thumbnail url="https://cdn.example.com/{i}/thumb.jpg"/>'
+    '<description>{escaped}</description>',
+    # <img> inside content:encoded, as WordPress feeds publish
+    '<content:encoded><![CDATA[{filler}<img src="https://cdn.example.com/{i}/inline.png">{filler}]]>'
+    '</content:encoded>',
+    # no image at all
+    '<description>{escaped}</description>',
+]
+
+
+def synthetic_corpus(entries: int) -> list:
+    items = []
+    for i in range(entries):
+        shape = ENTRY_SHAPES[i % len(ENTRY_SHAPES)].format(i=i, filler=FILLER, escaped=ESCAPED_FILLER)
+        items.append(f'<item><title>Story {i}</title><link>https://example.com/{i}</link>{shape}</item>')
+    document = (
+        '<?xml version="1.0"?><rss version="2.0" xmlns:media="http://search.yahoo.com/mrss/" '
+        'xmlns:content="http://purl.org/rss/1.0/modules/content/"><channel><title>Bench</title>'
+        + ''.join(items) + '</channel></rss>'
+    )
+    return [('https://example.com/feed', entry) for entry in feedparser.parse(document).entries]
+
+
+def saved_corpus(directory: str) -> list:
+    corpus = []
+    for path in sorted(Path(directory).glob('*.xml')):
+        parsed = feedparser.parse(path.read_bytes())
+        base_url = parsed.feed.get('link') or 'https://example.com/'
+        corpus.extend((base_url, entry) for entry in parsed.entries)
+    return corpus
+
+
+def legacy_extract(entry: dict, feed_url: str):
+    """The extractor as it was inlined in RSSParser before image_extraction existed"""
+    image_url = None
+    if 'media_content' in entry and entry.media_content:
+        for media in entry.media_content:
+            if media.get('medium') == 'image' or 'image' in media.get('type', ''):
+                image_url = media.get('url')
+                break
+    if not image_url and 'enclosures' in entry:
+        for enclosure in entry.enclosures:
+            if enclosure.type and 'image' in enclosure.type:
+                image_url = enclosure.href
+                break
+    if not image_url and 'media_thumbnail' in entry and entry.media_thumbnail:
+        image_url = entry.media_thumbnail[0].get('url')
+    if not image_url:
+        for field in ['image', 'itunes_image', 'media_thumbnail']:
+            if hasattr(entry, field) and getattr(entry, field):
+                img_data = getattr(entry, field)
+                if isinstance(img_data, str):
+                    image_url = img_data
+                    break
+                elif isinstance(img_data, dict) and 'url' in img_data:
+                    image_url = img_data['url']
+                    break
+                elif isinstance(img_data, list) and img_data and 'url' in img_data[0]:
+                    image_url = img_data[0]['url']
+                    break
+    if not image_url:
+        content = entry.get('description', '') or entry.get('summary', '')
+        if 'content' in entry and entry.content:
+            if isinstance(entry.content, list) and entry.content:
+                content = entry.content[0].get('value', '')
+            else:
+                content = str(entry.content)
+        if content:
+            patterns = [
+                r'<img[^>]+src=["\']([^"\']+)["\'][^>]*>',
+                r'<img[^>]+src=([^>\s]+)[^>]*>',
+                r'src=["\']([^"\']*\.(jpg|jpeg|png|gif|webp))["\']',
+                r'(https?://[^\s<>"]+\.(jpg|jpeg|png|gif|webp))',
+            ]
+            for pattern in patterns:
+                img_match = re.search(pattern, content, re.IGNORECASE)
+                if img_match:
+                    image_url = img_match.group(1)
+                    break
+    if image_url and not image_url.startswith(('http://', 'https://')):
+        image_url = urljoin(feed_url, image_url)
+    if image_url and is_valid_image_url(image_url):
+        return image_url
+    return None
+
+
+def bench(extract, corpus: list, repeat: int) -> dict:
+    found = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for base_url, entry in corpus:
+            if extract(entry, base_url):
+                found += 1
+    elapsed = time.perf_counter() - start
+    calls = len(corpus) * repeat
+    return {'entries': len(corpus), 'images_found': found // repeat,
+            'entries_per_sec': round(calls / elapsed, 1),
+            'usec_per_entry': round(elapsed / calls * 1e6, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Entry image extraction micro-benchmark')
+    parser.add_argument('--corpus', help='Directory of saved feed documents (*.xml)')
+    parser.add_argument('--entries', type=int, default=500, help='Synthetic corpus size')
+    parser.add_argument('--repeat', type=int, default=20, help='Passes over the corpus')
+    args = parser.parse_args()
+
+    corpus = saved_corpus(args.corpus) if args.corpus else synthetic_corpus(args.entries)
+    results = {
+        'legacy': bench(legacy_extract, corpus, args.repeat),
+        'image_extraction': bench(extract_entry_image, corpus, args.repeat),
+    }
+    results['speedup'] = round(
+        results['image_extraction']['entries_per_sec'] / results['legacy']['entries_per_sec'], 2
+    )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
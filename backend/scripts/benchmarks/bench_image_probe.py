@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Image probing cost: header parsing, and Range probes against full downloads
+
+Usage: python scripts/benchmarks/bench_image_probe.py [--images 500] [--image-bytes 500000]
+
+Times parse_image_header on a header of each format, then starts the fixture
+server and fetches --images candidate images three ways with the same
+concurrency: downloaded whole, probed with ImageProber, and probed again with
+the probe cache warm. Reports bytes read, wall time and images per second.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import sqlite3
+import time
+
+import aiohttp
+
+import _common  # noqa: F401  (puts scripts/ on sys.path)
+from fixture_server import FixtureConfig, jpeg, run_server
+from image_probe import PROBE_BYTES, ImageProber, ProbeCache, parse_image_header
+
+HEADERS = {
+    'png': b'\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR' + (1200).to_bytes(4, 'big') + (675).to_bytes(4, 'big'),
+    'gif': b'GIF89a' + (1200).to_bytes(2, 'little') + (675).to_bytes(2, 'little'),
+    'webp': (b'RIFF\x00\x00\x00\x00WEBPVP8X\x0a\x00\x00\x00\x00\x00\x00\x00'
+             + (1199).to_bytes(3, 'little') + (674).to_bytes(3, 'little')),
+    'jpeg': jpeg(1200, 675, PROBE_BYTES),
+    'jpeg_exif_4k': jpeg(1200, 675, PROBE_BYTES, exif_bytes=4096),
+}
+
+
+def bench_parsing(rounds: int = 20000) -> dict:
+    results = {}
+    for name, data in HEADERS.items():
+        assert parse_image_header(data)[1:] == (1200, 675), name
+        start = time.perf_counter()
+        for _ in range(rounds):
+            parse_image_header(data)
+        results[name] = round((time.perf_counter() - start) / rounds * 1e6, 2)
+    return results
+
+
+async def download_all(session, urls: list, concurrency: int) -> int:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def download(url):
+        async with semaphore, session.get(url) as response:
+            return len(await response.read())
+
+    return sum(await asyncio.gather(*(download(url) for url in urls)))
+
+
+async def timed(coroutine) -> tuple:
+    start = time.perf_counter()
+    result = await coroutine
+    return result, time.perf_counter() - start
+
+
+def entry(images: int, seconds: float, bytes_read: int) -> dict:
+    return {'seconds': round(seconds, 3), 'images_per_second': round(images / seconds, 1),
+            'bytes_read': bytes_read, 'bytes_per_image': bytes_read // images}
+
+
+async def bench_fetching(base: str, images: int, concurrency: int) -> dict:
+    urls = [f'{base}/img/0/{serial}.jpg' for serial in range(images)]
+    connector = aiohttp.TCPConnector(limit_per_host=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        bytes_read, seconds = await timed(download_all(session, urls, concurrency))
+        results = {'full_download': entry(images, seconds, bytes_read)}
+
+        conn = sqlite3.connect(':memory:')
+        prober = ImageProber(session, ProbeCache(conn), concurrency=concurrency, per_host_limit=concurrency)
+        infos, seconds = await timed(prober.probe_many(urls))
+        assert all(info.status == 'ok' for info in infos), infos[:3]
+        results['range_probe'] = entry(images, seconds, prober.bytes_read)
+
+        bytes_before = prober.bytes_read
+        _, seconds = await timed(prober.probe_many(urls))
+        results['cached_probe'] = entry(images, seconds, prober.bytes_read - bytes_before)
+        conn.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Image probe benchmark')
+    parser.add_argument('--images', type=int, default=500, help='Candidate images to fetch')
+    parser.add_argument('--image-bytes', type=int, default=500000, help='Size of each image')
+    parser.add_argument('--latency-ms', type=float, default=20.0, help='Server delay per response')
+    parser.add_argument('--concurrency', type=int, default=8, help='Requests in flight')
+    parser.add_argument('--port', type=int, default=8732, help='Fixture server port')
+    args = parser.parse_args()
+
+    results = {'parse_us': bench_parsing()}
+
+    config = FixtureConfig(image_bytes=args.image_bytes, latency_ms=args.latency_ms)
+    context = multiprocessing.get_context('spawn')
+    ready = context.Event()
+    server = context.Process(target=run_server, args=(config, ['127.0.0.1'], args.port, ready), daemon=True)
+    server.start()
+    try:
+        if not ready.wait(timeout=30):
+            raise RuntimeError('Fixture server did not start')
+        results['fetch'] = asyncio.run(
+            bench_fetching(f'http://127.0.0.1:{args.port}', args.images, args.concurrency))
+    finally:
+        server.terminate()
+        server.join()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
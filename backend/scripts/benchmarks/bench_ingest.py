@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Offline end-to-end ingestion benchmark
+
+Starts the local fixture server, seeds a temporary SQLite database with the
+seed-data.py categories plus synthetic feeds pointing at the server, and runs
+RSSParser against it. Results are printed (or written with --output) as JSON
+so runs from different commits can be compared.
+
+Usage: python scripts/benchmarks/bench_ingest.py --feeds 50 --entries 50 --runs 3
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import logging
+import multiprocessing
+import platform
+import resource
+import sqlite3
+import subprocess
+import tempfile
+import time
+from dataclasses import asdict
+from pathlib import Path
+
+import aiohttp
+
+from _common import SCRIPTS_DIR, create_database, load_feed_parser
+from fixture_server import FixtureConfig, run_server
+from image_extraction import SiteScraper, register_scraper
+
+feed_parser = load_feed_parser()
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def peak_rss_kb(who: int) -> int:
+    peak = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes elsewhere
+    return peak // 1024 if platform.system() == 'Darwin' else peak
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SCRIPTS_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+class InstrumentedParser(feed_parser.RSSParser):
+    """RSSParser that records per-feed latency, entries seen, scrapes and DB write time"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reset_stats()
+        save_articles = self.store.save_articles
+
+        def timed_save(articles):
+            start = time.perf_counter()
+            saved = save_articles(articles)
+            self.db_seconds += time.perf_counter() - start
+            self.rows_written += saved
+            return saved
+
+        self.store.save_articles = timed_save
+
+    def reset_stats(self):
+        self.feed_latencies = []
+        self.entries_seen = 0
+        self.rows_written = 0
+        self.db_seconds = 0.0
+        self.scrape_calls = 0
+
+    async def fetch_feed(self, feed):
+        result = await super().fetch_feed(feed)
+        if result and result.parsed_feed:
+            self.entries_seen += result.parsed_feed.entries_seen
+        return result
+
+    async def scrape_article_image(self, article_url, feed_url):
+        self.scrape_calls += 1
+        return await super().scrape_article_image(article_url, feed_url)
+
+    async def process_feed(self, feed):
+        start = time.perf_counter()
+        try:
+            return await super().process_feed(feed)
+        finally:
+            self.feed_latencies.append(time.perf_counter() - start)
+
+
+def seed(db_path: str, feed_urls: list):
+    """seed-data.py categories and feeds, with the real feeds swapped for fixture ones"""
+    create_database(db_path)
+    spec = importlib.util.spec_from_file_location('seed_data', SCRIPTS_DIR / 'seed-data.py')
+    seed_data = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(seed_data)
+    seed_data.seed_database(db_path)
+
+    conn = sqlite3.connect(db_path)
+    category_ids = [row[0] for row in conn.execute('SELECT id FROM categories ORDER BY id')]
+    with conn:
+        conn.execute('UPDATE feeds SET isActive = 0')
+        conn.executemany(
+            'INSERT INTO feeds (name, url, isActive, categoryId) VALUES (?, ?, 1, ?)',
+            [(f'Fixture {i}', url, category_ids[i % len(category_ids)]) for i, url in enumerate(feed_urls)]
+        )
+    conn.close()
+
+
+async def advance_generation(base_url: str):
+    async with aiohttp.ClientSession() as session:
+        async with session.post(f'{base_url}/generation') as response:
+            await response.read()
+
+
+async def bench_run(rss_parser: InstrumentedParser, run: int) -> dict:
+    rss_parser.reset_stats()
+    start = time.perf_counter()
+    await rss_parser.run()
+    elapsed = time.perf_counter() - start
+    feeds = len(rss_parser.feed_latencies)
+    latencies_ms = [latency * 1000 for latency in rss_parser.feed_latencies]
+    return {
+        'run': run,
+        'seconds': round(elapsed, 3),
+        'feeds': feeds,
+        'entries_seen': rss_parser.entries_seen,
+        'articles_saved': rss_parser.rows_written,
+        'feeds_per_sec': round(feeds / elapsed, 2),
+        'entries_per_sec': round(rss_parser.entries_seen / elapsed, 1),
+        'feed_latency_ms': {
+            'p50': round(percentile(latencies_ms, 50), 1),
+            'p95': round(percentile(latencies_ms, 95), 1),
+            'max': round(max(latencies_ms, default=0), 1),
+        },
+        'db_insert_rows_per_sec': round(rss_parser.rows_written / rss_parser.db_seconds, 1)
+        if rss_parser.db_seconds else 0.0,
+        'image_scrapes': rss_parser.scrape_calls,
+        'peak_rss_kb': {
+            'parser': peak_rss_kb(resource.RUSAGE_SELF),
+            'parse_workers': peak_rss_kb(resource.RUSAGE_CHILDREN),
+        },
+    }
+
+
+async def main_async(args, config: FixtureConfig, hosts: list) -> dict:
+    feed_urls = [f'http://{hosts[i % len(hosts)]}:{args.port}/feed/{i}' for i in range(args.feeds)]
+    # Give the fixture hosts a scraper so image-less entries exercise the page scraper
+    register_scraper(SiteScraper('Fixture', tuple(hosts)))
+
+    runs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / 'bench.sqlite')
+        seed(db_path, feed_urls)
+        rss_parser = InstrumentedParser(
+            db_path,
+            max_concurrency=args.concurrency,
+            per_host_limit=args.per_host,
+            parse_workers=args.parse_workers,
+            probe_images=args.probe_images,
+            probe_per_host=args.probe_per_host,
+        )
+        for run in range(args.runs):
+            if run:
+                await advance_generation(f'http://{hosts[0]}:{args.port}')
+            runs.append(await bench_run(rss_parser, run))
+        if args.metrics_file:
+            rss_parser.metrics.registry.write_textfile(args.metrics_file)
+
+    return {
+        'revision': git_revision(),
+        'config': {
+            'feeds': args.feeds,
+            'hosts': len(hosts),
+            'concurrency': args.concurrency,
+            'per_host': args.per_host,
+            'parse_workers': args.parse_workers,
+            'probe_images': args.probe_images,
+            'probe_per_host': args.probe_per_host,
+            **asdict(config),
+        },
+        'runs': runs,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline NewsHub ingestion benchmark')
+    parser.add_argument('--feeds', type=int, default=50, help='Number of synthetic feeds')
+    parser.add_argument('--entries', type=int, default=50, help='Entries per feed')
+    parser.add_argument('--new-per-run', type=int, default=10, help='New entries per feed on each later run')
+    parser.add_argument('--body-bytes', type=int, default=2000, help='Size of each entry body')
+    parser.add_argument('--page-bytes', type=int, default=50000, help='Size of each article page')
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='Server delay per response')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of feed requests answered with 500')
+    parser.add_argument('--atom-ratio', type=float, default=0.3, help='Share of feeds served as Atom')
+    parser.add_argument('--scrape-ratio', type=float, default=0.2, help='Share of entries without an inline image')
+    parser.add_argument('--runs', type=int, default=3, help='Parser runs (the first one is cold)')
+    parser.add_argument('--hosts', type=int, default=1,
+                        help='Spread feeds over 127.0.0.1..127.0.0.N (N > 1 needs Linux loopback)')
+    parser.add_argument('--port', type=int, default=8731, help='Fixture server port')
+    parser.add_argument('--concurrency', type=int, default=10, help='RSSParser max_concurrency')
+    parser.add_argument('--per-host', type=int, default=10, help='RSSParser per_host_limit')
+    parser.add_argument('--parse-workers', type=int, default=None, help='RSSParser parse_workers')
+    parser.add_argument('--no-probe-images', dest='probe_images', action='store_false',
+                        help='Take each entry\'s first image URL without probing')
+    parser.add_argument('--probe-per-host', type=int, default=10, help='RSSParser probe_per_host')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    parser.add_argument('--metrics-file', help='Write the parser\'s Prometheus metrics after the last run')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    config = FixtureConfig(
+        entries=args.entries,
+        new_per_run=args.new_per_run,
+        body_bytes=args.body_bytes,
+        page_bytes=args.page_bytes,
+        latency_ms=args.latency_ms,
+        error_rate=args.error_rate,
+        atom_ratio=args.atom_ratio,
+        scrape_ratio=args.scrape_ratio,
+    )
+    hosts = [f'127.0.0.{i + 1}' for i in range(args.hosts)]
+
+    context = multiprocessing.get_context('spawn')
+    ready = context.Event()
+    server = context.Process(target=run_server, args=(config, hosts, args.port, ready), daemon=True)
+    server.start()
+    try:
+        if not ready.wait(timeout=30):
+            raise RuntimeError('Fixture server did not start')
+        report = asyncio.run(main_async(args, config, hosts))
+    finally:
+        server.terminate()
+        server.join()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + '\n')
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
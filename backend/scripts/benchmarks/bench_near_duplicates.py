@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate lookup latency and accuracy as the signature index grows
+
+Usage: python scripts/benchmarks/bench_near_duplicates.py [--sizes 10000 100000 1000000] [--probes 1000]
+
+Grows one article_signatures table through each size in --sizes with
+synthetic stories (Zipf-distributed words, so unrelated stories still share
+common ones). At each size it times signing a story plus DuplicateIndex.find
+for stories that have no duplicate and for edited copies of indexed stories,
+and reports how many copies of each kind of edit were found and how many
+unrelated stories were wrongly matched.
+"""
+
+import argparse
+import itertools
+import json
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from _common import create_database
+from near_duplicates import INSERT_SQL, DuplicateIndex, band_keys, signature
+from newshub_db import apply_pragmas
+
+VOCABULARY = [f'w{i}' for i in range(50000)]
+CUMULATIVE_WEIGHTS = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(VOCABULARY))))
+
+# How a syndicated story tends to differ between feeds
+EDITS = {
+    'source_suffix': lambda words, rng: words + ['Reuters'],
+    'prefix': lambda words, rng: ['UPDATE', 'Live'] + words,
+    'word_dropped': lambda words, rng: _without(words, rng.randrange(len(words))),
+    'word_changed': lambda words, rng: _without(words, rng.randrange(len(words))) + ['replacement'],
+    'truncated_80': lambda words, rng: words[:int(len(words) * 0.8)],
+    'truncated_60': lambda words, rng: words[:int(len(words) * 0.6)],
+}
+
+
+def _without(words, position):
+    return words[:position] + words[position + 1:]
+
+
+def story(rng: random.Random) -> list:
+    """Title and description words of one synthetic article"""
+    return rng.choices(VOCABULARY, cum_weights=CUMULATIVE_WEIGHTS, k=rng.randint(8, 14) + rng.randint(15, 35))
+
+
+def grow(conn: sqlite3.Connection, stories: list, target: int, rng: random.Random, now: float):
+    batch = 10000
+    while len(stories) < target:
+        rows = []
+        for _ in range(min(batch, target - len(stories))):
+            words = story(rng)
+            article_id = f'article-{len(stories)}'
+            stories.append(words)
+            fingerprint = signature(' '.join(words))
+            rows.append((article_id, article_id, fingerprint, now, *band_keys(fingerprint)))
+        with conn:
+            conn.executemany(INSERT_SQL, rows)
+
+
+def probe(index: DuplicateIndex, texts: list, now: float):
+    """Latencies in ms and matches for looking up each text"""
+    latencies, matches = [], []
+    for text in texts:
+        start = time.perf_counter()
+        match = index.find(signature(text), now)
+        latencies.append((time.perf_counter() - start) * 1000)
+        matches.append(match)
+    return latencies, matches
+
+
+def summary(latencies: list) -> dict:
+    latencies = sorted(latencies)
+    return {'p50_ms': round(statistics.median(latencies), 3),
+            'p99_ms': round(latencies[int(len(latencies) * 0.99)], 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Near-duplicate index lookups at growing sizes')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000],
+                        help='Index sizes to measure at, ascending')
+    parser.add_argument('--probes', type=int, default=1000, help='Lookups per kind of probe and size')
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    now = time.time()
+    texts = [' '.join(story(rng)) for _ in range(2000)]
+    start = time.perf_counter()
+    for text in texts:
+        signature(text)
+    signature_us = (time.perf_counter() - start) / len(texts) * 1e6
+
+    results = {'signature_us': round(signature_us, 1), 'sizes': []}
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / 'duplicates.sqlite')
+        create_database(db_path)
+        conn = sqlite3.connect(db_path)
+        apply_pragmas(conn)
+        index = DuplicateIndex(conn)
+        index.ensure_schema()
+
+        stories = []
+        for size in args.sizes:
+            grow(conn, stories, size, rng, now)
+
+            unrelated = [' '.join(story(rng)) for _ in range(args.probes)]
+            latencies, matches = probe(index, unrelated, now)
+            entry = {
+                'signatures': size,
+                'unrelated': {**summary(latencies),
+                              'false_matches': sum(match is not None for match in matches)},
+                'edited': {},
+            }
+            all_latencies = []
+            for name, edit in EDITS.items():
+                originals = rng.sample(range(len(stories)), args.probes)
+                copies = [' '.join(edit(stories[serial], rng)) for serial in originals]
+                latencies, matches = probe(index, copies, now)
+                all_latencies.extend(latencies)
+                found = sum(match is not None and match[0] == f'article-{serial}'
+                            for serial, match in zip(originals, matches))
+                entry['edited'][name] = {'recall': round(found / args.probes, 3)}
+            entry['edited_latency'] = summary(all_latencies)
+            results['sizes'].append(entry)
+            print(json.dumps(entry), flush=True)
+        conn.close()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark article persistence: per-row connect/commit versus ArticleStore batches
+
+Usage: python scripts/benchmarks/bench_persistence.py --feeds 20 --entries 100
+"""
+
+import argparse
+import json
+import logging
+import sqlite3
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+from _common import create_database, load_feed_parser
+
+feed_parser = load_feed_parser()
+Article = feed_parser.Article
+ArticleStore = feed_parser.ArticleStore
+
+
+def make_feeds(feed_count: int, entries: int, run: int):
+    """Build per-feed article batches; later runs repeat half of the URLs"""
+    batches = []
+    for feed_id in range(1, feed_count + 1):
+        batch = []
+        for i in range(entries):
+            # Half of each feed overlaps with the previous run, like a real refresh
+            serial = i + run * (entries // 2)
+            batch.append(Article(
+                title=f"Feed {feed_id} story {serial}",
+                description="Lorem ipsum dolor sit amet " * 20,
+                content="Lorem ipsum dolor sit amet " * 150,
+                url=f"https://example.com/{feed_id}/{serial}",
+                image_url=None,
+                author="Bench",
+                published_at=None,
+                feed_id=feed_id,
+                category_id=1
+            ))
+        batches.append(batch)
+    return batches
+
+
+def legacy_save(db_path: str, article) -> bool:
+    """The pre-ArticleStore path: one connection for the check, one for the insert"""
+    conn = sqlite3.connect(db_path)
+    exists = conn.execute("SELECT id FROM articles WHERE url = ?", (article.url,)).fetchone()
+    conn.close()
+    if exists:
+        return False
+
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("""
+            INSERT INTO articles (
+                id, title, description, content, url, imageUrl, author,
+                publishedAt, feedId, categoryId, viewCount, bookmarkCount,
+                isActive, createdAt, updatedAt
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0, 0, 1, datetime('now'), datetime('now'))
+        """, (str(uuid.uuid4()), article.title, article.description, article.content,
+              article.url, article.image_url, article.author, article.published_at,
+              article.feed_id, article.category_id))
+        conn.commit()
+        return True
+    finally:
+        conn.close()
+
+
+def bench_legacy(db_path: str, runs) -> dict:
+    entries = saved = 0
+    start = time.perf_counter()
+    for batches in runs:
+        for batch in batches:
+            for article in batch:
+                entries += 1
+                saved += legacy_save(db_path, article)
+    elapsed = time.perf_counter() - start
+    return {'entries': entries, 'saved': saved, 'seconds': round(elapsed, 3),
+            'rows_per_sec': round(entries / elapsed, 1)}
+
+
+def bench_store(db_path: str, runs) -> dict:
+    entries = saved = 0
+    start = time.perf_counter()
+    store = ArticleStore(db_path)
+    for batches in runs:
+        for batch in batches:
+            entries += len(batch)
+            saved += store.save_articles(batch)
+    store.close()
+    elapsed = time.perf_counter() - start
+    return {'entries': entries, 'saved': saved, 'seconds': round(elapsed, 3),
+            'rows_per_sec': round(entries / elapsed, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Article persistence benchmark')
+    parser.add_argument('--feeds', type=int, default=20, help='Feeds per run')
+    parser.add_argument('--entries', type=int, default=100, help='Entries per feed')
+    parser.add_argument('--runs', type=int, default=3, help='Parser runs to simulate')
+    args = parser.parse_args()
+
+    # Keep per-article INFO lines out of the timings
+    logging.getLogger().setLevel(logging.WARNING)
+
+    runs = [make_feeds(args.feeds, args.entries, run) for run in range(args.runs)]
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, bench in (('legacy', bench_legacy), ('article_store', bench_store)):
+            db_path = str(Path(tmp) / f"{name}.sqlite")
+            create_database(db_path)
+            results[name] = bench(db_path, runs)
+
+    results['speedup'] = round(
+        results['article_store']['rows_per_sec'] / results['legacy']['rows_per_sec'], 1
+    )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Article retention: archive throughput, compression and reclaimed space
+
+Usage: python scripts/benchmarks/bench_retention.py [--articles 20000] [--days 90]
+
+Fills a fresh database (auto_vacuum=INCREMENTAL) with --articles articles of
+full-length description and content, created over the last 200 days. It then
+runs retention.run, reporting articles moved per second, the body compression
+ratio and the hot table and file sizes before and after. Last it times the
+ingester's dedup lookup (ArticleStore.existing_urls) with the archive attached
+against the same lookup on the main database alone.
+"""
+
+import argparse
+import json
+import random
+import sqlite3
+import tempfile
+import time
+import uuid
+from dataclasses import asdict
+from pathlib import Path
+
+from _common import create_database, load_feed_parser
+from retention import run as run_retention
+
+feed_parser = load_feed_parser()
+
+
+def sentence(rnd: random.Random, words: list, count: int) -> str:
+    return ' '.join(rnd.choice(words) for _ in range(count))
+
+
+def fill(db_path: str, articles: int) -> list:
+    create_database(db_path)
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+    with conn:
+        conn.execute("INSERT INTO categories (slug, name) VALUES ('bench', 'Bench')")
+        conn.execute("INSERT INTO feeds (name, url, categoryId) VALUES ('Bench', 'https://bench.example/rss', 1)")
+    conn.close()
+
+    store = feed_parser.ArticleStore(db_path)
+    rnd = random.Random(7)
+    # Zipf-ish vocabulary, so the text compresses more like prose than noise
+    words = [''.join(rnd.choice('etaoinshrdlucmfwypvbgk') for _ in range(rnd.randint(2, 9))) for _ in range(5000)]
+    words = [word for rank, word in enumerate(words, 1) for _ in range(max(1, 200 // rank))]
+    urls = [f'https://bench.example/story/{i}' for i in range(articles)]
+    with store.conn:
+        store.conn.executemany("""
+            INSERT INTO articles (id, title, description, content, url, canonicalUrl, feedId, categoryId, createdAt)
+            VALUES (?, ?, ?, ?, ?, ?, 1, 1, datetime('now', ?))
+        """, [(str(uuid.uuid4()), sentence(rnd, words, 10), sentence(rnd, words, 160)[:1000],
+               sentence(rnd, words, 800)[:5000], url, url, f'-{i * 200 // articles} days')
+              for i, url in enumerate(urls)])
+    store.close()
+    return urls
+
+
+def time_lookups(db_path: str, urls: list, rounds: int = 20) -> float:
+    """Milliseconds per existing_urls call on a feed-sized batch of URLs"""
+    store = feed_parser.ArticleStore(db_path)
+    batch = random.Random(3).sample(urls, 50)
+    store.existing_urls(batch)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        found = store.existing_urls(batch)
+    assert len(found) == len(batch)
+    store.close()
+    return round((time.perf_counter() - start) / rounds * 1000, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Retention benchmark')
+    parser.add_argument('--articles', type=int, default=20000, help='Articles in the database')
+    parser.add_argument('--days', type=float, default=90, help='Retention age')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / 'bench.sqlite')
+        urls = fill(db_path, args.articles)
+        lookup_before = time_lookups(db_path, urls)
+
+        conn = feed_parser.connect(db_path)
+        report = run_retention(conn, args.days, db_path=db_path)
+        conn.close()
+
+        results = asdict(report)
+        results['articles_per_second'] = round(report.archived / report.seconds)
+        results['compression_ratio'] = round(report.raw_bytes / max(report.compressed_bytes, 1), 2)
+        results['dedup_lookup_ms'] = {'main_only': lookup_before, 'with_archive': time_lookups(db_path, urls)}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
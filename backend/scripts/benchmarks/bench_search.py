@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Search latency: the API's LIKE query versus the articles_fts index
+
+Usage: python scripts/benchmarks/bench_search.py --sizes 100000 1000000 [--db PATH]
+
+Grows one synthetic articles table through each size in --sizes. The FTS
+index is backfilled once at the first size; later rows go through the
+triggers, as they would in production. At each size both queries run for a mix
+of common, rare and multi-word terms. --db keeps the database for reruns.
+"""
+
+import argparse
+import json
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+from _common import create_database
+from newshub_db import apply_pragmas
+from search_index import ensure_search_index, search
+
+# Zipf-ish vocabulary: a few very common words and a long tail
+VOCABULARY = [f'w{i}' for i in range(20000)]
+WEIGHTS = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+# Articles are random windows over one pre-drawn word stream, which is much faster than drawing per article
+POOL_WORDS = 1 << 20
+QUERIES = {
+    'common': ['w3', 'w10', 'w25'],
+    'medium': ['w300', 'w800', 'w1500'],
+    'rare': ['w9000', 'w15000', 'w19999'],
+    'two_words': ['w3 w40', 'w100 w250', 'w7 w5000'],
+}
+
+# ArticlesService.search, page 1
+LIKE_SQL = """
+    SELECT a.id, a.title FROM articles a
+    WHERE a.isActive = 1
+      AND (a.title LIKE :q OR a.description LIKE :q OR a.content LIKE :q)
+    ORDER BY a.publishedAt DESC LIMIT 20
+"""
+LIKE_COUNT_SQL = """
+    SELECT COUNT(*) FROM articles a
+    WHERE a.isActive = 1
+      AND (a.title LIKE :q OR a.description LIKE :q OR a.content LIKE :q)
+"""
+
+
+class WordSource:
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        self.pool = rng.choices(VOCABULARY, WEIGHTS, k=POOL_WORDS)
+
+    def words(self, count: int) -> str:
+        start = self.rng.randrange(POOL_WORDS - count)
+        return ' '.join(self.pool[start:start + count])
+
+
+def grow(conn: sqlite3.Connection, target: int, content_words: int, source: WordSource) -> float:
+    """Insert rows until articles holds target rows; returns rows/sec"""
+    current = conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+    start = time.perf_counter()
+    batch = 5000
+    for offset in range(current, target, batch):
+        rows = [(
+            str(uuid.uuid4()),
+            source.words(10),
+            source.words(40),
+            source.words(content_words),
+            f'https://example.com/{serial}',
+            f'2024-01-01 00:00:{serial % 60:02d}',
+            1 + serial % 20,
+            1 + serial % 8,
+        ) for serial in range(offset, min(offset + batch, target))]
+        with conn:
+            conn.executemany("""
+                INSERT INTO articles (id, title, description, content, url, publishedAt, feedId, categoryId)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+    elapsed = time.perf_counter() - start
+    return round((target - current) / elapsed) if target > current else 0
+
+
+def timed(run, repeat: int) -> dict:
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {'p50_ms': round(statistics.median(latencies), 2), 'max_ms': round(max(latencies), 2)}
+
+
+def measure(conn: sqlite3.Connection, repeat: int) -> dict:
+    results = {}
+    for kind, queries in QUERIES.items():
+        like_p50, fts_p50 = [], []
+        for query in queries:
+            # The API passes the whole string to LIKE; a two-word query then only
+            # matches adjacent words, so LIKE gets the first word to stay comparable
+            pattern = '%' + query.split()[0] + '%'
+            like = timed(lambda: (conn.execute(LIKE_SQL, {'q': pattern}).fetchall(),
+                                  conn.execute(LIKE_COUNT_SQL, {'q': pattern}).fetchone()), repeat)
+            fts = timed(lambda: search(conn, query), repeat)
+            like_p50.append(like['p50_ms'])
+            fts_p50.append(fts['p50_ms'])
+        results[kind] = {
+            'like_p50_ms': round(statistics.median(like_p50), 2),
+            'fts_p50_ms': round(statistics.median(fts_p50), 2),
+            'speedup': round(statistics.median(like_p50) / max(statistics.median(fts_p50), 0.001), 1),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='LIKE vs FTS5 search latency')
+    parser.add_argument('--sizes', nargs='+', type=int, default=[100000, 1000000],
+                        help='Article counts to measure at, ascending')
+    parser.add_argument('--content-words', type=int, default=150, help='Words of content per article')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per query')
+    parser.add_argument('--db', help='Database to create or reuse (default: a temporary file)')
+    args = parser.parse_args()
+
+    source = WordSource(random.Random(1))
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db or str(Path(tmp) / 'search.sqlite')
+        create_database(db_path)
+        conn = sqlite3.connect(db_path)
+        apply_pragmas(conn)
+
+        report = {'content_words': args.content_words, 'sizes': []}
+        for size in sorted(args.sizes):
+            insert_rate = grow(conn, size, args.content_words, source)
+            start = time.perf_counter()
+            backfilled = ensure_search_index(conn)
+            entry = {
+                'articles': size,
+                'insert_rows_per_sec': insert_rate,
+                'backfill_seconds': round(time.perf_counter() - start, 1) if backfilled else None,
+                'queries': measure(conn, args.repeat),
+            }
+            report['sizes'].append(entry)
+            print(json.dumps(entry), flush=True)
+        conn.close()
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
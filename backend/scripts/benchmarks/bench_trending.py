@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Trending: the API's ORDER BY over all articles versus the trending.py table
+
+Usage: python scripts/benchmarks/bench_trending.py [--articles 1000000] [--bumps 1000] [--repeat 5]
+
+Builds a synthetic articles table with publishedAt spread over the last 90
+days and skewed view/bookmark counts, then times the legacy findTrending query,
+a full trending pass, an incremental pass after --bumps counter updates (the
+API's view/bookmark writes) and the read the endpoint now does.
+"""
+
+import argparse
+import json
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from _common import create_database
+from date_parsing import to_db_datetime
+from newshub_db import apply_pragmas
+from trending import TrendingConfig, run_pass
+
+HISTORY_DAYS = 90
+
+# ArticlesService.findTrending before trending_articles existed
+LEGACY_SQL = """
+    SELECT id, title FROM articles WHERE isActive = 1
+    ORDER BY bookmarkCount DESC, viewCount DESC LIMIT 10
+"""
+READ_SQL = """
+    SELECT a.id, a.title FROM trending_articles t JOIN articles a ON a.id = t.articleId
+    WHERE t.categoryId = 0 AND a.isActive = 1 ORDER BY t.rank LIMIT 10
+"""
+
+
+def populate(conn: sqlite3.Connection, count: int, rng: random.Random):
+    with conn:
+        conn.executemany("INSERT INTO categories (id, name, slug) VALUES (?, ?, ?)",
+                         [(category, f'Category {category}', f'category-{category}') for category in range(1, 9)])
+    now = datetime.now(timezone.utc)
+    batch = 10000
+    for offset in range(0, count, batch):
+        rows = []
+        for serial in range(offset, min(offset + batch, count)):
+            views = int(rng.paretovariate(1.2)) - 1
+            rows.append((
+                f'article-{serial}',
+                f'Article {serial}',
+                f'https://example.com/{serial}',
+                to_db_datetime(now - timedelta(seconds=rng.randrange(HISTORY_DAYS * 86400))),
+                views,
+                views // 20,
+                1 + serial % 20,
+                1 + serial % 8,
+            ))
+        with conn:
+            conn.executemany("""
+                INSERT INTO articles (id, title, url, publishedAt, viewCount, bookmarkCount, feedId, categoryId)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+
+
+def timed(run, repeat: int) -> float:
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(latencies), 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Trending query vs materialised trending table')
+    parser.add_argument('--articles', type=int, default=1000000, help='Synthetic articles')
+    parser.add_argument('--bumps', type=int, default=1000, help='Counter updates before the incremental pass')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per read query')
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / 'trending.sqlite')
+        create_database(db_path)
+        conn = sqlite3.connect(db_path)
+        apply_pragmas(conn)
+        populate(conn, args.articles, rng)
+
+        config = TrendingConfig(per_category=10)
+        full = run_pass(conn, config)
+
+        # The view/bookmark updates ArticlesService and BookmarksService make
+        with conn:
+            for _ in range(args.bumps):
+                conn.execute("UPDATE articles SET viewCount = viewCount + 1 WHERE id = ?",
+                             (f'article-{rng.randrange(args.articles)}',))
+        incremental = run_pass(conn, config)
+
+        results = {
+            'articles': args.articles,
+            'candidates': full.candidates,
+            'legacy_query_ms': timed(lambda: conn.execute(LEGACY_SQL).fetchall(), args.repeat),
+            'trending_read_ms': timed(lambda: conn.execute(READ_SQL).fetchall(), args.repeat),
+            'full_pass_s': full.seconds,
+            'incremental_pass_s': incremental.seconds,
+            'incremental_rescored': incremental.rescored,
+        }
+        results['read_speedup'] = round(results['legacy_query_ms'] / max(results['trending_read_ms'], 0.001))
+        conn.close()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
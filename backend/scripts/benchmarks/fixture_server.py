@@ -0,0 +1,160 @@
+"""
+Local aiohttp server serving synthetic RSS/Atom feeds and article pages
+
+Runs in its own process so serving load doesn't skew the parser's timings.
+POST /generation advances every feed by `new_per_run` entries, which lets a
+benchmark simulate successive parser runs that see both new and known entries.
+"""
+
+import asyncio
+import random
+import re
+from dataclasses import dataclass
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+from xml.sax.saxutils import escape
+
+from aiohttp import web
+
+LOREM = 'Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor. '
+RANGE_HEADER = re.compile(r'bytes=(\d+)-(\d*)$')
+
+def jpeg(width: int, height: int, size: int, exif_bytes: int = 0) -> bytes:
+    """A JPEG header for width x height, an optional EXIF block before it, padded to size"""
+    data = b'\xff\xd8'
+    if exif_bytes:
+        data += b'\xff\xe1' + (exif_bytes + 2).to_bytes(2, 'big') + b'Exif\0\0' + bytes(exif_bytes - 6)
+    data += (b'\xff\xc0\x00\x11\x08' + height.to_bytes(2, 'big') + width.to_bytes(2, 'big')
+             + b'\x03\x01\x22\x00\x02\x11\x01\x03\x11\x01')
+    return data + bytes(max(0, size - len(data) - 2)) + b'\xff\xd9'
+
+@dataclass
+class FixtureConfig:
+    entries: int = 50
+    new_per_run: int = 10
+    body_bytes: int = 2000
+    page_bytes: int = 50000
+    image_bytes: int = 150000
+    latency_ms: float = 50.0
+    error_rate: float = 0.0
+    atom_ratio: float = 0.3
+    scrape_ratio: float = 0.2
+    seed: int = 42
+
+class FixtureServer:
+    def __init__(self, config: FixtureConfig):
+        self.config = config
+        self.generation = 0
+        self.random = random.Random(config.seed)
+        self.epoch = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    def filler(self, size: int) -> str:
+        return (LOREM * (size // len(LOREM) + 1))[:size]
+
+    def entry(self, base: str, feed: int, serial: int) -> dict:
+        published = self.epoch + timedelta(minutes=serial)
+        body = f'<p>{self.filler(self.config.body_bytes)}</p>'
+        # A share of entries carries no image, so the parser has to scrape the page
+        if (serial * 7919) % 100 >= self.config.scrape_ratio * 100:
+            body = f'<img src="{base}/img/{feed}/{serial}.jpg">' + body
+        return {
+            'title': f'Feed {feed} story {serial} &amp; more',
+            'link': f'{base}/article/{feed}/{serial}',
+            'body': body,
+            'published': published,
+        }
+
+    def entries(self, base: str, feed: int) -> list:
+        newest = self.generation * self.config.new_per_run + self.config.entries
+        # Newest first, as nearly every publisher orders its feed
+        return [self.entry(base, feed, serial)
+                for serial in range(newest - 1, newest - 1 - self.config.entries, -1)]
+
+    def rss(self, base: str, feed: int) -> str:
+        items = ''.join(
+            f'<item><title>{e["title"]}</title><link>{e["link"]}</link>'
+            f'<description>{escape(e["body"][:300])}</description>'
+            f'<content:encoded><![CDATA[{e["body"]}]]></content:encoded>'
+            f'<pubDate>{format_datetime(e["published"])}</pubDate></item>'
+            for e in self.entries(base, feed)
+        )
+        return ('<?xml version="1.0" encoding="utf-8"?>'
+                '<rss version="2.0" xmlns:content="http://purl.org/rss/1.0/modules/content/">'
+                f'<channel><title>Feed {feed}</title><link>{base}/</link>{items}</channel></rss>')
+
+    def atom(self, base: str, feed: int) -> str:
+        items = ''.join(
+            f'<entry><title>{e["title"]}</title><link href="{e["link"]}"/><id>{e["link"]}</id>'
+            f'<updated>{e["published"].isoformat()}</updated>'
+            f'<published>{e["published"].isoformat()}</published>'
+            f'<summary>{escape(e["body"][:300])}</summary>'
+            f'<content type="html">{escape(e["body"])}</content></entry>'
+            for e in self.entries(base, feed)
+        )
+        return ('<?xml version="1.0" encoding="utf-8"?><feed xmlns="http://www.w3.org/2005/Atom">'
+                f'<title>Feed {feed}</title><id>{base}/atom/{feed}</id>'
+                f'<updated>{self.epoch.isoformat()}</updated>{items}</feed>')
+
+    async def delay(self):
+        if self.config.latency_ms:
+            await asyncio.sleep(self.config.latency_ms / 1000)
+
+    async def handle_feed(self, request: web.Request) -> web.Response:
+        await self.delay()
+        if self.random.random() < self.config.error_rate:
+            return web.Response(status=500, text='fixture error')
+        feed = int(request.match_info['feed'])
+        base = f'http://{request.host}'
+        is_atom = (feed * 7919) % 100 < self.config.atom_ratio * 100
+        body = self.atom(base, feed) if is_atom else self.rss(base, feed)
+        content_type = 'application/atom+xml' if is_atom else 'application/rss+xml'
+        return web.Response(text=body, content_type=content_type)
+
+    async def handle_article(self, request: web.Request) -> web.Response:
+        await self.delay()
+        base = f'http://{request.host}'
+        feed, serial = request.match_info['feed'], request.match_info['serial']
+        head = (f'<html><head><title>Story {serial}</title>'
+                f'<meta property="og:image" content="{base}/img/{feed}/{serial}-og.jpg">'
+                '</head><body>')
+        return web.Response(text=head + self.filler(self.config.page_bytes) + '</body></html>',
+                            content_type='text/html')
+
+    async def handle_image(self, request: web.Request) -> web.Response:
+        """A JPEG of image_bytes whose size varies by serial, honouring Range requests"""
+        await self.delay()
+        serial = int(request.match_info['serial'])
+        body = jpeg(640 + serial % 7 * 120, 360 + serial % 5 * 90, self.config.image_bytes)
+        match = RANGE_HEADER.match(request.headers.get('Range', ''))
+        if not match:
+            return web.Response(body=body, content_type='image/jpeg')
+        start = int(match.group(1))
+        end = min(int(match.group(2) or len(body) - 1), len(body) - 1)
+        return web.Response(body=body[start:end + 1], status=206, content_type='image/jpeg',
+                            headers={'Content-Range': f'bytes {start}-{end}/{len(body)}'})
+
+    async def handle_generation(self, request: web.Request) -> web.Response:
+        self.generation += 1
+        return web.json_response({'generation': self.generation})
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get('/feed/{feed}', self.handle_feed)
+        app.router.add_get('/article/{feed}/{serial}', self.handle_article)
+        app.router.add_get(r'/img/{feed}/{serial:\d+}{suffix:[^/]*}', self.handle_image)
+        app.router.add_post('/generation', self.handle_generation)
+        return app
+
+async def serve(config: FixtureConfig, hosts: list, port: int, ready=None):
+    runner = web.AppRunner(FixtureServer(config).app(), access_log=None)
+    await runner.setup()
+    for host in hosts:
+        await web.TCPSite(runner, host, port).start()
+    if ready is not None:
+        ready.set()
+    while True:
+        await asyncio.sleep(3600)
+
+def run_server(config: FixtureConfig, hosts: list, port: int, ready=None):
+    """Process entry point"""
+    asyncio.run(serve(config, hosts, port, ready))
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Canonical article URLs, the key articles are deduplicated and scraped by
+
+The same article reaches us under many URLs: with utm_*/ref/at_* tracking
+parameters, over http and https, with and without www. or a trailing slash,
+through redirect wrappers that carry the target in a query parameter, and
+through feed proxies (FeedBurner, rss.cnn.com) whose entries also give the
+original link. canonical_url maps all of them to one https URL with the
+tracking parameters removed and the rest sorted.
+
+Anything publisher-specific lives in DOMAIN_RULES, a registry keyed by domain
+like image_extraction.SITE_SCRAPERS. The canonical URL is a key, not a link:
+articles keep the URL they were published under for readers and scraping.
+
+articles.canonicalUrl has a unique index. backfill fills it in for existing
+rows in rowid batches; the parser runs it at startup whenever rows without one
+exist, also when TypeORM's schema sync added the column first, and after a rule
+change it can be rerun with --recompute.
+
+Usage:
+  python scripts/canonical_urls.py show URL [URL ...]
+  python scripts/canonical_urls.py backfill [--recompute] [--batch-size 5000]
+"""
+
+import argparse
+import logging
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from newshub_db import add_db_argument, connect, typeorm_index_name
+
+logger = logging.getLogger(__name__)
+
+# Query parameters that only say where a click came from
+TRACKING_PARAMS = frozenset((
+    'ref', 'ref_src', 'ref_url', 'referrer', 'rss', 'rssfeed', 'cmp', 'cmpid', 'ocid', 'ncid', 'smid',
+    'ito', 'taid', 'partner', 'sr_share', 'fbclid', 'gclid', 'dclid', 'msclkid', 'igshid', 'yclid',
+    'mc_cid', 'mc_eid', '_ga', '_gl', 'guccounter', 'guce_referrer', 'guce_referrer_sig',
+))
+TRACKING_PREFIXES = ('utm_', 'at_', 'itm_', 'pk_', 'mtm_', 'hsa_')
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+BATCH_SIZE = 5000
+INDEX_NAME = typeorm_index_name('articles', 'canonicalUrl')
+
+@dataclass
+class DomainRule:
+    """How one publisher's or service's URLs differ from the generic case"""
+    name: str
+    domains: Tuple[str, ...]
+    # Hosts serving the same pages as `host`, rewritten to it
+    aliases: Tuple[str, ...] = ()
+    host: Optional[str] = None
+    # When set, the only query parameters that identify a page
+    keep_params: Optional[FrozenSet[str]] = None
+    drop_params: FrozenSet[str] = frozenset()
+    # Redirect wrappers: the parameters that carry the target URL
+    unwrap_params: Tuple[str, ...] = ()
+    # Feed proxies hide the target behind a redirect; the entry's own link wins
+    proxy: bool = False
+
+DOMAIN_RULES: Dict[str, DomainRule] = {}
+
+def register_rule(rule: DomainRule):
+    """Add a rule to the registry under each of its domains"""
+    for domain in rule.domains:
+        DOMAIN_RULES[domain] = rule
+
+register_rule(DomainRule('Google News', ('news.google.com',), unwrap_params=('url',), proxy=True))
+register_rule(DomainRule('Google redirect', ('google.com',), unwrap_params=('url', 'q')))
+register_rule(DomainRule('Facebook redirect', ('l.facebook.com', 'lm.facebook.com'), unwrap_params=('u',)))
+register_rule(DomainRule('FeedBurner', ('feedproxy.google.com', 'feeds.feedburner.com', 'feeds2.feedburner.com'),
+                         proxy=True))
+register_rule(DomainRule('Ars Technica feeds', ('feeds.arstechnica.com',), proxy=True))
+register_rule(DomainRule('CNN feeds', ('rss.cnn.com',), proxy=True))
+register_rule(DomainRule('CNN', ('cnn.com',), aliases=('edition.cnn.com', 'us.cnn.com'), host='cnn.com',
+                         drop_params=frozenset(('iid', 'hpt', 'sr'))))
+register_rule(DomainRule('BBC', ('bbc.com', 'bbc.co.uk'), aliases=('bbc.co.uk',), host='bbc.com'))
+register_rule(DomainRule('YouTube', ('youtube.com',), aliases=('m.youtube.com',), host='youtube.com',
+                         keep_params=frozenset(('v', 'list'))))
+
+def find_rule(host: str) -> Optional[DomainRule]:
+    """Look up the rule for host or any parent domain of it"""
+    parts = host.split('.')
+    for i in range(len(parts) - 1):
+        rule = DOMAIN_RULES.get('.'.join(parts[i:]))
+        if rule:
+            return rule
+    return None
+
+def _is_web_url(url: Optional[str]) -> bool:
+    return bool(url) and url.lower().startswith(('http://', 'https://'))
+
+def _is_tracking(name: str, rule: Optional[DomainRule]) -> bool:
+    name = name.lower()
+    if name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES):
+        return True
+    return rule is not None and name in rule.drop_params
+
+def is_proxy_url(url: str) -> bool:
+    """True for feed proxy links that only redirect to the article"""
+    if not _is_web_url(url):
+        return False
+    rule = find_rule((urlsplit(url).hostname or '').lower())
+    return rule is not None and rule.proxy
+
+def article_link(link: str, *alternatives: Optional[str]) -> str:
+    """The entry's link, or for a feed proxy the first alternative that is the article itself"""
+    if not is_proxy_url(link):
+        return link
+    for alternative in alternatives:
+        if _is_web_url(alternative) and not is_proxy_url(alternative):
+            return alternative
+    return link
+
+def canonical_url(url: str, _depth: int = 0) -> str:
+    """The dedup key for url; anything that isn't an http(s) URL comes back stripped but unchanged"""
+    url = (url or '').strip()
+    if not _is_web_url(url):
+        return url
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url
+    host = (parts.hostname or '').rstrip('.')
+    if not host:
+        return url
+    rule = find_rule(host)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+
+    if rule and rule.unwrap_params and _depth < 3:
+        for name, value in query:
+            if name in rule.unwrap_params and _is_web_url(value):
+                return canonical_url(value, _depth + 1)
+
+    if host.startswith('www.'):
+        host = host[4:]
+    if rule and host in rule.aliases:
+        host = rule.host
+    if port and port != DEFAULT_PORTS.get(parts.scheme.lower()):
+        host = f'{host}:{port}'
+
+    path = parts.path or '/'
+    if len(path) > 1:
+        path = path.rstrip('/') or '/'
+
+    if rule and rule.keep_params is not None:
+        query = [(name, value) for name, value in query if name in rule.keep_params]
+    else:
+        query = [(name, value) for name, value in query if not _is_tracking(name, rule)]
+    query_string = urlencode(sorted(query))
+
+    # The fragment never reaches the server
+    return f"https://{host}{path}{'?' + query_string if query_string else ''}"
+
+def ensure_canonical_column(conn: sqlite3.Connection) -> bool:
+    """Add articles.canonicalUrl and its unique index; returns True when rows without one need a backfill"""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(articles)")}
+    with conn:
+        if 'canonicalUrl' not in columns:
+            conn.execute("ALTER TABLE articles ADD COLUMN canonicalUrl varchar")
+        # Named as TypeORM names the entity's @Index, so schema sync keeps it
+        conn.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS "{INDEX_NAME}" ON articles (canonicalUrl)')
+    # The index finds NULL keys without a scan
+    return conn.execute("SELECT 1 FROM articles WHERE canonicalUrl IS NULL LIMIT 1").fetchone() is not None
+
+def backfill(conn: sqlite3.Connection, recompute: bool = False, batch_size: int = BATCH_SIZE) -> Tuple[int, int]:
+    """Fill in canonicalUrl in rowid batches, oldest first; returns (updated, duplicates)
+
+    A row whose canonical URL an older row already has is a duplicate stored
+    before canonicalisation; it keeps a NULL (or, with recompute, its old) key.
+    """
+    start = time.perf_counter()
+    last_rowid, updated, duplicates = 0, 0, 0
+    pending = '' if recompute else 'AND canonicalUrl IS NULL'
+    while True:
+        rows = conn.execute(f"""
+            SELECT rowid, url FROM articles WHERE rowid > ? {pending} ORDER BY rowid LIMIT ?
+        """, (last_rowid, batch_size)).fetchall()
+        if not rows:
+            break
+        last_rowid = rows[-1][0]
+        # One short transaction per batch, so the parser and the API keep writing
+        with conn:
+            changed = conn.executemany(
+                "UPDATE OR IGNORE articles SET canonicalUrl = ? WHERE rowid = ?",
+                [(canonical_url(url), rowid) for rowid, url in rows]
+            ).rowcount
+        updated += changed
+        duplicates += len(rows) - changed
+    logger.info(f"Canonicalised {updated} article URLs in {time.perf_counter() - start:.1f}s, "
+                f"{duplicates} duplicates of older articles skipped")
+    return updated, duplicates
+
+def main():
+    parser = argparse.ArgumentParser(description='NewsHub canonical article URLs')
+    add_db_argument(parser)
+    parser.add_argument('--verbose', '-v', action='store_true', help='Verbose logging')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    show_parser = commands.add_parser('show', help='Print the canonical form of URLs')
+    show_parser.add_argument('urls', nargs='+')
+
+    backfill_parser = commands.add_parser('backfill', help='Fill in articles.canonicalUrl for existing rows')
+    backfill_parser.add_argument('--recompute', action='store_true',
+                                 help='Recompute every row, e.g. after a rule change')
+    backfill_parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Rows per transaction')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.command == 'show':
+        for url in args.urls:
+            print(f"{url}\n  -> {canonical_url(url)}")
+        return
+
+    conn = connect(args.db)
+    try:
+        ensure_canonical_column(conn)
+        backfill(conn, args.recompute, args.batch_size)
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
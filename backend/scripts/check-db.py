@@ -1,6 +1,6 @@
-import sqlite3
+from feed_stats import category_stats, connect_stats
 
-conn = sqlite3.connect('newshub.sqlite')
+conn = connect_stats()
 cursor = conn.cursor()
 
 # Get counts
@@ -10,26 +10,17 @@ categories_count = cursor.fetchone()[0]
 cursor.execute('SELECT COUNT(*) FROM feeds') 
 feeds_count = cursor.fetchone()[0]
 
-cursor.execute('SELECT COUNT(*) FROM articles')
-articles_count = cursor.fetchone()[0]
+categories = category_stats(conn)
+articles_count = sum(category.articles for category in categories)
 
 print(f"📊 NewsHub Database Statistics:")
 print(f"  Categories: {categories_count}")
 print(f"  Feeds: {feeds_count}")
 print(f"  Articles: {articles_count}")
 
-# Get articles by category
-cursor.execute('''
-    SELECT c.name, COUNT(a.id) as article_count 
-    FROM categories c 
-    LEFT JOIN feeds f ON f.categoryId = c.id 
-    LEFT JOIN articles a ON a.feedId = f.id 
-    GROUP BY c.id, c.name 
-    ORDER BY article_count DESC
-''')
-
+# Get articles by category from the running aggregates
 print(f"\n📰 Articles by Category:")
-for row in cursor.fetchall():
-    print(f"  {row[0]}: {row[1]} articles")
+for category in sorted(categories, key=lambda category: -category.articles):
+    print(f"  {category.name}: {category.articles} articles")
 
 conn.close()
@@ -0,0 +1,178 @@
+"""
+Date parsing for feed entries
+
+A feed nearly always writes every date the same way, so DateParser remembers
+which format last matched for each feed and tries it first. Formats are
+precompiled regexes that build the datetime directly (no strptime, no
+exceptions on the common path). Every result is a timezone-aware UTC datetime;
+dates without an offset are taken to be UTC, as feedparser does.
+
+feedparser parses the date fields itself while it reads a feed, so
+register_with_feedparser() puts the memoised parser in front of its handlers.
+"""
+
+import logging
+import re
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Pattern
+
+import feedparser
+
+try:
+    from feedparser.datetimes import _parse_date as feedparser_parse_date
+except ImportError:
+    feedparser_parse_date = None
+
+logger = logging.getLogger(__name__)
+
+MONTHS = {name: number for number, name in enumerate(
+    ('jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'), 1)}
+
+# RFC 822 zone names; military single letters other than Z are ambiguous in practice
+ZONE_OFFSETS = {
+    'ut': 0, 'utc': 0, 'gmt': 0, 'z': 0,
+    'est': -5, 'edt': -4, 'cst': -6, 'cdt': -5, 'mst': -7, 'mdt': -6, 'pst': -8, 'pdt': -7,
+}
+
+# "Tue, 02 Jan 2024 15:04:05 +0000", "2 Jan 24 15:04 GMT", "Tuesday, 02-Jan-2024 15:04:05 EST"
+RFC822_PATTERN = re.compile(
+    r'\s*(?:[A-Za-z]{3,9},?\s+)?(\d{1,2})[\s-]+([A-Za-z]{3,9})\.?[\s-]+(\d{2,4})'
+    r'\s+(\d{1,2}):(\d{2})(?::(\d{2}))?(?:\.\d+)?'
+    r'\s*(?:([+-])(\d{2}):?(\d{2})|([A-Za-z]{1,5}))?\s*$'
+)
+
+# "2024-01-02", "2024-01-02T03:04:05Z", "2024-01-02 03:04:05.123456+02:00"
+ISO8601_PATTERN = re.compile(
+    r'\s*(\d{4})-(\d{2})-(\d{2})'
+    r'(?:[Tt\s](\d{2}):(\d{2})(?::(\d{2})(?:[.,](\d{1,6})\d*)?)?'
+    r'\s*(?:([Zz])|([+-])(\d{2}):?(\d{2})?)?)?\s*$'
+)
+
+def to_utc(value: datetime) -> datetime:
+    """Aware UTC datetime; naive values are taken to be UTC already"""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+def to_db_datetime(value: Optional[datetime]) -> Optional[str]:
+    """UTC 'YYYY-MM-DD HH:MM:SS', the form the articles table already holds"""
+    if value is None:
+        return None
+    return to_utc(value).strftime('%Y-%m-%d %H:%M:%S')
+
+NO_OFFSET = timedelta(0)
+
+def _offset(sign: Optional[str], hours: Optional[str], minutes: Optional[str]) -> timedelta:
+    """UTC offset of a +hh:mm / -hhmm suffix, to be subtracted from local time"""
+    if not sign:
+        return NO_OFFSET
+    offset = timedelta(hours=int(hours), minutes=int(minutes or 0))
+    return -offset if sign == '-' else offset
+
+def _build_rfc822(match: re.Match) -> Optional[datetime]:
+    day, month_name, year, hour, minute, second, sign, tz_hours, tz_minutes, zone = match.groups()
+    month = MONTHS.get(month_name[:3].lower())
+    if not month:
+        return None
+    year = int(year)
+    if year < 100:
+        year += 2000 if year < 50 else 1900
+    if zone:
+        zone_hours = ZONE_OFFSETS.get(zone.lower())
+        if zone_hours is None:
+            return None
+        offset = timedelta(hours=zone_hours)
+    else:
+        offset = _offset(sign, tz_hours, tz_minutes)
+    return datetime(year, month, int(day), int(hour), int(minute), int(second or 0),
+                    tzinfo=timezone.utc) - offset
+
+def _build_iso8601(match: re.Match) -> Optional[datetime]:
+    year, month, day, hour, minute, second, fraction, zulu, sign, tz_hours, tz_minutes = match.groups()
+    microsecond = int(fraction.ljust(6, '0')) if fraction else 0
+    offset = NO_OFFSET if zulu else _offset(sign, tz_hours, tz_minutes)
+    return datetime(int(year), int(month), int(day), int(hour or 0), int(minute or 0),
+                    int(second or 0), microsecond, tzinfo=timezone.utc) - offset
+
+@dataclass
+class DateFormat:
+    name: str
+    pattern: Pattern
+    build: Callable[[re.Match], Optional[datetime]]
+
+    def parse(self, date_str: str) -> Optional[datetime]:
+        match = self.pattern.match(date_str)
+        if not match:
+            return None
+        try:
+            return self.build(match)
+        except (ValueError, OverflowError):
+            # Out-of-range fields, e.g. 31 Feb
+            return None
+
+DATE_FORMATS = [
+    DateFormat('rfc822', RFC822_PATTERN, _build_rfc822),
+    DateFormat('iso8601', ISO8601_PATTERN, _build_iso8601),
+]
+
+@dataclass
+class DateParser:
+    """Tries each feed's last matching format first"""
+    formats: List[DateFormat] = field(default_factory=lambda: list(DATE_FORMATS))
+    # Feed the dates currently being parsed belong to, for the feedparser handler
+    current_feed: Optional[str] = None
+    _preferred: Dict[Optional[str], int] = field(default_factory=dict)
+    hits: int = 0
+    misses: int = 0
+
+    def parse(self, date_str: str, feed_key: Optional[str] = None) -> Optional[datetime]:
+        """Aware UTC datetime for date_str, or None if no known format matches"""
+        if not date_str:
+            return None
+
+        preferred = self._preferred.get(feed_key)
+        if preferred is not None:
+            parsed = self.formats[preferred].parse(date_str)
+            if parsed:
+                self.hits += 1
+                return parsed
+
+        self.misses += 1
+        for index, date_format in enumerate(self.formats):
+            if index == preferred:
+                continue
+            parsed = date_format.parse(date_str)
+            if parsed:
+                self._preferred[feed_key] = index
+                return parsed
+        return None
+
+    def feedparser_handler(self, date_str: str):
+        """feedparser date handler: a UTC 9-tuple, or None to let its own handlers try"""
+        parsed = self.parse(date_str, self.current_feed)
+        return parsed.utctimetuple() if parsed else None
+
+DATE_PARSER = DateParser()
+
+def register_with_feedparser(parser: DateParser = DATE_PARSER):
+    """Make feedparser try parser before its own handlers"""
+    feedparser.registerDateHandler(parser.feedparser_handler)
+
+def parse_date(date_str: str, feed_key: Optional[str] = None) -> Optional[datetime]:
+    """Parse various date formats into an aware UTC datetime"""
+    if not date_str:
+        return None
+
+    parsed = DATE_PARSER.parse(date_str, feed_key)
+    if parsed:
+        return parsed
+
+    # feedparser knows the rarer formats (asctime, Korean, Greek, Hungarian...)
+    if feedparser_parse_date:
+        parsed_tuple = feedparser_parse_date(date_str)
+        if parsed_tuple:
+            return datetime(*parsed_tuple[:6], tzinfo=timezone.utc)
+
+    logger.warning(f"Could not parse date: {date_str}")
+    return None
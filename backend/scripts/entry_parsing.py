@@ -0,0 +1,151 @@
+"""
+Feed parsing stage for the NewsHub RSS parser
+
+Everything here is pure CPU work on plain data so it can run in a process
+pool: fetched feed bodies go in, normalised entry records come out.
+"""
+
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import FrozenSet, List, Optional
+
+import feedparser
+
+from canonical_urls import article_link, canonical_url
+from date_parsing import DATE_PARSER, parse_date, register_with_feedparser
+from image_extraction import entry_image_candidates, is_valid_image_url
+from near_duplicates import signature
+from text_cleaning import html_to_text
+
+logger = logging.getLogger(__name__)
+
+register_with_feedparser()
+
+@dataclass
+class EntryRecord:
+    title: str
+    url: str
+    description: Optional[str]
+    content: Optional[str]
+    author: Optional[str]
+    published_at: Optional[datetime]
+    image_url: Optional[str]
+    # Time spent finding image_url in the entry, for the metrics
+    image_seconds: float = 0.0
+    # Every image URL in the entry, best guess first, for image_probe to rank
+    image_candidates: List[str] = field(default_factory=list)
+    # MinHash of the title and description, for near-duplicate clustering
+    signature: Optional[bytes] = None
+    canonical_url: Optional[str] = None
+
+@dataclass
+class ParsedFeed:
+    entries: List[EntryRecord] = field(default_factory=list)
+    bozo: bool = False
+    entries_seen: int = 0
+    known_skipped: int = 0
+    stopped_early: bool = False
+    parse_seconds: float = 0.0
+
+def clean_html(text: str, max_length: Optional[int] = None) -> str:
+    """Remove HTML tags from text, decoding entities and collapsing whitespace"""
+    return html_to_text(text, max_length)
+
+def entry_link(entry: dict) -> str:
+    """The article URL, looking past feed proxy links to the original"""
+    return article_link(entry.get('link', ''), entry.get('feedburner_origlink'), entry.get('id'))
+
+def normalise_entry(entry: dict, feed_url: str) -> Optional[EntryRecord]:
+    """Turn a feedparser entry into a plain record, or None if it is unusable"""
+    # Each field is cleaned only as far as the length it is truncated to
+    title = clean_html(entry.get('title', ''), 500)
+    if not title:
+        return None
+
+    url = entry_link(entry)
+    if not url:
+        return None
+
+    description = clean_html(entry.get('description', ''), 1000)
+
+    # Get content
+    content = ""
+    if 'content' in entry:
+        content = clean_html(entry.content[0].get('value', ''), 5000)
+    elif 'summary' in entry:
+        content = clean_html(entry.get('summary', ''), 5000)
+
+    # Get author
+    author = entry.get('author', '') or entry.get('dc_creator', '')
+
+    # Parse date; feedparser's *_parsed tuples are UTC
+    published_date = None
+    if entry.get('published_parsed'):
+        try:
+            published_date = datetime(*entry.published_parsed[:6], tzinfo=timezone.utc)
+        except (TypeError, ValueError):
+            pass
+
+    if not published_date and 'published' in entry:
+        published_date = parse_date(entry.get('published'), feed_url)
+
+    # One scan for candidates; the parser's own pick is the first that looks like an image
+    image_start = time.perf_counter()
+    image_candidates = entry_image_candidates(entry, feed_url)
+    image_url = next((candidate for candidate in image_candidates if is_valid_image_url(candidate)), None)
+    return EntryRecord(
+        title=title[:500],  # Truncate if too long
+        url=url,
+        description=description[:1000] if description else None,
+        content=content[:5000] if content else None,  # Truncate content
+        author=author[:100] if author else None,
+        published_at=published_date,
+        image_url=image_url,
+        image_seconds=time.perf_counter() - image_start,
+        image_candidates=image_candidates,
+        signature=signature(title, description),
+        canonical_url=canonical_url(url)
+    )
+
+def parse_feed_content(content: bytes, feed_url: str, known_urls: FrozenSet[str] = frozenset(),
+                       stop_after_known: int = 0) -> ParsedFeed:
+    """Parse a fetched feed body into normalised records for the entries not in known_urls
+
+    Entries whose canonical URL is in known_urls are skipped before any cleaning
+    or image extraction. With stop_after_known set, a run of that many
+    consecutive known entries ends the feed, which is safe for feeds ordered
+    newest-first.
+    """
+    start = time.perf_counter()
+    # Lets the date handler feedparser calls memoise this feed's date format
+    DATE_PARSER.current_feed = feed_url
+    try:
+        parsed = feedparser.parse(content)
+    finally:
+        DATE_PARSER.current_feed = None
+    result = ParsedFeed(bozo=bool(parsed.bozo))
+    # Records hold plain values only; each FeedParserDict is dropped once
+    # normalised, and the rest of the parse tree right away
+    entries = parsed.entries
+    del parsed
+    entries.reverse()
+    consecutive_known = 0
+    while entries:
+        entry = entries.pop()
+        result.entries_seen += 1
+        if canonical_url(entry_link(entry)) in known_urls:
+            result.known_skipped += 1
+            consecutive_known += 1
+            if stop_after_known and consecutive_known >= stop_after_known:
+                result.stopped_early = True
+                break
+            continue
+        consecutive_known = 0
+
+        record = normalise_entry(entry, feed_url)
+        if record:
+            result.entries.append(record)
+    result.parse_seconds = time.perf_counter() - start
+    return result
@@ -5,19 +5,39 @@ Parses RSS/Atom feeds and stores articles in SQLite database
 """
 
 import sqlite3
-import feedparser
-import requests
 import asyncio
-import aiohttp
 import logging
-import re
+import uuid
+import hashlib
+import heapq
+import signal
+import time
+import os
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from typing import List, Dict, Optional
-from urllib.parse import urljoin, urlparse
-from pathlib import Path
+from urllib.parse import urlparse
 import argparse
 from dataclasses import dataclass
 
+import aiohttp
+
+from canonical_urls import backfill as backfill_canonical_urls, canonical_url, ensure_canonical_column
+from date_parsing import parse_date, to_db_datetime
+from entry_parsing import EntryRecord, ParsedFeed, clean_html, entry_link, parse_feed_content
+from feed_stats import ensure_feed_stats
+from host_health import HostBreakers, host_of
+from http_transport import BodyTooLarge, HttpTransport, TransportConfig
+from image_extraction import extract_entry_image, find_scraper, is_valid_image_url
+from image_probe import ImageProber, ProbeCache
+from metrics import IngestMetrics
+from near_duplicates import DuplicateIndex
+from newshub_db import ARCHIVE_SCHEMA, add_db_argument, attach_archive, connect, resolve_db_path
+from page_scraper import PageImageScraper, ScrapeCache
+from search_index import ensure_search_index
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -33,449 +53,486 @@ class Article:
     published_at: Optional[datetime]
     feed_id: int
     category_id: int
+    signature: Optional[bytes] = None
+    # Dedup key; derived from url when not given
+    canonical_url: Optional[str] = None
+
+    def __post_init__(self):
+        if self.canonical_url is None:
+            self.canonical_url = canonical_url(self.url)
+
+@dataclass
+class FeedRecord:
+    """An active feed as the parser and scheduler hold it; slotted, one per feed for the whole run"""
+    __slots__ = ('id', 'name', 'url', 'category_id', 'interval', 'etag', 'last_modified',
+                 'content_hash', 'error_count', 'last_fetched')
+    id: int
+    name: str
+    url: str
+    category_id: int
+    # fetchIntervalMinutes
+    interval: Optional[int]
+    etag: Optional[str]
+    last_modified: Optional[str]
+    content_hash: Optional[str]
+    error_count: Optional[int]
+    last_fetched: Optional[str]
+
+# In FeedRecord field order
+FEED_COLUMNS = ('f.id', 'f.name', 'f.url', 'f.categoryId', 'f.fetchIntervalMinutes', 'f.etag',
+                'f.lastModified', 'f.contentHash', 'f.errorCount', 'f.lastFetched')
+
+@dataclass
+class FetchResult:
+    parsed_feed: Optional[ParsedFeed]
+    not_modified: bool = False
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content_hash: Optional[str] = None
+
+class ArticleStore:
+    """Persists articles over a single SQLite connection kept open for the run"""
+
+    # Stay below SQLITE_MAX_VARIABLE_NUMBER (999 on older SQLite builds)
+    MAX_VARIABLES = 900
+
+    # Columns the parser keeps on feeds for conditional GETs (mirrored in feed.entity.ts)
+    FEED_CACHE_COLUMNS = ('etag', 'lastModified', 'contentHash')
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = str(resolve_db_path(db_path))
+        self._conn = None
+        self.duplicates = None
+        # Whether retention.py's archive is attached; checked again until it is
+        self.has_archive = False
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Open the connection on first use"""
+        if self._conn is None:
+            self._conn = connect(self.db_path)
+            self.ensure_schema()
+        return self._conn
+
+    def ensure_schema(self):
+        """Add parser-owned columns, tables and indexes missing from older databases"""
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(feeds)")}
+        with self._conn:
+            for column in self.FEED_CACHE_COLUMNS:
+                if column not in existing:
+                    self._conn.execute(f"ALTER TABLE feeds ADD COLUMN {column} varchar")
+        if ensure_canonical_column(self._conn):
+            backfill_canonical_urls(self._conn)
+        # Triggers index every article written from here on
+        if ensure_search_index(self._conn):
+            logger.info("Built the articles_fts search index")
+        if ensure_feed_stats(self._conn):
+            logger.info("Built the feed and category statistics")
+        self.duplicates = DuplicateIndex(self._conn)
+        self.duplicates.ensure_schema()
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+            self.duplicates = None
+            self.has_archive = False
+
+    def existing_urls(self, urls: List[str]) -> set:
+        """Return the subset of canonical urls already stored in articles or archived"""
+        found = set()
+        unique_urls = list(dict.fromkeys(urls))
+        if not self.has_archive:
+            # retention.py may have created the archive since the last call
+            self.has_archive = attach_archive(self.conn, self.db_path)
+        for start in range(0, len(unique_urls), self.MAX_VARIABLES // 2):
+            chunk = unique_urls[start:start + self.MAX_VARIABLES // 2]
+            placeholders = ','.join('?' * len(chunk))
+            sql = f"SELECT canonicalUrl FROM main.articles WHERE canonicalUrl IN ({placeholders})"
+            if self.has_archive:
+                sql += f" UNION ALL SELECT canonicalUrl FROM {ARCHIVE_SCHEMA}.articles WHERE canonicalUrl IN ({placeholders})"
+                chunk = chunk * 2
+            found.update(row[0] for row in self.conn.execute(sql, chunk))
+        return found
+
+    def save_articles(self, articles: List[Article]) -> int:
+        """Insert new articles in one transaction, returning how many were stored
+
+        Raises sqlite3.Error when the batch was rolled back, so the caller
+        keeps the feed's validators and the entries are fetched again.
+        """
+        if not articles:
+            return 0
+
+        seen = self.existing_urls([article.canonical_url for article in articles])
+        new_articles = []
+        for article in articles:
+            if article.canonical_url in seen:
+                logger.debug(f"Article already exists: {article.url}")
+                continue
+            seen.add(article.canonical_url)
+            new_articles.append(article)
+
+        if not new_articles:
+            return 0
+
+        saved = 0
+        try:
+            with self.conn:
+                # Clustered one by one in the transaction, so duplicates within the batch match too
+                for article in new_articles:
+                    article_id = str(uuid.uuid4())
+                    cluster_id = self.duplicates.cluster_for(article_id, article.signature)
+                    cursor = self.conn.execute("""
+                        INSERT OR IGNORE INTO articles (
+                            id, title, description, content, url, canonicalUrl, imageUrl, author, 
+                            publishedAt, feedId, categoryId, clusterId, viewCount, bookmarkCount, 
+                            isActive, createdAt, updatedAt
+                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0, 0, 1, datetime('now'), datetime('now'))
+                    """, (
+                        article_id,
+                        article.title,
+                        article.description,
+                        article.content,
+                        article.url,
+                        article.canonical_url,
+                        article.image_url,
+                        article.author,
+                        to_db_datetime(article.published_at),
+                        article.feed_id,
+                        article.category_id,
+                        cluster_id
+                    ))
+                    # INSERT OR IGNORE skips rows raced in by another writer or stored under
+                    # another canonical URL; only stored rows get a signature. rowcount,
+                    # unlike total_changes, leaves out the search index triggers' writes.
+                    if cursor.rowcount == 1:
+                        self.duplicates.record(article_id, cluster_id, article.signature)
+                        saved += 1
+                        logger.debug(f"Saved article: {article.title}")
+        except sqlite3.Error as e:
+            logger.error(f"Database error saving articles: {str(e)}")
+            raise
+
+        return saved
+
+class KnownUrlIndex:
+    """Per-feed sets of stored canonical article URLs, kept current from the articles rowid
+
+    Sets are kept for the feeds fetched most recently, up to max_cached_urls
+    URLs in all, so memory stays flat however many feeds there are; an evicted
+    feed's set is reloaded on its next fetch.
+    """
+
+    def __init__(self, store: ArticleStore, max_urls_per_feed: int = 5000, max_cached_urls: int = 500000):
+        self.store = store
+        self.max_urls_per_feed = max_urls_per_feed
+        self.max_cached_urls = max_cached_urls
+        self._urls: 'OrderedDict[int, set]' = OrderedDict()
+        self._cached = 0
+        self._last_rowid = self.store.conn.execute(
+            "SELECT COALESCE(MAX(rowid), 0) FROM articles"
+        ).fetchone()[0]
+
+    def load(self, feed_id: int) -> set:
+        # Feeds only carry their latest entries, so the newest URLs are enough
+        cursor = self.store.conn.execute("""
+            SELECT canonicalUrl FROM articles WHERE feedId = ? AND canonicalUrl IS NOT NULL
+            ORDER BY createdAt DESC LIMIT ?
+        """, (feed_id, self.max_urls_per_feed))
+        urls = {row[0] for row in cursor}
+        self._cached += len(urls) - len(self._urls.pop(feed_id, ()))
+        self._urls[feed_id] = urls
+        # Least recently fetched first; the feed just loaded always stays
+        while self._cached > self.max_cached_urls and len(self._urls) > 1:
+            _, evicted = self._urls.popitem(last=False)
+            self._cached -= len(evicted)
+        return urls
+
+    def _extend(self, feed_id: int, urls):
+        known = self._urls.get(feed_id)
+        if known is not None:
+            before = len(known)
+            known.update(urls)
+            self._cached += len(known) - before
+
+    def refresh(self):
+        """Pick up rows inserted since the last refresh, by any writer"""
+        cursor = self.store.conn.execute(
+            "SELECT rowid, feedId, canonicalUrl FROM articles WHERE rowid > ? ORDER BY rowid",
+            (self._last_rowid,)
+        )
+        for rowid, feed_id, url in cursor:
+            self._last_rowid = rowid
+            if url:
+                self._extend(feed_id, (url,))
+
+    def urls_for(self, feed_id: int) -> frozenset:
+        urls = self._urls.get(feed_id)
+        # Reload long-running daemon sets once they outgrow the cap
+        if urls is None or len(urls) > 2 * self.max_urls_per_feed:
+            urls = self.load(feed_id)
+        else:
+            self._urls.move_to_end(feed_id)
+        return frozenset(urls)
+
+    def add(self, feed_id: int, urls: List[str]):
+        self._extend(feed_id, urls)
 
 class RSSParser:
-    def __init__(self, db_path: str = "newshub.sqlite"):
-        self.db_path = db_path
+    def __init__(self, db_path: Optional[str] = None, max_concurrency: int = 10,
+                 per_host_limit: int = 2, parse_workers: Optional[int] = None,
+                 stop_after_known: int = 0, max_body_bytes: int = 10 * 1024 * 1024,
+                 metrics: Optional[IngestMetrics] = None, probe_images: bool = True,
+                 probe_per_host: int = 2, breaker_threshold: int = 5,
+                 breaker_open_minutes: float = 5, max_timeout: float = 30.0,
+                 known_url_budget: int = 500000):
+        self.db_path = str(resolve_db_path(db_path))
+        self.metrics = metrics or IngestMetrics()
         self.session = None
+        self.transport = None
+        self.max_body_bytes = max_body_bytes
+        # 0 parses in-process, which is easier to debug and profile
+        self.parse_workers = (os.cpu_count() or 1) if parse_workers is None else parse_workers
+        self._parse_executor = None
+        self.page_scraper = None
+        # Rank each entry's image candidates by their real size instead of taking the first
+        self.probe_images = probe_images
+        self.probe_per_host = max(1, probe_per_host)
+        self.image_prober = None
+        # Per-host circuit breakers and latency-based timeouts, persisted in host_health
+        self.breaker_threshold = breaker_threshold
+        self.breaker_open_seconds = breaker_open_minutes * 60
+        self.max_timeout = max_timeout
+        self.breakers = None
+        self.store = ArticleStore(self.db_path)
+        self.known_urls = None
+        # Known article URLs held in memory across all feeds
+        self.known_url_budget = known_url_budget
+        # 0 reads every entry; N stops a feed after N consecutive known entries
+        self.stop_after_known = stop_after_known
+        self.max_concurrency = max(1, max_concurrency)
+        self.per_host_limit = max(1, per_host_limit)
+        self._global_semaphore = None
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
         
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession(
-            timeout=aiohttp.ClientTimeout(total=30),
-            headers={'User-Agent': 'NewsHub RSS Parser 1.0'}
-        )
+        self.transport = HttpTransport(TransportConfig(
+            user_agent='NewsHub RSS Parser 1.0',
+            limit_per_host=self.per_host_limit,
+            max_body_bytes=self.max_body_bytes,
+            total_timeout=self.max_timeout
+        ))
+        self.session = await self.transport.open()
+        self.breakers = HostBreakers(self.store.conn, failure_threshold=self.breaker_threshold,
+                                     open_seconds=self.breaker_open_seconds, max_timeout=self.max_timeout)
+        self.page_scraper = PageImageScraper(self.session, ScrapeCache(self.store.conn))
+        if self.probe_images:
+            self.image_prober = ImageProber(self.session, ProbeCache(self.store.conn),
+                                            per_host_limit=self.probe_per_host,
+                                            counter=self.metrics.image_probes)
+        self.known_urls = KnownUrlIndex(self.store, max_cached_urls=self.known_url_budget)
+        if self.parse_workers > 0:
+            # spawn avoids forking a process that has resolver threads running
+            self._parse_executor = ProcessPoolExecutor(
+                max_workers=self.parse_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.session:
-            await self.session.close()
+        if self.transport:
+            await self.transport.close()
+            self.session = None
+        if self._parse_executor:
+            self._parse_executor.shutdown()
+            self._parse_executor = None
+        self.page_scraper = None
+        self.image_prober = None
+        if self.breakers:
+            self.breakers.save_all()
+            self.breakers = None
+        self.store.close()
 
     def get_db_connection(self):
         """Get SQLite database connection"""
-        return sqlite3.connect(self.db_path)
+        return connect(self.db_path)
     
-    def get_active_feeds(self) -> List[Dict]:
+    def get_active_feeds(self) -> List[FeedRecord]:
         """Get all active RSS feeds from database"""
-        conn = self.get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT f.id, f.name, f.url, f.categoryId, f.fetchIntervalMinutes
+        cursor = self.store.conn.execute(f"""
+            SELECT {', '.join(FEED_COLUMNS)}
             FROM feeds f
             WHERE f.isActive = 1
         """)
-        
-        feeds = []
-        for row in cursor.fetchall():
-            feeds.append({
-                'id': row[0],
-                'name': row[1],
-                'url': row[2],
-                'category_id': row[3],
-                'interval': row[4]
-            })
-        
-        conn.close()
-        return feeds
+        return [FeedRecord(*row) for row in cursor]
     
-    async def fetch_feed(self, feed_url: str) -> Optional[dict]:
-        """Fetch and parse RSS feed"""
+    async def fetch_feed(self, feed: FeedRecord) -> Optional[FetchResult]:
+        """Fetch and parse RSS feed, skipping the parse when it is unchanged"""
+        feed_url = feed.url
+        feed_label = feed.id
+        headers = {}
+        if feed.etag:
+            headers['If-None-Match'] = feed.etag
+        if feed.last_modified:
+            headers['If-Modified-Since'] = feed.last_modified
+        
+        host = host_of(feed_url)
+        # Whether the host answered, for its breaker: None until the fetch tells
+        host_ok, host_error = None, None
+        start = time.perf_counter()
+        # Time to the end of the response, for the breaker's latency; parse time stays out
+        elapsed = None
+        responded = False
         try:
-            async with self.session.get(feed_url) as response:
+            async with self.session.get(feed_url, headers=headers,
+                                        timeout=self.breakers.timeout_for(host)) as response:
+                responded = True
+                self.metrics.fetches.inc(feed=feed_label, status=response.status)
+                # Overloaded or rate limiting: back off the host. Any other answer means it is up
+                host_ok = response.status < 500 and response.status != 429
+                if not host_ok:
+                    host_error = f"HTTP {response.status}"
+                if response.status == 304:
+                    elapsed = time.perf_counter() - start
+                    self.metrics.fetch_seconds.observe(elapsed, host=host)
+                    logger.debug(f"Feed not modified: {feed_url}")
+                    return FetchResult(
+                        parsed_feed=None,
+                        not_modified=True,
+                        etag=response.headers.get('ETag') or feed.etag,
+                        last_modified=response.headers.get('Last-Modified') or feed.last_modified,
+                        content_hash=feed.content_hash
+                    )
+                
                 if response.status != 200:
+                    elapsed = time.perf_counter() - start
+                    self.metrics.fetch_seconds.observe(elapsed, host=host)
                     logger.error(f"Failed to fetch {feed_url}: HTTP {response.status}")
                     return None
                 
-                content = await response.text()
-                parsed_feed = feedparser.parse(content)
+                # Raw bytes: feedparser detects the charset itself
+                host_ok = None
+                content = await self.transport.read_body(response)
+                elapsed = time.perf_counter() - start
+                host_ok = True
+                self.metrics.fetch_seconds.observe(elapsed, host=host)
+                self.metrics.fetch_bytes.inc(len(content), feed=feed_label)
+                result = FetchResult(
+                    parsed_feed=None,
+                    etag=response.headers.get('ETag'),
+                    last_modified=response.headers.get('Last-Modified'),
+                    content_hash=hashlib.sha256(content).hexdigest()
+                )
+                
+                # Fallback for servers without validators: identical bytes mean nothing new
+                if result.content_hash == feed.content_hash:
+                    logger.debug(f"Feed body unchanged: {feed_url}")
+                    result.not_modified = True
+                    return result
+                
+                result.parsed_feed = await self.parse_content(
+                    content, feed_url, self.known_urls.urls_for(feed.id)
+                )
+                self.metrics.parse_seconds.observe(result.parsed_feed.parse_seconds)
                 
-                if parsed_feed.bozo:
+                if result.parsed_feed.bozo:
                     logger.warning(f"Feed may have issues: {feed_url}")
                 
-                return parsed_feed
+                return result
                 
+        except BodyTooLarge as e:
+            elapsed = time.perf_counter() - start
+            host_ok = True
+            logger.error(f"Feed too large, skipped: {str(e)}")
+            return None
         except Exception as e:
-            logger.error(f"Error fetching feed {feed_url}: {str(e)}")
+            if elapsed is None:
+                elapsed = time.perf_counter() - start
+            logger.error(f"Error fetching feed {feed_url}: {str(e) or type(e).__name__}")
+            if not responded:
+                # No response at all: DNS, connect, TLS or timeout
+                self.metrics.fetches.inc(feed=feed_label, status='error')
+            if host_ok is None and isinstance(e, (aiohttp.ClientError, asyncio.TimeoutError)):
+                # Before or while reading the body; parse errors leave host_ok set
+                host_ok, host_error = False, str(e) or type(e).__name__
             return None
+        finally:
+            self.breakers.record(host, host_ok, elapsed, host_error)
+            self.metrics.hosts_circuit_open.set(self.breakers.open_hosts())
+    
+    async def parse_content(self, content: bytes, feed_url: str,
+                            known_urls: frozenset = frozenset()) -> ParsedFeed:
+        """Parse a feed body in the process pool so downloads keep flowing"""
+        if not self._parse_executor:
+            return parse_feed_content(content, feed_url, known_urls, self.stop_after_known)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._parse_executor, parse_feed_content,
+                                          content, feed_url, known_urls, self.stop_after_known)
     
     def extract_image_url(self, entry: dict, feed_url: str) -> Optional[str]:
         """Extract image URL from RSS entry"""
-        # Try different methods to find image
-        image_url = None
-        
-        # Method 1: Check for media content
-        if 'media_content' in entry and entry.media_content:
-            for media in entry.media_content:
-                if media.get('medium') == 'image' or 'image' in media.get('type', ''):
-                    image_url = media.get('url')
-                    break
-        
-        # Method 2: Check for enclosures
-        if not image_url and 'enclosures' in entry:
-            for enclosure in entry.enclosures:
-                if enclosure.type and 'image' in enclosure.type:
-                    image_url = enclosure.href
-                    break
-        
-        # Method 3: Check for media thumbnail
-        if not image_url and 'media_thumbnail' in entry and entry.media_thumbnail:
-            image_url = entry.media_thumbnail[0].get('url')
-        
-        # Method 4: Check for itunes:image or other image fields
-        if not image_url:
-            # Check for various image fields in entry
-            for field in ['image', 'itunes_image', 'media_thumbnail']:
-                if hasattr(entry, field) and getattr(entry, field):
-                    img_data = getattr(entry, field)
-                    if isinstance(img_data, str):
-                        image_url = img_data
-                        break
-                    elif isinstance(img_data, dict) and 'url' in img_data:
-                        image_url = img_data['url']
-                        break
-                    elif isinstance(img_data, list) and img_data and 'url' in img_data[0]:
-                        image_url = img_data[0]['url']
-                        break
-        
-        # Method 5: Extract from description or content (enhanced)
-        if not image_url:
-            content = entry.get('description', '') or entry.get('summary', '')
-            if 'content' in entry and entry.content:
-                if isinstance(entry.content, list) and entry.content:
-                    content = entry.content[0].get('value', '')
-                else:
-                    content = str(entry.content)
-            
-            if content:
-                # Try multiple image extraction patterns
-                patterns = [
-                    r'<img[^>]+src=["\']([^"\']+)["\'][^>]*>',
-                    r'<img[^>]+src=([^>\s]+)[^>]*>',
-                    r'src=["\']([^"\']*\.(jpg|jpeg|png|gif|webp))["\']',
-                    r'(https?://[^\s<>"]+\.(jpg|jpeg|png|gif|webp))',
-                ]
-                
-                for pattern in patterns:
-                    img_match = re.search(pattern, content, re.IGNORECASE)
-                    if img_match:
-                        image_url = img_match.group(1)
-                        break
-        
-        # Method 6: For specific feed types, try web scraping (light scraping)
-        if not image_url and feed_url:
-            try:
-                # Get domain from feed URL for targeted extraction
-                domain = urlparse(feed_url).netloc.lower()
-                article_url = entry.get('link', '')
-                
-                # For TechCrunch, try to get featured image from article page
-                if 'techcrunch.com' in domain and article_url:
-                    image_url = self.extract_techcrunch_image(article_url)
-                # For The Verge, extract from article page
-                elif 'theverge.com' in domain and article_url:
-                    image_url = self.extract_verge_image(article_url)
-                    
-            except Exception as e:
-                logger.debug(f"Error in web scraping for image: {str(e)}")
-        
-        # Convert relative URLs to absolute
-        if image_url and not image_url.startswith(('http://', 'https://')):
-            image_url = urljoin(feed_url, image_url)
-        
-        # Validate image URL
-        if image_url and self.is_valid_image_url(image_url):
-            return image_url
-        
-        return None
+        return extract_entry_image(entry, feed_url)
         
     def is_valid_image_url(self, url: str) -> bool:
         """Validate if URL looks like an image"""
-        if not url:
-            return False
-            
-        # Check if URL has image extension
-        image_extensions = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg', '.bmp')
-        url_lower = url.lower()
-        
-        # Direct image file check
-        if any(url_lower.endswith(ext) for ext in image_extensions):
-            return True
-            
-        # Check for common image URL patterns
-        if any(pattern in url_lower for pattern in ['image', 'img', 'photo', 'picture']):
-            return True
-            
-        return False
+        return is_valid_image_url(url)
     
-    async def extract_techcrunch_image(self, article_url: str) -> Optional[str]:
-        """Extract featured image from TechCrunch article"""
-        try:
-            async with self.session.get(article_url) as response:
-                if response.status == 200:
-                    content = await response.text()
-                    # Look for featured image in meta tags
-                    patterns = [
-                        r'<meta property="og:image" content="([^"]+)"',
-                        r'<meta name="twitter:image" content="([^"]+)"',
-                        r'<img[^>]+class="[^"]*featured-image[^"]*"[^>]+src="([^"]+)"',
-                    ]
-                    
-                    for pattern in patterns:
-                        match = re.search(pattern, content)
-                        if match:
-                            return match.group(1)
-        except Exception as e:
-            logger.debug(f"Error extracting TechCrunch image: {str(e)}")
-        return None
+    async def scrape_article_image(self, article_url: str, feed_url: str) -> Optional[str]:
+        """Scrape the article page for an image on sites whose feeds lack one"""
+        # Only feeds with a registered site scraper are worth a page fetch
+        scraper = find_scraper(feed_url)
+        if not scraper or not article_url:
+            return None
+        _, image_url = await self.page_scraper.scrape(article_url, scraper)
+        return image_url
     
-    async def extract_verge_image(self, article_url: str) -> Optional[str]:
-        """Extract featured image from The Verge article"""
-        try:
-            async with self.session.get(article_url) as response:
-                if response.status == 200:
-                    content = await response.text()
-                    # Look for featured image in meta tags
-                    patterns = [
-                        r'<meta property="og:image" content="([^"]+)"',
-                        r'<meta name="twitter:image" content="([^"]+)"',
-                        r'<img[^>]+data-original="([^"]+)"',
-                    ]
-                    
-                    for pattern in patterns:
-                        match = re.search(pattern, content)
-                        if match:
-                            return match.group(1)
-        except Exception as e:
-            logger.debug(f"Error extracting Verge image: {str(e)}")
-        return None
-        
-    async def extract_sciencedaily_image(self, article_url: str) -> Optional[str]:
-        """Extract featured image from Science Daily article"""
-        try:
-            async with self.session.get(article_url) as response:
-                if response.status == 200:
-                    content = await response.text()
-                    # Look for featured image in meta tags or specific Science Daily patterns
-                    patterns = [
-                        r'<meta property="og:image" content="([^"]+)"',
-                        r'<meta name="twitter:image" content="([^"]+)"',
-                        r'<img[^>]+id="story_image"[^>]+src="([^"]+)"',
-                        r'<img[^>]+class="[^"]*story-image[^"]*"[^>]+src="([^"]+)"',
-                    ]
-                    
-                    for pattern in patterns:
-                        match = re.search(pattern, content)
-                        if match:
-                            return match.group(1)
-        except Exception as e:
-            logger.debug(f"Error extracting Science Daily image: {str(e)}")
-        return None
-        
+    async def choose_images(self, records: List[EntryRecord]) -> List[Optional[str]]:
+        """Each record's image: its best probed candidate, or without probing the parser's first guess"""
+        if not self.image_prober:
+            return [record.image_url for record in records]
+        start = time.perf_counter()
+        chosen = await asyncio.gather(*(self.image_prober.choose(record.image_candidates)
+                                        for record in records))
+        if records:
+            # All of a feed's candidates are probed together; count each record's share
+            elapsed = (time.perf_counter() - start) / len(records)
+            for _ in records:
+                self.metrics.image_seconds.observe(elapsed, method='probe')
+        return [info.url if info else None for info in chosen]
+
     async def extract_image_url_async(self, entry: dict, feed_url: str) -> Optional[str]:
         """Async version of extract_image_url with web scraping capability"""
-        # First try all the non-async methods
-        image_url = None
-        
-        # Method 1: Check for media content
-        if 'media_content' in entry and entry.media_content:
-            for media in entry.media_content:
-                if media.get('medium') == 'image' or 'image' in media.get('type', ''):
-                    image_url = media.get('url')
-                    break
-        
-        # Method 2: Check for enclosures
-        if not image_url and 'enclosures' in entry:
-            for enclosure in entry.enclosures:
-                if enclosure.type and 'image' in enclosure.type:
-                    image_url = enclosure.href
-                    break
-        
-        # Method 3: Check for media thumbnail
-        if not image_url and 'media_thumbnail' in entry and entry.media_thumbnail:
-            image_url = entry.media_thumbnail[0].get('url')
-        
-        # Method 4: Check for itunes:image or other image fields
-        if not image_url:
-            # Check for various image fields in entry
-            for field in ['image', 'itunes_image', 'media_thumbnail']:
-                if hasattr(entry, field) and getattr(entry, field):
-                    img_data = getattr(entry, field)
-                    if isinstance(img_data, str):
-                        image_url = img_data
-                        break
-                    elif isinstance(img_data, dict) and 'url' in img_data:
-                        image_url = img_data['url']
-                        break
-                    elif isinstance(img_data, list) and img_data and 'url' in img_data[0]:
-                        image_url = img_data[0]['url']
-                        break
-        
-        # Method 5: Extract from description or content (enhanced)
-        if not image_url:
-            content = entry.get('description', '') or entry.get('summary', '')
-            if 'content' in entry and entry.content:
-                if isinstance(entry.content, list) and entry.content:
-                    content = entry.content[0].get('value', '')
-                else:
-                    content = str(entry.content)
-            
-            if content:
-                # Try multiple image extraction patterns
-                patterns = [
-                    r'<img[^>]+src=["\']([^"\']+)["\'][^>]*>',
-                    r'<img[^>]+src=([^>\s]+)[^>]*>',
-                    r'src=["\']([^"\']*\.(jpg|jpeg|png|gif|webp))["\']',
-                    r'(https?://[^\s<>"]+\.(jpg|jpeg|png|gif|webp))',
-                ]
-                
-                for pattern in patterns:
-                    img_match = re.search(pattern, content, re.IGNORECASE)
-                    if img_match:
-                        image_url = img_match.group(1)
-                        break
-        
-        # Method 6: For specific feed types, try web scraping (async)
-        if not image_url and feed_url:
-            try:
-                # Get domain from feed URL for targeted extraction
-                domain = urlparse(feed_url).netloc.lower()
-                article_url = entry.get('link', '')
-                
-                # For TechCrunch, try to get featured image from article page
-                if 'techcrunch.com' in domain and article_url:
-                    image_url = await self.extract_techcrunch_image(article_url)
-                # For The Verge, extract from article page
-                elif 'theverge.com' in domain and article_url:
-                    image_url = await self.extract_verge_image(article_url)
-                # For Science Daily, try scraping
-                elif 'sciencedaily.com' in domain and article_url:
-                    image_url = await self.extract_sciencedaily_image(article_url)
-                    
-            except Exception as e:
-                logger.debug(f"Error in web scraping for image: {str(e)}")
-        
-        # Convert relative URLs to absolute
-        if image_url and not image_url.startswith(('http://', 'https://')):
-            image_url = urljoin(feed_url, image_url)
-        
-        # Validate image URL
-        if image_url and self.is_valid_image_url(image_url):
-            return image_url
-        
-        return None
+        return (extract_entry_image(entry, feed_url)
+                or await self.scrape_article_image(entry_link(entry), feed_url))
     
-    def clean_html(self, text: str) -> str:
+    def clean_html(self, text: str, max_length: Optional[int] = None) -> str:
         """Remove HTML tags from text"""
-        if not text:
-            return ""
-        
-        # Remove HTML tags
-        clean = re.sub(r'<[^>]+>', '', text)
-        # Replace common HTML entities
-        clean = clean.replace('&amp;', '&')
-        clean = clean.replace('&lt;', '<')
-        clean = clean.replace('&gt;', '>')
-        clean = clean.replace('&quot;', '"')
-        clean = clean.replace('&#39;', "'")
-        clean = clean.replace('&nbsp;', ' ')
-        
-        return clean.strip()
+        return clean_html(text, max_length)
     
-    def parse_date(self, date_str: str) -> Optional[datetime]:
-        """Parse various date formats"""
-        if not date_str:
-            return None
-        
-        try:
-            # Try feedparser's date parsing first
-            parsed = feedparser._parse_date(date_str)
-            if parsed:
-                return datetime(*parsed[:6])
-        except:
-            pass
-        
-        # Common date formats
-        date_formats = [
-            '%a, %d %b %Y %H:%M:%S %Z',
-            '%a, %d %b %Y %H:%M:%S %z',
-            '%Y-%m-%dT%H:%M:%S%z',
-            '%Y-%m-%dT%H:%M:%SZ',
-            '%Y-%m-%d %H:%M:%S',
-            '%Y-%m-%d',
-        ]
-        
-        for fmt in date_formats:
-            try:
-                return datetime.strptime(date_str, fmt)
-            except ValueError:
-                continue
-        
-        logger.warning(f"Could not parse date: {date_str}")
-        return None
+    def parse_date(self, date_str: str, feed_url: Optional[str] = None) -> Optional[datetime]:
+        """Parse various date formats into an aware UTC datetime"""
+        return parse_date(date_str, feed_url)
     
     def article_exists(self, url: str) -> bool:
         """Check if article already exists in database"""
-        conn = self.get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT id FROM articles WHERE url = ?", (url,))
-        exists = cursor.fetchone() is not None
-        
-        conn.close()
-        return exists
+        return bool(self.store.existing_urls([canonical_url(url)]))
     
     def save_article(self, article: Article) -> bool:
         """Save article to database"""
-        if self.article_exists(article.url):
-            logger.debug(f"Article already exists: {article.url}")
-            return False
-        
-        conn = self.get_db_connection()
-        cursor = conn.cursor()
-        
         try:
-            # Generate UUID for article (simplified)
-            import uuid
-            article_id = str(uuid.uuid4())
-            
-            cursor.execute("""
-                INSERT INTO articles (
-                    id, title, description, content, url, imageUrl, author, 
-                    publishedAt, feedId, categoryId, viewCount, bookmarkCount, 
-                    isActive, createdAt, updatedAt
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0, 0, 1, datetime('now'), datetime('now'))
-            """, (
-                article_id,
-                article.title,
-                article.description,
-                article.content,
-                article.url,
-                article.image_url,
-                article.author,
-                article.published_at,
-                article.feed_id,
-                article.category_id
-            ))
-            
-            conn.commit()
-            logger.info(f"Saved article: {article.title}")
-            return True
-            
-        except sqlite3.Error as e:
-            logger.error(f"Database error saving article: {str(e)}")
-            conn.rollback()
+            return self.store.save_articles([article]) == 1
+        except sqlite3.Error:
             return False
-        finally:
-            conn.close()
     
-    def update_feed_status(self, feed_id: int, success: bool, error_msg: str = None):
-        """Update feed fetch status"""
-        conn = self.get_db_connection()
-        cursor = conn.cursor()
+    def update_feed_status(self, feed_id: int, success: bool, error_msg: str = None,
+                           fetch_result: FetchResult = None):
+        """Update feed fetch status and, on success, the conditional GET validators"""
+        conn = self.store.conn
         
-        try:
+        with conn:
             if success:
-                cursor.execute("""
+                conn.execute("""
                     UPDATE feeds 
                     SET lastFetched = datetime('now'), 
                         fetchCount = fetchCount + 1,
@@ -483,117 +540,330 @@ class RSSParser:
                         lastError = NULL
                     WHERE id = ?
                 """, (feed_id,))
+                if fetch_result:
+                    conn.execute("""
+                        UPDATE feeds 
+                        SET etag = ?, lastModified = ?, contentHash = ?
+                        WHERE id = ?
+                    """, (fetch_result.etag, fetch_result.last_modified,
+                          fetch_result.content_hash, feed_id))
             else:
-                cursor.execute("""
+                conn.execute("""
                     UPDATE feeds 
                     SET errorCount = errorCount + 1,
                         lastError = ?,
                         updatedAt = datetime('now')
                     WHERE id = ?
                 """, (error_msg, feed_id))
-            
-            conn.commit()
-        finally:
-            conn.close()
     
-    async def process_feed(self, feed: Dict) -> int:
+    async def process_feed(self, feed: FeedRecord) -> int:
         """Process a single RSS feed"""
-        logger.info(f"Processing feed: {feed['name']} ({feed['url']})")
+        logger.info(f"Processing feed: {feed.name} ({feed.url})")
+        
+        metrics = self.metrics
+        feed_label = feed.id
+        self.known_urls.refresh()
+        host = host_of(feed.url)
+        if not self.breakers.allow(host):
+            # Not the feed's fault, so its error count and backoff are left alone
+            metrics.feeds_processed.inc(result='circuit_open')
+            logger.info(f"Skipped {feed.name}: circuit open for {host} "
+                        f"until {datetime.fromtimestamp(self.breakers.retry_at(host) or time.time()):%H:%M:%S}")
+            return 0
+        fetch_result = await self.fetch_feed(feed)
+        if not fetch_result:
+            self.update_feed_status(feed.id, False, "Failed to fetch feed")
+            metrics.feeds_processed.inc(result='failed')
+            return 0
         
-        parsed_feed = await self.fetch_feed(feed['url'])
-        if not parsed_feed:
-            self.update_feed_status(feed['id'], False, "Failed to fetch feed")
+        if fetch_result.not_modified:
+            self.update_feed_status(feed.id, True, fetch_result=fetch_result)
+            metrics.feeds_processed.inc(result='not_modified')
+            metrics.last_success.set(time.time())
+            logger.info(f"Processed {feed.name}: not modified")
             return 0
         
+        parsed_feed = fetch_result.parsed_feed
+        metrics.entries_seen.inc(parsed_feed.entries_seen, feed=feed_label)
+        
         articles_saved = 0
+        articles = []
         
         try:
-            for entry in parsed_feed.entries:
-                # Extract article data
-                title = self.clean_html(entry.get('title', ''))
-                if not title:
-                    continue
-                
-                url = entry.get('link', '')
-                if not url:
-                    continue
-                
-                description = self.clean_html(entry.get('description', ''))
-                
-                # Get content
-                content = ""
-                if 'content' in entry:
-                    content = self.clean_html(entry.content[0].get('value', ''))
-                elif 'summary' in entry:
-                    content = self.clean_html(entry.get('summary', ''))
-                
-                # Extract image (now async)
-                image_url = await self.extract_image_url_async(entry, feed['url'])
-                
-                # Get author
-                author = entry.get('author', '') or entry.get('dc_creator', '')
-                
-                # Parse date
-                published_date = None
-                if 'published_parsed' in entry:
-                    try:
-                        published_date = datetime(*entry.published_parsed[:6])
-                    except:
-                        pass
+            scrapes_pages = find_scraper(feed.url) is not None
+            chosen_images = await self.choose_images(parsed_feed.entries)
+            for record, image_url in zip(parsed_feed.entries, chosen_images):
+                metrics.image_seconds.observe(record.image_seconds, method='feed')
+                if image_url:
+                    metrics.images_found.inc(method='feed')
+                elif scrapes_pages:
+                    scrape_start = time.perf_counter()
+                    image_url = await self.scrape_article_image(record.url, feed.url)
+                    if image_url and self.image_prober:
+                        chosen = await self.image_prober.choose([image_url])
+                        image_url = chosen.url if chosen else None
+                    metrics.image_seconds.observe(time.perf_counter() - scrape_start, method='scrape')
+                    metrics.scrapes.inc(feed=feed_label)
+                    if image_url:
+                        metrics.images_found.inc(method='scrape')
                 
-                if not published_date and 'published' in entry:
-                    published_date = self.parse_date(entry.get('published'))
-                
-                # Create article object
-                article = Article(
-                    title=title[:500],  # Truncate if too long
-                    description=description[:1000] if description else None,
-                    content=content[:5000] if content else None,  # Truncate content
-                    url=url,
+                articles.append(Article(
+                    title=record.title,
+                    description=record.description,
+                    content=record.content,
+                    url=record.url,
                     image_url=image_url,
-                    author=author[:100] if author else None,
-                    published_at=published_date,
-                    feed_id=feed['id'],
-                    category_id=feed['category_id']
-                )
-                
-                if self.save_article(article):
-                    articles_saved += 1
+                    author=record.author,
+                    published_at=record.published_at,
+                    feed_id=feed.id,
+                    category_id=feed.category_id,
+                    signature=record.signature,
+                    canonical_url=record.canonical_url
+                ))
             
-            self.update_feed_status(feed['id'], True)
-            logger.info(f"Processed {feed['name']}: {articles_saved} new articles")
+            write_start = time.perf_counter()
+            articles_saved = self.store.save_articles(articles)
+            metrics.db_write_seconds.observe(time.perf_counter() - write_start)
+            metrics.entries_new.inc(articles_saved, feed=feed_label)
+            self.known_urls.add(feed.id, [article.canonical_url for article in articles])
+            self.update_feed_status(feed.id, True, fetch_result=fetch_result)
+            metrics.feed_succeeded()
+            logger.info(f"Processed {feed.name}: {articles_saved} new articles "
+                        f"({parsed_feed.known_skipped} of {parsed_feed.entries_seen} entries already known"
+                        f"{', stopped early' if parsed_feed.stopped_early else ''})")
             
         except Exception as e:
-            logger.error(f"Error processing feed {feed['name']}: {str(e)}")
-            self.update_feed_status(feed['id'], False, str(e))
+            # Validators stay as they were, so the next fetch brings the entries back
+            logger.error(f"Error processing feed {feed.name}: {str(e)}")
+            self.update_feed_status(feed.id, False, str(e))
+            metrics.feeds_processed.inc(result='failed')
         
         return articles_saved
     
+    def reset_limits(self):
+        """Create fresh concurrency limits bound to the running event loop"""
+        self._global_semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._host_semaphores = {}
+    
+    def get_host_semaphore(self, url: str) -> asyncio.Semaphore:
+        """Get the semaphore limiting concurrent fetches against one host"""
+        host = urlparse(url).netloc.lower()
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.per_host_limit)
+        return self._host_semaphores[host]
+    
+    async def process_feed_limited(self, feed: FeedRecord) -> int:
+        """Process a feed once a per-host slot and a global slot are free"""
+        # Take the host slot first so feeds queued behind a busy host
+        # don't hold global slots that other hosts could be using
+        async with self.get_host_semaphore(feed.url):
+            async with self._global_semaphore:
+                try:
+                    return await self.process_feed(feed)
+                except Exception as e:
+                    logger.error(f"Unexpected error processing feed {feed.name}: {str(e)}")
+                    self.update_feed_status(feed.id, False, str(e))
+                    self.metrics.feeds_processed.inc(result='failed')
+                    return 0
+    
     async def run(self, feed_ids: List[int] = None):
         """Run the RSS parser for all or specific feeds"""
         feeds = self.get_active_feeds()
         
         if feed_ids:
-            feeds = [f for f in feeds if f['id'] in feed_ids]
+            feeds = [f for f in feeds if f.id in feed_ids]
         
         if not feeds:
             logger.info("No feeds to process")
             return
         
-        logger.info(f"Processing {len(feeds)} feeds...")
+        logger.info(f"Processing {len(feeds)} feeds "
+                    f"(concurrency={self.max_concurrency}, per-host={self.per_host_limit})...")
+        
+        self.reset_limits()
         
-        total_articles = 0
+        start = time.perf_counter()
         async with self:
-            for feed in feeds:
-                articles_count = await self.process_feed(feed)
-                total_articles += articles_count
+            results = await asyncio.gather(*(self.process_feed_limited(feed) for feed in feeds))
+        total_articles = sum(results)
+        self.metrics.run_seconds.set(time.perf_counter() - start)
         
         logger.info(f"Completed! Total new articles: {total_articles}")
 
+class FeedScheduler:
+    """Long-running loop that fetches each feed when its fetchIntervalMinutes is due"""
+
+    def __init__(self, rss_parser: RSSParser, feed_ids: List[int] = None,
+                 refresh_seconds: int = 60, max_backoff_minutes: int = 24 * 60,
+                 metrics_file: Optional[str] = None, metrics_host: str = '127.0.0.1',
+                 metrics_port: Optional[int] = None):
+        self.parser = rss_parser
+        self.feed_ids = feed_ids
+        self.refresh_seconds = refresh_seconds
+        self.max_backoff_minutes = max_backoff_minutes
+        # The textfile is rewritten on every feeds refresh and at shutdown
+        self.metrics_file = metrics_file
+        self.metrics_host = metrics_host
+        self.metrics_port = metrics_port
+        self.feeds: Dict[int, FeedRecord] = {}
+        # Heap of (due timestamp, feed id); superseded entries are skipped
+        # when popped by comparing against next_due
+        self.queue: List[tuple] = []
+        self.next_due: Dict[int, float] = {}
+        self.in_flight: Dict[int, asyncio.Task] = {}
+        self._stop_event = None
+
+    def interval_seconds(self, feed: FeedRecord) -> float:
+        """Fetch interval with exponential backoff for failing feeds"""
+        interval = max(1, feed.interval or 30)
+        backoff = 2 ** min(feed.error_count or 0, 16)
+        minutes = min(interval * backoff, max(interval, self.max_backoff_minutes))
+        return minutes * 60
+
+    def schedule(self, feed_id: int, due: float):
+        self.next_due[feed_id] = due
+        heapq.heappush(self.queue, (due, feed_id))
+
+    def initial_due(self, feed: FeedRecord, now: float) -> float:
+        """Resume from lastFetched so a restart doesn't re-fetch every feed"""
+        if not feed.last_fetched:
+            return now
+        try:
+            last_fetched = datetime.fromisoformat(str(feed.last_fetched).replace('Z', ''))
+        except ValueError:
+            return now
+        elapsed = (datetime.utcnow() - last_fetched).total_seconds()
+        return now + max(0, self.interval_seconds(feed) - elapsed)
+
+    def refresh_feeds(self):
+        """Pick up feeds added, changed or deactivated since the last refresh"""
+        feeds = self.parser.get_active_feeds()
+        if self.feed_ids:
+            feeds = [f for f in feeds if f.id in self.feed_ids]
+
+        now = time.time()
+        active = {feed.id: feed for feed in feeds}
+        for feed_id, feed in active.items():
+            if feed_id not in self.feeds:
+                logger.info(f"Scheduling feed: {feed.name} ({feed.url})")
+                self.schedule(feed_id, self.initial_due(feed, now))
+        for feed_id in set(self.feeds) - set(active):
+            logger.info(f"Unscheduling feed: {self.feeds[feed_id].name}")
+            self.next_due.pop(feed_id, None)
+        self.feeds = active
+
+    async def fetch(self, feed_id: int):
+        feed = self.feeds[feed_id]
+        try:
+            await self.parser.process_feed_limited(feed)
+        finally:
+            self.in_flight.pop(feed_id, None)
+            feed = self.feeds.get(feed_id)
+            if feed:
+                # Pick up the error count and validators the fetch just stored
+                row = self.parser.store.conn.execute("""
+                    SELECT errorCount, etag, lastModified, contentHash FROM feeds WHERE id = ?
+                """, (feed_id,)).fetchone()
+                if row:
+                    feed.error_count, feed.etag, feed.last_modified, feed.content_hash = row
+                self.schedule(feed_id, time.time() + self.interval_seconds(feed))
+
+    def dispatch_due(self, now: float):
+        """Start every feed whose due time has passed"""
+        while self.queue and self.queue[0][0] <= now:
+            due, feed_id = heapq.heappop(self.queue)
+            if self.next_due.get(feed_id) != due or feed_id in self.in_flight:
+                continue
+            del self.next_due[feed_id]
+            self.in_flight[feed_id] = asyncio.create_task(self.fetch(feed_id))
+
+    def stop(self):
+        logger.info("Stopping scheduler...")
+        self._stop_event.set()
+
+    async def run(self):
+        """Run until SIGINT/SIGTERM, then wait for in-flight fetches"""
+        self._stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except NotImplementedError:
+                # Not available on Windows; Ctrl+C still interrupts the loop
+                pass
+
+        registry = self.parser.metrics.registry
+        metrics_server = None
+        if self.metrics_port:
+            metrics_server = await registry.serve(self.metrics_host, self.metrics_port)
+
+        self.parser.reset_limits()
+        async with self.parser:
+            next_refresh = 0.0
+            while not self._stop_event.is_set():
+                now = time.time()
+                if now >= next_refresh:
+                    self.refresh_feeds()
+                    next_refresh = now + self.refresh_seconds
+                    if self.metrics_file:
+                        registry.write_textfile(self.metrics_file)
+                self.dispatch_due(now)
+
+                wake_at = next_refresh
+                if self.queue:
+                    wake_at = min(wake_at, self.queue[0][0])
+                try:
+                    await asyncio.wait_for(self._stop_event.wait(), timeout=max(0.0, wake_at - time.time()))
+                except asyncio.TimeoutError:
+                    pass
+
+            if self.in_flight:
+                await asyncio.gather(*self.in_flight.values(), return_exceptions=True)
+
+        if self.metrics_file:
+            registry.write_textfile(self.metrics_file)
+        if metrics_server:
+            await metrics_server.cleanup()
+        logger.info("Scheduler stopped")
+
 async def main():
     parser = argparse.ArgumentParser(description='NewsHub RSS Feed Parser')
-    parser.add_argument('--db', default='newshub.sqlite', help='Database path')
+    add_db_argument(parser)
     parser.add_argument('--feeds', nargs='+', type=int, help='Specific feed IDs to process')
+    parser.add_argument('--concurrency', type=int, default=10,
+                        help='Maximum number of feeds fetched at once (1 = sequential)')
+    parser.add_argument('--per-host', type=int, default=2,
+                        help='Maximum number of feeds fetched at once from the same host')
+    parser.add_argument('--parse-workers', type=int, default=None,
+                        help='Processes used to parse feeds (default: CPU count, 0 = parse in-process)')
+    parser.add_argument('--stop-after-known', type=int, default=0,
+                        help='Stop reading a feed after this many consecutive known entries (0 = off)')
+    parser.add_argument('--daemon', action='store_true',
+                        help='Keep running and fetch each feed when its fetch interval is due')
+    parser.add_argument('--refresh-seconds', type=int, default=60,
+                        help='How often the daemon re-reads the feeds table')
+    parser.add_argument('--max-backoff-minutes', type=int, default=24 * 60,
+                        help='Upper bound on the daemon\'s retry delay for failing feeds')
+    parser.add_argument('--max-body-mb', type=float, default=10,
+                        help='Skip feeds whose body is larger than this many MB')
+    parser.add_argument('--metrics-file',
+                        help='Write Prometheus metrics here (for node_exporter\'s textfile collector)')
+    parser.add_argument('--metrics-port', type=int,
+                        help='In daemon mode, serve Prometheus metrics on this port at /metrics')
+    parser.add_argument('--metrics-host', default='127.0.0.1',
+                        help='Address the metrics port listens on')
+    parser.add_argument('--no-probe-images', dest='probe_images', action='store_false',
+                        help='Take the first image URL in each entry instead of probing every candidate')
+    parser.add_argument('--probe-per-host', type=int, default=2,
+                        help='Maximum number of image probes in flight to the same host')
+    parser.add_argument('--breaker-threshold', type=int, default=5,
+                        help='Consecutive failures (no response, timeout, 5xx, 429) that open a host\'s circuit')
+    parser.add_argument('--breaker-open-minutes', type=float, default=5,
+                        help='How long an open circuit skips its host before a trial fetch (doubles per failed trial)')
+    parser.add_argument('--max-timeout', type=float, default=30,
+                        help='Upper bound on the per-host fetch timeout, which otherwise follows host latency')
+    parser.add_argument('--known-url-budget', type=int, default=500000,
+                        help='Known article URLs kept in memory across all feeds to skip entries early')
     parser.add_argument('--verbose', '-v', action='store_true', help='Verbose logging')
     
     args = parser.parse_args()
@@ -601,8 +871,24 @@ async def main():
     if args.verbose:
         logging.getLogger().setLevel(logging.DEBUG)
     
-    rss_parser = RSSParser(args.db)
-    await rss_parser.run(args.feeds)
+    rss_parser = RSSParser(args.db, max_concurrency=args.concurrency,
+                           per_host_limit=args.per_host, parse_workers=args.parse_workers,
+                           stop_after_known=args.stop_after_known,
+                           max_body_bytes=int(args.max_body_mb * 1024 * 1024),
+                           probe_images=args.probe_images, probe_per_host=args.probe_per_host,
+                           breaker_threshold=args.breaker_threshold,
+                           breaker_open_minutes=args.breaker_open_minutes, max_timeout=args.max_timeout,
+                           known_url_budget=args.known_url_budget)
+    if args.daemon:
+        scheduler = FeedScheduler(rss_parser, args.feeds, refresh_seconds=args.refresh_seconds,
+                                  max_backoff_minutes=args.max_backoff_minutes,
+                                  metrics_file=args.metrics_file, metrics_host=args.metrics_host,
+                                  metrics_port=args.metrics_port)
+        await scheduler.run()
+    else:
+        await rss_parser.run(args.feeds)
+        if args.metrics_file:
+            rss_parser.metrics.registry.write_textfile(args.metrics_file)
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""
+Bulk feed import from OPML or CSV
+
+Curated lists run to tens of thousands of feeds, so files are read as a stream
+(OPML with iterparse, CSV row by row) and written in batches of --batch-size
+feeds per transaction. Categories are created as they are first seen.
+
+Feeds are deduplicated by feed_url_key, within the input and against the feeds
+already stored. It ignores the scheme, www., default ports, fragments, a
+trailing slash, tracking parameters and query order. The URL stored is the one
+from the file. Existing feeds are left alone unless --update is given, which
+rewrites their name, description and category.
+
+--validate fetches every new feed first, concurrently and with a per-host
+limit, reading only the start of each body to check that it is RSS, Atom, RDF
+or JSON Feed. Feeds that fail are skipped, or stored inactive with the reason
+in lastError with --keep-invalid.
+
+OPML: feeds are outlines with xmlUrl. Their category is the outline's own
+category attribute, else the enclosing folder outline. CSV: a header row with
+url (or xmlUrl), and optionally name (or title), category and description.
+
+Usage:
+  python scripts/feed_import.py feeds.opml [more.csv ...] [--category world]
+  python scripts/feed_import.py feeds.opml --validate --concurrency 100
+  python scripts/feed_import.py feeds.csv --update --dry-run
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import re
+import sqlite3
+import sys
+import time
+import xml.etree.ElementTree as ET
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import aiohttp
+
+from canonical_urls import TRACKING_PARAMS, TRACKING_PREFIXES
+from http_transport import HttpTransport, TransportConfig
+from newshub_db import add_db_argument, connect
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+DEFAULT_CATEGORY = 'uncategorized'
+# Validation reads this much of each body; the root element is near the start
+SNIFF_BYTES = 16 * 1024
+# Colours given to new categories in turn
+CATEGORY_COLORS = ('#007BFF', '#28A745', '#6F42C1', '#DC3545', '#FD7E14', '#E83E8C', '#20C997', '#6C757D')
+
+FEED_ROOT = re.compile(rb'<(?:[a-z0-9_-]+:)?(rss|feed|rdf)[\s>/]')
+HTML_ROOT = re.compile(rb'<(?:!doctype\s+)?html[\s>]')
+JSON_FEED = re.compile(rb'"version"\s*:\s*"https?://jsonfeed\.org/version/')
+
+@dataclass
+class FeedSource:
+    """One feed read from an import file"""
+    __slots__ = ('url', 'name', 'description', 'category')
+    url: str
+    name: str
+    description: Optional[str]
+    # Category name or slug as written in the file; None for the default
+    category: Optional[str]
+
+@dataclass
+class ImportStats:
+    read: int = 0
+    bad_urls: int = 0
+    duplicates: int = 0
+    existing: int = 0
+    invalid: int = 0
+    inserted: int = 0
+    updated: int = 0
+    categories_created: int = 0
+    seconds: float = 0.0
+
+def clean_feed_url(url: Optional[str]) -> Optional[str]:
+    """The URL to store: trimmed, feed: schemes resolved, fragment dropped; None if it isn't http(s)"""
+    url = (url or '').strip()
+    if url.lower().startswith('feed:'):
+        url = url[5:].lstrip('/')
+        if not url.lower().startswith(('http://', 'https://')):
+            url = 'http://' + url
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return None
+    if parts.scheme.lower() not in ('http', 'https') or not parts.hostname:
+        return None
+    return urlunsplit((parts.scheme.lower(), parts.netloc, parts.path or '/', parts.query, ''))
+
+def feed_url_key(url: str) -> str:
+    """Dedup key: URLs serving the same feed map to the same key
+
+    Unlike canonical_urls.canonical_url no publisher rules apply, since those
+    are written for article links. For example, YouTube's rule keeps only
+    v and list, which would fold every channel feed into one.
+    """
+    parts = urlsplit(url)
+    host = (parts.hostname or '').lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    port = parts.port
+    if port and port not in (80, 443):
+        host = f"{host}:{port}"
+    path = parts.path.rstrip('/')
+    params = sorted((name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+                    if name.lower() not in TRACKING_PARAMS and not name.lower().startswith(TRACKING_PREFIXES))
+    return f"{host}{path}{'?' + urlencode(params) if params else ''}"
+
+def slugify(name: str) -> str:
+    return re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-') or DEFAULT_CATEGORY
+
+def read_opml(path: str) -> Iterator[FeedSource]:
+    """Feeds of an OPML file, with folder outlines as categories"""
+    folders: List[Optional[str]] = []
+    for event, element in ET.iterparse(path, events=('start', 'end')):
+        if element.tag != 'outline':
+            continue
+        attrs = element.attrib
+        url = attrs.get('xmlUrl') or attrs.get('xmlurl')
+        if event == 'start':
+            # Feeds are pushed too, so every end pops exactly one level
+            folders.append(None if url else (attrs.get('text') or attrs.get('title')))
+            continue
+        folders.pop()
+        if url:
+            own = (attrs.get('category') or '').split(',')[0].strip().strip('/').split('/')[-1]
+            folder = next((name for name in reversed(folders) if name), None)
+            yield FeedSource(url, attrs.get('title') or attrs.get('text') or '',
+                             attrs.get('description') or None, own or folder)
+        element.clear()
+
+def read_csv(path: str) -> Iterator[FeedSource]:
+    """Feeds of a CSV file with a header row"""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        fields = {name.strip().lower(): name for name in reader.fieldnames or ()}
+
+        def column(*names: str) -> Optional[str]:
+            return next((fields[name] for name in names if name in fields), None)
+
+        url_col = column('url', 'xmlurl', 'feed_url', 'feed')
+        if not url_col:
+            raise ValueError(f"{path}: no url column in {list(fields)}")
+        name_col = column('name', 'title', 'text')
+        category_col = column('category', 'folder')
+        description_col = column('description')
+        for row in reader:
+            yield FeedSource(row.get(url_col) or '',
+                             (row.get(name_col) or '').strip() if name_col else '',
+                             (row.get(description_col) or '').strip() or None if description_col else None,
+                             (row.get(category_col) or '').strip() or None if category_col else None)
+
+def read_feeds(path: str, fmt: Optional[str] = None) -> Iterator[FeedSource]:
+    fmt = fmt or ('csv' if path.lower().endswith('.csv') else 'opml')
+    return read_csv(path) if fmt == 'csv' else read_opml(path)
+
+def looks_like_feed(data: bytes) -> bool:
+    """Whether the start of a body is an RSS, Atom, RDF or JSON feed rather than a web page"""
+    head = data.lstrip(b'\xef\xbb\xbf \t\r\n').lower()
+    if head.startswith(b'{'):
+        return bool(JSON_FEED.search(head))
+    feed = FEED_ROOT.search(head)
+    if not feed:
+        return False
+    page = HTML_ROOT.search(head)
+    return page is None or page.start() > feed.start()
+
+class FeedValidator:
+    """Checks concurrently that URLs serve a feed"""
+
+    def __init__(self, concurrency: int = 50, per_host_limit: int = 4, timeout: float = 15.0):
+        self.concurrency = concurrency
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+        self._semaphore = None
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc.lower()
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.per_host_limit)
+        return self._host_semaphores[host]
+
+    async def check(self, transport: HttpTransport, url: str) -> Optional[str]:
+        """None when url serves a feed, otherwise why not"""
+        async with self._host_semaphore(url), self._semaphore:
+            try:
+                async with transport.get(url) as response:
+                    if response.status != 200:
+                        return f"HTTP {response.status}"
+                    data = bytearray()
+                    async for chunk in response.content.iter_chunked(SNIFF_BYTES):
+                        data.extend(chunk)
+                        if len(data) >= SNIFF_BYTES:
+                            break
+                    if not response.content.at_eof():
+                        response.close()
+                    if not looks_like_feed(bytes(data[:SNIFF_BYTES])):
+                        return f"Not a feed ({response.content_type})"
+                    return None
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                return str(e) or type(e).__name__
+
+    async def validate(self, urls: List[str]) -> List[Optional[str]]:
+        """The check result for each url, in order"""
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._host_semaphores = {}
+        config = TransportConfig(user_agent='NewsHub Feed Import 1.0', limit=self.concurrency,
+                                 limit_per_host=self.per_host_limit, total_timeout=self.timeout)
+        async with HttpTransport(config) as transport:
+            return list(await asyncio.gather(*(self.check(transport, url) for url in urls)))
+
+class FeedImporter:
+    """Upserts feeds and their categories in batches"""
+
+    def __init__(self, conn: sqlite3.Connection, default_category: str = DEFAULT_CATEGORY,
+                 update: bool = False, batch_size: int = BATCH_SIZE, validator: Optional[FeedValidator] = None,
+                 keep_invalid: bool = False, dry_run: bool = False):
+        self.conn = conn
+        self.default_category = default_category
+        self.update = update
+        self.batch_size = batch_size
+        self.validator = validator
+        self.keep_invalid = keep_invalid
+        self.dry_run = dry_run
+        self.stats = ImportStats()
+        # Feed key -> feed id (None for feeds queued in this run)
+        self.known: Dict[str, Optional[int]] = {}
+        self.categories: Dict[str, int] = {}
+
+    def load(self):
+        self.known = {feed_url_key(url): feed_id for feed_id, url in self.conn.execute("SELECT id, url FROM feeds")}
+        self.categories = {}
+        for category_id, slug, name in self.conn.execute("SELECT id, slug, name FROM categories"):
+            self.categories[slug] = category_id
+            self.categories.setdefault(slugify(name), category_id)
+
+    def category_id(self, name: Optional[str]) -> int:
+        """Id of the category called name, created when missing; called inside the batch transaction"""
+        name = (name or self.default_category).strip()
+        slug = slugify(name)
+        if slug not in self.categories:
+            display = name if name != slug else name.replace('-', ' ').title()
+            color = CATEGORY_COLORS[len(self.categories) % len(CATEGORY_COLORS)]
+            cursor = self.conn.execute("INSERT INTO categories (slug, name, color) VALUES (?, ?, ?)",
+                                       (slug, display, color))
+            self.categories[slug] = cursor.lastrowid
+            self.stats.categories_created += 1
+            logger.info(f"Created category {display} ({slug})")
+        return self.categories[slug]
+
+    def write(self, batch: List[Tuple[FeedSource, Optional[int]]]):
+        """Store one batch of deduplicated feeds in one transaction"""
+        if self.dry_run:
+            self.stats.inserted += sum(feed_id is None for _, feed_id in batch)
+            self.stats.updated += sum(feed_id is not None for _, feed_id in batch)
+            return
+        # Validate before writing, so the write lock isn't held over the network
+        rows = list(self._validated(batch))
+        if not rows:
+            return
+        with self.conn:
+            for source, feed_id, error in rows:
+                category_id = self.category_id(source.category)
+                if feed_id is None:
+                    cursor = self.conn.execute("""
+                        INSERT OR IGNORE INTO feeds (name, url, description, isActive, lastError, categoryId)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    """, (source.name, source.url, source.description, error is None, error, category_id))
+                    self.stats.inserted += cursor.rowcount
+                else:
+                    self.conn.execute("""
+                        UPDATE feeds SET name = ?, description = COALESCE(?, description),
+                                         categoryId = ?, updatedAt = datetime('now')
+                        WHERE id = ?
+                    """, (source.name, source.description, category_id, feed_id))
+                    self.stats.updated += 1
+
+    def _validated(self, batch: List[Tuple[FeedSource, Optional[int]]]
+                   ) -> Iterator[Tuple[FeedSource, Optional[int], Optional[str]]]:
+        """Batch entries with their validation error; failed new feeds are dropped unless kept"""
+        errors: List[Optional[str]] = [None] * len(batch)
+        new = [index for index, (_, feed_id) in enumerate(batch) if feed_id is None]
+        if self.validator and new:
+            start = time.perf_counter()
+            results = asyncio.run(self.validator.validate([batch[index][0].url for index in new]))
+            for index, error in zip(new, results):
+                errors[index] = error
+            failed = sum(error is not None for error in results)
+            logger.info(f"Validated {len(new)} feeds in {time.perf_counter() - start:.1f}s, {failed} failed")
+        for (source, feed_id), error in zip(batch, errors):
+            if error is not None:
+                self.stats.invalid += 1
+                logger.debug(f"Invalid feed {source.url}: {error}")
+                if not self.keep_invalid:
+                    continue
+            yield source, feed_id, error
+
+    def run(self, sources: Iterable[FeedSource]) -> ImportStats:
+        start = time.perf_counter()
+        self.load()
+        batch: List[Tuple[FeedSource, Optional[int]]] = []
+        for source in sources:
+            self.stats.read += 1
+            url = clean_feed_url(source.url)
+            if not url:
+                self.stats.bad_urls += 1
+                logger.debug(f"Skipped {source.url!r}: not an http(s) URL")
+                continue
+            source.url = url
+            source.name = (source.name or '').strip()[:255] or urlsplit(url).hostname
+            key = feed_url_key(url)
+            feed_id = self.known.get(key)
+            if key in self.known and feed_id is None:
+                self.stats.duplicates += 1
+                continue
+            if feed_id is not None:
+                self.stats.existing += 1
+                if not self.update:
+                    continue
+            # Any later listing of this feed is a duplicate
+            self.known[key] = None
+            batch.append((source, feed_id))
+            if len(batch) >= self.batch_size:
+                self.write(batch)
+                batch = []
+        self.write(batch)
+        self.stats.seconds = round(time.perf_counter() - start, 3)
+        return self.stats
+
+def main():
+    parser = argparse.ArgumentParser(description='Import feeds from OPML or CSV files')
+    add_db_argument(parser)
+    parser.add_argument('files', nargs='+', help='OPML or CSV files')
+    parser.add_argument('--format', choices=('opml', 'csv'), help='File format (default: from the extension)')
+    parser.add_argument('--category', default=DEFAULT_CATEGORY,
+                        help='Category for feeds the file doesn\'t place in one')
+    parser.add_argument('--update', action='store_true',
+                        help='Rewrite the name, description and category of feeds already stored')
+    parser.add_argument('--validate', action='store_true', help='Fetch each new feed and skip those that aren\'t feeds')
+    parser.add_argument('--keep-invalid', action='store_true',
+                        help='With --validate, store failing feeds as inactive instead of skipping them')
+    parser.add_argument('--concurrency', type=int, default=50, help='Validation requests in flight')
+    parser.add_argument('--per-host', type=int, default=4, help='Validation requests in flight per host')
+    parser.add_argument('--timeout', type=float, default=15.0, help='Validation timeout per feed in seconds')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Feeds per transaction')
+    parser.add_argument('--dry-run', action='store_true', help='Read and deduplicate without writing')
+    parser.add_argument('--json', action='store_true', help='Print the import statistics as JSON')
+    parser.add_argument('--verbose', '-v', action='store_true', help='Verbose logging')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    validator = FeedValidator(args.concurrency, args.per_host, args.timeout) if args.validate else None
+    conn = connect(args.db)
+    try:
+        importer = FeedImporter(conn, args.category, args.update, args.batch_size, validator,
+                                args.keep_invalid, args.dry_run)
+        stats = importer.run(source for path in args.files for source in read_feeds(path, args.format))
+    finally:
+        conn.close()
+
+    if args.json:
+        json.dump(asdict(stats), sys.stdout, indent=2)
+        print()
+        return
+    logger.info(f"Read {stats.read} feeds in {stats.seconds:.1f}s: {stats.inserted} added, {stats.updated} updated, "
+                f"{stats.existing} already stored, {stats.duplicates} duplicates, {stats.bad_urls} bad URLs, "
+                f"{stats.invalid} failed validation, {stats.categories_created} categories created"
+                f"{' (dry run)' if args.dry_run else ''}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Per-feed and per-category article statistics, kept as running aggregates
+
+feed_stats and category_stats hold article counts, articles with an image,
+the time of the last article stored and the number of failed fetches. Triggers
+on articles and feeds update them inside the writer's own transaction (the
+ingester's insert batch, the image retrofitter's updates, a deletion), so
+reading them costs a few rows instead of a GROUP BY over every article.
+
+lastArticleAt only ever moves forward and fetchErrors cannot be recounted from
+the articles, so --rebuild recounts everything else and keeps those. Like the
+search index, the aggregates are rebuilt whenever a trigger has gone missing.
+
+Usage:
+  python scripts/feed_stats.py [--feeds] [--json]
+  python scripts/feed_stats.py --rebuild
+"""
+
+import argparse
+import json
+import logging
+import sqlite3
+import sys
+import time
+from dataclasses import asdict, dataclass
+from typing import List, Optional
+
+from newshub_db import add_db_argument, connect
+
+logger = logging.getLogger(__name__)
+
+HAS_IMAGE = "({alias}.imageUrl IS NOT NULL AND {alias}.imageUrl != '')"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS feed_stats (
+    feedId integer PRIMARY KEY NOT NULL,
+    articles integer NOT NULL DEFAULT 0,
+    withImages integer NOT NULL DEFAULT 0,
+    lastArticleAt datetime,
+    fetchErrors integer NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS category_stats (
+    categoryId integer PRIMARY KEY NOT NULL,
+    articles integer NOT NULL DEFAULT 0,
+    withImages integer NOT NULL DEFAULT 0,
+    lastArticleAt datetime,
+    fetchErrors integer NOT NULL DEFAULT 0
+);
+"""
+
+def _count(table: str, key: str, row: str, sign: str) -> str:
+    """Upsert adding (sign = '+') or removing (sign = '-') one article to its row"""
+    has_image = HAS_IMAGE.format(alias=row)
+    return f"""
+        INSERT INTO {table} ({key}, articles, withImages, lastArticleAt)
+        VALUES ({row}.{key}, {sign}1, {sign}{has_image}, {row}.createdAt)
+        ON CONFLICT ({key}) DO UPDATE SET
+            articles = articles {sign} 1,
+            withImages = withImages {sign} {has_image},
+            lastArticleAt = MAX(COALESCE(lastArticleAt, excluded.lastArticleAt), excluded.lastArticleAt);
+    """
+
+def _add(row: str) -> str:
+    return _count('feed_stats', 'feedId', row, '+') + _count('category_stats', 'categoryId', row, '+')
+
+def _remove(row: str) -> str:
+    return _count('feed_stats', 'feedId', row, '-') + _count('category_stats', 'categoryId', row, '-')
+
+TRIGGERS = {
+    'feed_stats_ai': f"""
+        CREATE TRIGGER IF NOT EXISTS feed_stats_ai AFTER INSERT ON articles BEGIN
+            {_add('new')}
+        END
+    """,
+    'feed_stats_ad': f"""
+        CREATE TRIGGER IF NOT EXISTS feed_stats_ad AFTER DELETE ON articles BEGIN
+            {_remove('old')}
+        END
+    """,
+    'feed_stats_au': f"""
+        CREATE TRIGGER IF NOT EXISTS feed_stats_au AFTER UPDATE OF imageUrl, feedId, categoryId ON articles BEGIN
+            {_remove('old')}
+            {_add('new')}
+        END
+    """,
+    # errorCount is the run of consecutive failures and resets on success; count its increments
+    'feed_stats_errors': """
+        CREATE TRIGGER IF NOT EXISTS feed_stats_errors AFTER UPDATE OF errorCount ON feeds
+        WHEN new.errorCount > old.errorCount BEGIN
+            INSERT INTO feed_stats (feedId, fetchErrors) VALUES (new.id, new.errorCount - old.errorCount)
+            ON CONFLICT (feedId) DO UPDATE SET fetchErrors = fetchErrors + excluded.fetchErrors;
+            INSERT INTO category_stats (categoryId, fetchErrors) VALUES (new.categoryId, new.errorCount - old.errorCount)
+            ON CONFLICT (categoryId) DO UPDATE SET fetchErrors = fetchErrors + excluded.fetchErrors;
+        END
+    """,
+}
+
+@dataclass
+class CategoryStats:
+    category_id: int
+    name: str
+    articles: int
+    with_images: int
+    last_article_at: Optional[str]
+    fetch_errors: int
+
+    @property
+    def image_pct(self) -> float:
+        return 100 * self.with_images / self.articles if self.articles else 0.0
+
+@dataclass
+class FeedStats:
+    feed_id: int
+    name: str
+    url: str
+    category: Optional[str]
+    is_active: bool
+    articles: int
+    with_images: int
+    last_article_at: Optional[str]
+    fetch_errors: int
+    # Consecutive failures right now, from feeds
+    error_count: int
+    last_error: Optional[str]
+
+    @property
+    def image_pct(self) -> float:
+        return 100 * self.with_images / self.articles if self.articles else 0.0
+
+def stats_ready(conn: sqlite3.Connection) -> bool:
+    """True when the aggregate tables and every trigger exist"""
+    existing = {row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE name IN ('feed_stats', 'category_stats') OR name LIKE 'feed_stats_%'"
+    )}
+    return {'feed_stats', 'category_stats', *TRIGGERS} <= existing
+
+def ensure_feed_stats(conn: sqlite3.Connection) -> bool:
+    """Create the aggregates and triggers if needed; returns True when it had to rebuild"""
+    if stats_ready(conn):
+        return False
+    with conn:
+        conn.executescript(SCHEMA)
+        for sql in TRIGGERS.values():
+            conn.execute(sql)
+    # Fresh aggregates are empty; ones that lost a trigger have missed writes
+    rebuild(conn)
+    return True
+
+def rebuild(conn: sqlite3.Connection):
+    """Recount articles per feed and per category; lastArticleAt and fetchErrors are kept"""
+    start = time.perf_counter()
+    with conn:
+        for table, key in (('feed_stats', 'feedId'), ('category_stats', 'categoryId')):
+            conn.execute(f"UPDATE {table} SET articles = 0, withImages = 0")
+            # WHERE true keeps SQLite from reading ON CONFLICT as a join constraint
+            conn.execute(f"""
+                INSERT INTO {table} ({key}, articles, withImages, lastArticleAt)
+                SELECT {key}, COUNT(*), SUM({HAS_IMAGE.format(alias='a')}), MAX(createdAt)
+                FROM articles a WHERE true GROUP BY {key}
+                ON CONFLICT ({key}) DO UPDATE SET
+                    articles = excluded.articles,
+                    withImages = excluded.withImages,
+                    lastArticleAt = MAX(COALESCE(lastArticleAt, excluded.lastArticleAt), excluded.lastArticleAt)
+            """)
+    logger.info(f"Recounted feed and category statistics in {time.perf_counter() - start:.1f}s")
+
+def connect_stats(db_path: Optional[str] = None, force_rebuild: bool = False) -> sqlite3.Connection:
+    """Read-only connection to a database whose aggregates are built"""
+    conn = connect(db_path, readonly=True)
+    if stats_ready(conn) and not force_rebuild:
+        return conn
+    # Only a rebuild or a database that predates the aggregates needs a writer
+    conn.close()
+    writer = connect(db_path)
+    try:
+        if not ensure_feed_stats(writer) and force_rebuild:
+            rebuild(writer)
+    finally:
+        writer.close()
+    return connect(db_path, readonly=True)
+
+def category_stats(conn: sqlite3.Connection) -> List[CategoryStats]:
+    """Every category, by name"""
+    return [CategoryStats(*row) for row in conn.execute("""
+        SELECT c.id, c.name, COALESCE(s.articles, 0), COALESCE(s.withImages, 0),
+               s.lastArticleAt, COALESCE(s.fetchErrors, 0)
+        FROM categories c LEFT JOIN category_stats s ON s.categoryId = c.id
+        ORDER BY c.name
+    """)]
+
+def feed_stats(conn: sqlite3.Connection, active_only: bool = False) -> List[FeedStats]:
+    """Every feed, by category then name"""
+    return [FeedStats(*row[:4], bool(row[4]), *row[5:]) for row in conn.execute(f"""
+        SELECT f.id, f.name, f.url, c.name, f.isActive,
+               COALESCE(s.articles, 0), COALESCE(s.withImages, 0), s.lastArticleAt,
+               COALESCE(s.fetchErrors, 0), f.errorCount, f.lastError
+        FROM feeds f
+        LEFT JOIN categories c ON c.id = f.categoryId
+        LEFT JOIN feed_stats s ON s.feedId = f.id
+        {'WHERE f.isActive = 1' if active_only else ''}
+        ORDER BY c.name, f.name
+    """)]
+
+def print_report(categories: List[CategoryStats], feeds: List[FeedStats], show_feeds: bool):
+    total = sum(category.articles for category in categories)
+    with_images = sum(category.with_images for category in categories)
+    print("📊 NewsHub Database Statistics:")
+    print(f"  Categories: {len(categories)}")
+    print(f"  Feeds: {len(feeds)} ({sum(feed.is_active for feed in feeds)} active)")
+    print(f"  Articles: {total} ({100 * with_images / total if total else 0:.1f}% with images)")
+
+    print("\n📰 Articles by Category:")
+    for category in categories:
+        print(f"  {category.name}: {category.articles} articles, {category.with_images} with images "
+              f"({category.image_pct:.1f}%), last {category.last_article_at or 'never'}, "
+              f"{category.fetch_errors} fetch errors")
+
+    if show_feeds:
+        print("\n📡 Articles by Feed:")
+        for feed in feeds:
+            print(f"  {feed.category} -> {feed.name}{'' if feed.is_active else ' (inactive)'}")
+            print(f"    Articles: {feed.articles}, With images: {feed.with_images} ({feed.image_pct:.1f}%), "
+                  f"last {feed.last_article_at or 'never'}, {feed.fetch_errors} fetch errors")
+
+    print("\nFeeds with no articles:")
+    for feed in feeds:
+        if not feed.articles:
+            print(f"  ID {feed.feed_id}: {feed.name}")
+
+    print("\nFeeds with articles but no images:")
+    for feed in feeds:
+        if feed.articles and not feed.with_images:
+            print(f"  ID {feed.feed_id}: {feed.name} - {feed.articles} articles")
+
+    print("\nFeeds failing right now:")
+    for feed in feeds:
+        if feed.error_count:
+            print(f"  ID {feed.feed_id}: {feed.name} - {feed.error_count} consecutive errors: {feed.last_error}")
+
+def main():
+    parser = argparse.ArgumentParser(description='NewsHub feed and category statistics')
+    add_db_argument(parser)
+    parser.add_argument('--rebuild', action='store_true', help='Recount the aggregates from the articles table')
+    parser.add_argument('--feeds', action='store_true', help='Also list every feed')
+    parser.add_argument('--json', action='store_true', help='Print the statistics as JSON')
+    parser.add_argument('--verbose', '-v', action='store_true', help='Verbose logging')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    conn = connect_stats(args.db, args.rebuild)
+    try:
+        categories = category_stats(conn)
+        feeds = feed_stats(conn)
+    finally:
+        conn.close()
+
+    if args.json:
+        json.dump({'categories': [asdict(category) for category in categories],
+                   'feeds': [asdict(feed) for feed in feeds]}, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    else:
+        print_report(categories, feeds, args.feeds)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Per-host circuit breakers and adaptive fetch timeouts for the RSS parser
+
+Each feed host has a breaker:
+- closed: fetches go through
+- open: after failure_threshold consecutive failures (no response, a
+  timeout, 5xx or 429); fetches are skipped without touching the network
+- half-open: once the open period has passed, a single trial fetch is let
+  through. Success closes the breaker; failure reopens it for twice as long,
+  up to max_open_seconds.
+
+Only the host's health counts: a 404, an HTML page instead of a feed or an
+unparseable body is a feed problem and the host answered, so it counts as a
+success.
+
+The total timeout of each fetch follows the host's own latency instead of one
+fixed 30 s: TIMEOUT_FACTOR times the p95 of its recent successful fetches,
+plus TIMEOUT_MARGIN, within [min_timeout, max_timeout]. A fast host that
+stops answering fails in seconds, and a slow but healthy host still gets
+several times its usual latency. Hosts with fewer than MIN_SAMPLES samples
+get max_timeout.
+
+Breaker state and latency samples are kept in host_health, so they survive
+restarts and one-shot cron runs.
+
+Usage:
+  python scripts/host_health.py                # list hosts, open breakers first
+  python scripts/host_health.py --reset HOST   # close a breaker by hand (--reset-all for every host)
+"""
+
+import argparse
+import json
+import logging
+import sqlite3
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Optional
+from urllib.parse import urlparse
+
+import aiohttp
+
+from newshub_db import add_db_argument, connect
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+# Latency samples kept per host for the percentile
+LATENCY_SAMPLES = 50
+MIN_SAMPLES = 5
+TIMEOUT_FACTOR = 3.0
+TIMEOUT_MARGIN = 2.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS host_health (
+    host TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    failures INTEGER NOT NULL DEFAULT 0,
+    openedAt REAL,
+    openSeconds REAL NOT NULL DEFAULT 0,
+    lastError TEXT,
+    latencies TEXT NOT NULL DEFAULT '[]',
+    updatedAt REAL NOT NULL
+)
+"""
+
+def host_of(url: str) -> str:
+    return urlparse(url).netloc.lower()
+
+@dataclass
+class HostState:
+    host: str
+    state: str = CLOSED
+    # Consecutive failures; reset by any success
+    failures: int = 0
+    opened_at: Optional[float] = None
+    open_seconds: float = 0.0
+    last_error: Optional[str] = None
+    latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=LATENCY_SAMPLES))
+    # A half-open breaker lets exactly one fetch through
+    trial_in_flight: bool = False
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if len(self.latencies) < MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+class HostBreakers:
+    def __init__(self, conn: sqlite3.Connection, failure_threshold: int = 5,
+                 open_seconds: float = 300, max_open_seconds: float = 6 * 3600,
+                 min_timeout: float = 5.0, max_timeout: float = 30.0, connect_timeout: float = 10.0):
+        self.conn = conn
+        self.failure_threshold = failure_threshold
+        self.base_open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.connect_timeout = connect_timeout
+        self.hosts: Dict[str, HostState] = {}
+        with self.conn:
+            self.conn.execute(SCHEMA)
+        self.load()
+
+    def load(self):
+        self.hosts = {}
+        for host, state, failures, opened_at, open_seconds, last_error, latencies in self.conn.execute(
+            "SELECT host, state, failures, openedAt, openSeconds, lastError, latencies FROM host_health"
+        ):
+            self.hosts[host] = HostState(
+                host,
+                # A trial interrupted by a restart is simply retried
+                OPEN if state == HALF_OPEN else state,
+                failures, opened_at, open_seconds, last_error,
+                deque(json.loads(latencies), maxlen=LATENCY_SAMPLES),
+            )
+
+    def _state(self, host: str) -> HostState:
+        if host not in self.hosts:
+            self.hosts[host] = HostState(host)
+        return self.hosts[host]
+
+    def _save(self, entry: HostState):
+        with self.conn:
+            self.conn.execute("""
+                INSERT OR REPLACE INTO host_health
+                    (host, state, failures, openedAt, openSeconds, lastError, latencies, updatedAt)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (entry.host, entry.state, entry.failures, entry.opened_at, entry.open_seconds,
+                  entry.last_error, json.dumps([round(x, 3) for x in entry.latencies]), time.time()))
+
+    def allow(self, host: str, now: Optional[float] = None) -> bool:
+        """Whether a fetch from host may go ahead; every allowed fetch must be followed by record()"""
+        entry = self._state(host)
+        if entry.state == CLOSED:
+            return True
+        now = now or time.time()
+        if entry.state == OPEN:
+            if now < entry.opened_at + entry.open_seconds:
+                return False
+            entry.state = HALF_OPEN
+            logger.info(f"Circuit half-open for {host}, trying one fetch")
+        if entry.trial_in_flight:
+            return False
+        entry.trial_in_flight = True
+        return True
+
+    def retry_at(self, host: str) -> Optional[float]:
+        """When an open breaker will let a trial through; None when it isn't open"""
+        entry = self.hosts.get(host)
+        if not entry or entry.state != OPEN:
+            return None
+        return entry.opened_at + entry.open_seconds
+
+    def timeout_for(self, host: str) -> aiohttp.ClientTimeout:
+        p95 = self._state(host).percentile(95)
+        total = self.max_timeout
+        if p95 is not None:
+            total = min(self.max_timeout, max(self.min_timeout, p95 * TIMEOUT_FACTOR + TIMEOUT_MARGIN))
+        return aiohttp.ClientTimeout(total=total, sock_connect=min(self.connect_timeout, total))
+
+    def record(self, host: str, ok: Optional[bool], seconds: Optional[float] = None,
+               error: Optional[str] = None, now: Optional[float] = None):
+        """Outcome of an allowed fetch; ok=None (e.g. cancelled) only ends a half-open trial"""
+        entry = self._state(host)
+        was_trial, entry.trial_in_flight = entry.trial_in_flight, False
+        if ok is None:
+            if was_trial and entry.state == HALF_OPEN:
+                entry.state = OPEN
+            return
+        now = now or time.time()
+
+        if ok:
+            if seconds is not None:
+                entry.latencies.append(seconds)
+            changed = entry.state != CLOSED or entry.failures
+            if entry.state != CLOSED:
+                logger.info(f"Circuit closed for {host}")
+            entry.state, entry.failures, entry.opened_at, entry.open_seconds = CLOSED, 0, None, 0.0
+            entry.last_error = None
+            # Latencies alone are persisted every few samples, state changes at once
+            if changed or len(entry.latencies) % 10 == 0:
+                self._save(entry)
+            return
+
+        entry.failures += 1
+        entry.last_error = error
+        if entry.state == HALF_OPEN:
+            entry.open_seconds = min(entry.open_seconds * 2, self.max_open_seconds)
+            entry.state, entry.opened_at = OPEN, now
+            logger.warning(f"Circuit reopened for {host} for {entry.open_seconds:.0f}s: {error}")
+        elif entry.state == CLOSED and entry.failures >= self.failure_threshold:
+            entry.open_seconds = self.base_open_seconds
+            entry.state, entry.opened_at = OPEN, now
+            logger.warning(f"Circuit opened for {host} after {entry.failures} failures "
+                           f"for {entry.open_seconds:.0f}s: {error}")
+        self._save(entry)
+
+    def save_all(self):
+        for entry in self.hosts.values():
+            self._save(entry)
+
+    def open_hosts(self) -> int:
+        return sum(entry.state != CLOSED for entry in self.hosts.values())
+
+def main():
+    parser = argparse.ArgumentParser(description='Feed host circuit breakers')
+    add_db_argument(parser)
+    parser.add_argument('--reset', nargs='+', metavar='HOST', help='Close these hosts\' breakers')
+    parser.add_argument('--reset-all', action='store_true', help='Close every breaker')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    conn = connect(args.db)
+    try:
+        breakers = HostBreakers(conn)
+        if args.reset or args.reset_all:
+            for host in (breakers.hosts if args.reset_all else args.reset):
+                breakers.hosts[host] = HostState(host, latencies=breakers._state(host).latencies)
+                breakers._save(breakers.hosts[host])
+                logger.info(f"Closed the breaker for {host}")
+            return
+
+        now = time.time()
+        print(f"{'host':40} {'state':9} {'fails':>5} {'p50':>6} {'p95':>6} {'timeout':>7}  retry / last error")
+        for entry in sorted(breakers.hosts.values(), key=lambda e: (e.state == CLOSED, e.host)):
+            p50, p95 = entry.percentile(50), entry.percentile(95)
+            retry = breakers.retry_at(entry.host)
+            note = f"in {max(0, retry - now):.0f}s" if retry else ''
+            print(f"{entry.host[:40]:40} {entry.state:9} {entry.failures:5} "
+                  f"{p50 if p50 is not None else float('nan'):6.2f} {p95 if p95 is not None else float('nan'):6.2f} "
+                  f"{breakers.timeout_for(entry.host).total:7.1f}  {note} {entry.last_error or ''}")
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Shared HTTP transport for the RSS parser and the image retrofitter
+
+One tuned aiohttp session per run: keep-alive pools capped per host, a cached
+DNS resolver (aiodns when installed), gzip/deflate and, when a Brotli package
+is installed, br transfer encoding. Bodies are read as a stream and abandoned
+once they pass max_body_bytes. A trace hook counts new vs reused connections
+per host so pool sizing can be checked against real runs.
+"""
+
+import logging
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli  # noqa: F401
+    HAS_BROTLI = True
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        HAS_BROTLI = True
+    except ImportError:
+        HAS_BROTLI = False
+
+try:
+    import aiodns  # noqa: F401
+    HAS_AIODNS = True
+except ImportError:
+    HAS_AIODNS = False
+
+# aiohttp only decodes br when a Brotli package is importable, so only ask for it then
+ACCEPT_ENCODING = 'gzip, deflate, br' if HAS_BROTLI else 'gzip, deflate'
+
+class BodyTooLarge(Exception):
+    """Response body exceeded the transport's max_body_bytes"""
+
+@dataclass
+class TransportConfig:
+    user_agent: str = 'NewsHub RSS Parser 1.0'
+    total_timeout: float = 30.0
+    connect_timeout: float = 10.0
+    limit: int = 100
+    limit_per_host: int = 4
+    keepalive_timeout: float = 30.0
+    dns_cache_seconds: int = 300
+    max_body_bytes: int = 10 * 1024 * 1024
+
+@dataclass
+class HostStats:
+    requests: int = 0
+    new_connections: int = 0
+    reused_connections: int = 0
+    bytes_read: int = 0
+    oversized: int = 0
+
+    @property
+    def reuse_ratio(self) -> float:
+        connections = self.new_connections + self.reused_connections
+        return self.reused_connections / connections if connections else 0.0
+
+@dataclass
+class TransportStats:
+    hosts: Dict[str, HostStats] = field(default_factory=lambda: defaultdict(HostStats))
+
+    def totals(self) -> HostStats:
+        total = HostStats()
+        for stats in self.hosts.values():
+            total.requests += stats.requests
+            total.new_connections += stats.new_connections
+            total.reused_connections += stats.reused_connections
+            total.bytes_read += stats.bytes_read
+            total.oversized += stats.oversized
+        return total
+
+class HttpTransport:
+    """Owns the aiohttp session; use as `async with HttpTransport(config) as transport`"""
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, config: Optional[TransportConfig] = None):
+        self.config = config or TransportConfig()
+        self.stats = TransportStats()
+        self.session: Optional[aiohttp.ClientSession] = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def open(self) -> aiohttp.ClientSession:
+        config = self.config
+        connector = aiohttp.TCPConnector(
+            limit=config.limit,
+            limit_per_host=config.limit_per_host,
+            keepalive_timeout=config.keepalive_timeout,
+            use_dns_cache=True,
+            ttl_dns_cache=config.dns_cache_seconds,
+            resolver=aiohttp.AsyncResolver() if HAS_AIODNS else None,
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=config.total_timeout,
+                                          sock_connect=config.connect_timeout),
+            headers={'User-Agent': config.user_agent, 'Accept-Encoding': ACCEPT_ENCODING},
+            trace_configs=[self._trace_config()],
+        )
+        return self.session
+
+    async def close(self):
+        if self.session:
+            await self.session.close()
+            self.session = None
+        self.log_stats()
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        trace = aiohttp.TraceConfig()
+        hosts = self.stats.hosts
+
+        async def on_request_start(session, ctx, params):
+            ctx.host = params.url.host
+            hosts[ctx.host].requests += 1
+
+        async def on_connection_create_end(session, ctx, params):
+            hosts[ctx.host].new_connections += 1
+
+        async def on_connection_reuseconn(session, ctx, params):
+            hosts[ctx.host].reused_connections += 1
+
+        trace.on_request_start.append(on_request_start)
+        trace.on_connection_create_end.append(on_connection_create_end)
+        trace.on_connection_reuseconn.append(on_connection_reuseconn)
+        return trace
+
+    def get(self, url: str, **kwargs):
+        return self.session.get(url, **kwargs)
+
+    async def read_body(self, response: aiohttp.ClientResponse,
+                        max_bytes: Optional[int] = None) -> bytes:
+        """Read the (decompressed) body, raising BodyTooLarge past max_bytes
+
+        Returns raw bytes: callers such as feedparser do their own charset
+        detection, so nothing is decoded here.
+        """
+        limit = max_bytes or self.config.max_body_bytes
+        host_stats = self.stats.hosts[response.url.host]
+
+        # Content-Length is the compressed size, so it only rules out the obvious cases
+        if response.content_length and response.content_length > limit:
+            host_stats.oversized += 1
+            raise BodyTooLarge(f"{response.url} declares {response.content_length} bytes")
+
+        body = bytearray()
+        async for chunk in response.content.iter_chunked(self.CHUNK_SIZE):
+            body.extend(chunk)
+            if len(body) > limit:
+                host_stats.oversized += 1
+                host_stats.bytes_read += len(body)
+                raise BodyTooLarge(f"{response.url} exceeded {limit} bytes")
+        host_stats.bytes_read += len(body)
+        return bytes(body)
+
+    def log_stats(self):
+        total = self.stats.totals()
+        if not total.requests:
+            return
+        logger.info(f"HTTP: {total.requests} requests to {len(self.stats.hosts)} hosts, "
+                    f"{total.new_connections} connections opened, "
+                    f"{total.reused_connections} reused ({total.reuse_ratio:.0%}), "
+                    f"{total.bytes_read / 1024:.0f} KiB read, {total.oversized} oversized")
+        for host, stats in sorted(self.stats.hosts.items()):
+            logger.debug(f"HTTP {host}: {stats.requests} requests, "
+                         f"{stats.new_connections} new / {stats.reused_connections} reused "
+                         f"connections ({stats.reuse_ratio:.0%}), {stats.bytes_read} bytes")
@@ -0,0 +1,206 @@
+"""
+Image extraction shared by the RSS parser and the image retrofitter
+
+Entry extraction runs the cheap structural checks (media_content, enclosures,
+thumbnails) before any regex, and every pattern is compiled once at import.
+Article-page patterns live in SITE_SCRAPERS, a registry keyed by domain; the
+fetching side is page_scraper.PageImageScraper.
+"""
+
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Pattern, Tuple
+from urllib.parse import urljoin, urlparse
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg', '.bmp')
+IMAGE_URL_HINTS = ('image', 'img', 'photo', 'picture')
+# Candidates handed to the image prober per entry
+MAX_CANDIDATES = 5
+
+# Patterns for <img> tags and bare image links in entry HTML, most specific first
+CONTENT_IMAGE_PATTERNS = [
+    re.compile(r'<img[^>]+src=["\']([^"\']+)["\'][^>]*>', re.IGNORECASE),
+    re.compile(r'<img[^>]+src=([^>\s]+)[^>]*>', re.IGNORECASE),
+    re.compile(r'src=["\']([^"\']*\.(jpg|jpeg|png|gif|webp))["\']', re.IGNORECASE),
+    re.compile(r'(https?://[^\s<>"]+\.(jpg|jpeg|png|gif|webp))', re.IGNORECASE),
+]
+
+# Meta tags that carry the featured image on nearly every news site
+META_IMAGE_PATTERNS = [
+    re.compile(r'<meta property="og:image" content="([^"]+)"', re.IGNORECASE),
+    re.compile(r'<meta name="twitter:image" content="([^"]+)"', re.IGNORECASE),
+    re.compile(r'<meta property="twitter:image" content="([^"]+)"', re.IGNORECASE),
+    re.compile(r'<meta name="twitter:image:src" content="([^"]+)"', re.IGNORECASE),
+]
+
+@dataclass
+class SiteScraper:
+    """Article-page image patterns for one publisher, tried after the meta tags"""
+    name: str
+    domains: Tuple[str, ...]
+    patterns: List[Pattern] = field(default_factory=list)
+
+    def extract(self, html: str, page_url: str) -> Optional[str]:
+        return extract_page_image(html, page_url, self.patterns)
+
+def _compile(*patterns: str) -> List[Pattern]:
+    return [re.compile(pattern, re.IGNORECASE | re.DOTALL) for pattern in patterns]
+
+SITE_SCRAPERS: Dict[str, SiteScraper] = {}
+
+def register_scraper(scraper: SiteScraper):
+    """Add a scraper to the registry under each of its domains"""
+    for domain in scraper.domains:
+        SITE_SCRAPERS[domain] = scraper
+
+register_scraper(SiteScraper('TechCrunch', ('techcrunch.com',), _compile(
+    r'<img[^>]+class="[^"]*wp-post-image[^"]*"[^>]+src="([^"]+)"',
+    r'<img[^>]+class="[^"]*featured-image[^"]*"[^>]+src="([^"]+)"',
+    r'<img[^>]+data-src="([^"]+)"[^>]*class="[^"]*featured[^"]*"',
+)))
+register_scraper(SiteScraper('The Verge', ('theverge.com',), _compile(
+    r'<img[^>]+data-original="([^"]+)"',
+    r'<img[^>]+class="[^"]*duet--article--lede-image[^"]*"[^>]+src="([^"]+)"',
+    r'<source[^>]+srcset="([^"\s]+)"[^>]*media="[^"]*min-width',
+)))
+register_scraper(SiteScraper('Science Daily', ('sciencedaily.com',), _compile(
+    r'<img[^>]+id="story_image"[^>]+src="([^"]+)"',
+    r'<img[^>]+class="[^"]*story-image[^"]*"[^>]+src="([^"]+)"',
+    r'<img[^>]+alt="[^"]*"[^>]+src="([^"]+)"[^>]*width="[^"]*"[^>]*height="[^"]*"',
+)))
+register_scraper(SiteScraper('ESPN', ('espn.com',), _compile(
+    r'<img[^>]+class="[^"]*media-wrapper_image[^"]*"[^>]+src="([^"]+)"',
+    r'<picture[^>]*>.*?<img[^>]+src="([^"]+)"',
+)))
+
+def find_scraper(url: str) -> Optional[SiteScraper]:
+    """Look up the scraper for url's host or any parent domain of it"""
+    if not url:
+        return None
+    host = urlparse(url).netloc.lower().split(':')[0]
+    parts = host.split('.')
+    for i in range(len(parts) - 1):
+        scraper = SITE_SCRAPERS.get('.'.join(parts[i:]))
+        if scraper:
+            return scraper
+    return None
+
+def is_valid_image_url(url: str) -> bool:
+    """Validate if URL looks like an image"""
+    if not url:
+        return False
+
+    url_lower = url.lower()
+
+    # Direct image file check
+    if url_lower.endswith(IMAGE_EXTENSIONS):
+        return True
+
+    # Check for common image URL patterns
+    return any(hint in url_lower for hint in IMAGE_URL_HINTS)
+
+def resolve_image_url(image_url: str, base_url: str) -> str:
+    """Make protocol-relative and relative image URLs absolute"""
+    if image_url.startswith(('http://', 'https://')):
+        return image_url
+    return urljoin(base_url, image_url)
+
+def _structural_images(entry: dict) -> Iterator[str]:
+    """Image URLs from the entry's media fields, without touching any HTML"""
+    # Method 1: Check for media content
+    for media in entry.get('media_content') or ():
+        if media.get('medium') == 'image' or 'image' in media.get('type', ''):
+            if media.get('url'):
+                yield media['url']
+
+    # Method 2: Check for enclosures
+    for enclosure in entry.get('enclosures') or ():
+        if 'image' in (enclosure.get('type') or '') and enclosure.get('href'):
+            yield enclosure['href']
+
+    # Method 3: Check for media thumbnail, itunes:image or other image fields
+    for field_name in ('media_thumbnail', 'image', 'itunes_image'):
+        img_data = entry.get(field_name)
+        if not img_data:
+            continue
+        if isinstance(img_data, str):
+            yield img_data
+        elif isinstance(img_data, dict):
+            if img_data.get('url'):
+                yield img_data['url']
+            elif img_data.get('href'):
+                yield img_data['href']
+        elif isinstance(img_data, list):
+            for item in img_data:
+                if isinstance(item, dict) and item.get('url'):
+                    yield item['url']
+
+def _structural_image(entry: dict) -> Optional[str]:
+    return next(_structural_images(entry), None)
+
+def _content_html(entry: dict) -> str:
+    content = entry.get('content')
+    if content:
+        if isinstance(content, list):
+            return content[0].get('value', '')
+        return str(content)
+    return entry.get('description', '') or entry.get('summary', '')
+
+def extract_entry_image(entry: dict, base_url: str) -> Optional[str]:
+    """Extract image URL from the entry itself, without any network access"""
+    image_url = _structural_image(entry)
+
+    # Method 4: Extract from description or content, stopping at the first match
+    if not image_url:
+        html = _content_html(entry)
+        if html:
+            for pattern in CONTENT_IMAGE_PATTERNS:
+                match = pattern.search(html)
+                if match:
+                    image_url = match.group(1)
+                    break
+
+    if not image_url:
+        return None
+
+    image_url = resolve_image_url(image_url, base_url)
+    return image_url if is_valid_image_url(image_url) else None
+
+def entry_image_candidates(entry: dict, base_url: str, limit: int = MAX_CANDIDATES) -> List[str]:
+    """Absolute image URLs in the entry, in extract_entry_image's order of preference
+
+    Unlike extract_entry_image this keeps every match, up to limit, and leaves
+    judging them to image_probe, which reads their real size and type.
+    """
+    candidates = []
+
+    def add(image_url: str) -> bool:
+        image_url = resolve_image_url(image_url.strip().strip('"\''), base_url)
+        if image_url.startswith(('http://', 'https://')) and image_url not in candidates:
+            candidates.append(image_url)
+        return len(candidates) >= limit
+
+    for image_url in _structural_images(entry):
+        if add(image_url):
+            return candidates
+    html = _content_html(entry)
+    if html:
+        for pattern in CONTENT_IMAGE_PATTERNS:
+            for match in pattern.finditer(html):
+                if add(match.group(1)):
+                    return candidates
+    return candidates
+
+def extract_page_image(html: str, page_url: str,
+                       site_patterns: List[Pattern] = ()) -> Optional[str]:
+    """First valid image from an article page's meta tags, then site_patterns"""
+    for pattern in (*META_IMAGE_PATTERNS, *site_patterns):
+        match = pattern.search(html)
+        if match:
+            image_url = resolve_image_url(match.group(1), page_url)
+            if is_valid_image_url(image_url):
+                return image_url
+    return None
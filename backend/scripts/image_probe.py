@@ -0,0 +1,317 @@
+"""
+Image probing: pick an article's hero image by its real size and type
+
+A URL containing "img" says little about what it serves; feeds are full of
+1x1 tracking pixels, avatars and dead links. The prober fetches only the first
+PROBE_BYTES of each candidate with a Range request (servers that ignore Range
+have the connection dropped after those bytes) and reads width, height and
+format from the PNG, GIF, WebP or JPEG header. JPEGs whose frame header sits
+behind a large EXIF block get up to two more Range requests at the right offset.
+
+Results are cached by image URL in a bounded in-memory LRU in front of the
+image_probes table, dead links for less time than real images. Probes run
+concurrently, with a per-host limit so one CDN isn't hit by a whole feed at once.
+"""
+
+import asyncio
+import logging
+import sqlite3
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+PROBE_BYTES = 8192
+# Follow-up reads for JPEGs with the frame header past the first chunk
+MAX_JPEG_READS = 2
+PROBE_TIMEOUT = aiohttp.ClientTimeout(total=10, sock_connect=5)
+
+# Smaller images are icons, avatars or tracking pixels
+MIN_WIDTH = 200
+MIN_HEIGHT = 120
+# Wider or taller than this is a banner or a divider, not a photo
+MAX_ASPECT_RATIO = 4.0
+# Past this area a bigger original makes no visible difference
+AREA_CAP = 1600 * 900
+
+# Start-of-frame markers; C4 (DHT), C8 (JPG) and CC (DAC) share the range
+JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+@dataclass
+class ImageInfo:
+    url: str
+    # 'ok' (header parsed), 'not_image', 'unknown' (an image type we can't size) or 'error'
+    status: str
+    kind: Optional[str] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    error: Optional[str] = None
+
+    @property
+    def usable(self) -> bool:
+        """Big enough and photo-shaped to be a hero image"""
+        if self.status != 'ok' or not self.width or not self.height:
+            return False
+        if self.width < MIN_WIDTH or self.height < MIN_HEIGHT:
+            return False
+        return max(self.width / self.height, self.height / self.width) <= MAX_ASPECT_RATIO
+
+    @property
+    def score(self) -> int:
+        return min(self.width * self.height, AREA_CAP) if self.usable else 0
+
+def _jpeg_scan(data: bytes, base: int, pos: int) -> Tuple[Optional[Tuple[int, int]], Optional[int]]:
+    """Walk JPEG segments from absolute offset pos in data (which starts at base)
+
+    Returns ((width, height), None) at the frame header, (None, offset) when
+    the segment at offset isn't in data, or (None, None) for a broken file.
+    """
+    while True:
+        index = pos - base
+        if index + 4 > len(data):
+            return None, pos
+        if data[index] != 0xFF:
+            return None, None
+        marker = data[index + 1]
+        if marker == 0xFF:
+            pos += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            pos += 2
+            continue
+        if marker in (0xD9, 0xDA):
+            # End of image or start of scan before any frame header
+            return None, None
+        if marker in JPEG_SOF_MARKERS:
+            if index + 9 > len(data):
+                return None, pos
+            height = int.from_bytes(data[index + 5:index + 7], 'big')
+            width = int.from_bytes(data[index + 7:index + 9], 'big')
+            return (width, height), None
+        pos += 2 + int.from_bytes(data[index + 2:index + 4], 'big')
+
+def parse_image_header(data: bytes) -> Optional[Tuple[str, Optional[int], Optional[int]]]:
+    """(kind, width, height) from the first bytes of an image file, or None if it isn't one
+
+    JPEGs whose frame header lies beyond data come back with no dimensions;
+    ImageProber reads further for those.
+    """
+    if data.startswith(b'\x89PNG\r\n\x1a\n') and len(data) >= 24:
+        return 'png', int.from_bytes(data[16:20], 'big'), int.from_bytes(data[20:24], 'big')
+    if data[:6] in (b'GIF87a', b'GIF89a') and len(data) >= 10:
+        return 'gif', int.from_bytes(data[6:8], 'little'), int.from_bytes(data[8:10], 'little')
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP' and len(data) >= 30:
+        chunk = data[12:16]
+        if chunk == b'VP8 ':
+            return ('webp', int.from_bytes(data[26:28], 'little') & 0x3FFF,
+                    int.from_bytes(data[28:30], 'little') & 0x3FFF)
+        if chunk == b'VP8L':
+            bits = int.from_bytes(data[21:25], 'little')
+            return 'webp', (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        if chunk == b'VP8X':
+            return ('webp', int.from_bytes(data[24:27], 'little') + 1,
+                    int.from_bytes(data[27:30], 'little') + 1)
+        return 'webp', None, None
+    if data[:3] == b'\xff\xd8\xff':
+        size, _ = _jpeg_scan(data, 0, 2)
+        return ('jpeg', *size) if size else ('jpeg', None, None)
+    return None
+
+class ProbeCache:
+    """Bounded LRU over the image_probes table: image URL -> ImageInfo"""
+
+    def __init__(self, conn: sqlite3.Connection, max_entries: int = 10000,
+                 ttl_seconds: int = 30 * 24 * 3600, negative_ttl_seconds: int = 24 * 3600):
+        self.conn = conn
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # Dead links and non-images are retried sooner, they may be fixed
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self._entries: 'OrderedDict[str, Tuple[ImageInfo, float]]' = OrderedDict()
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS image_probes (
+                    url TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    kind TEXT,
+                    width INTEGER,
+                    height INTEGER,
+                    probedAt REAL NOT NULL
+                )
+            """)
+
+    def _fresh(self, info: ImageInfo, probed_at: float) -> bool:
+        ttl = self.ttl_seconds if info.status in ('ok', 'unknown') else self.negative_ttl_seconds
+        return time.time() - probed_at <= ttl
+
+    def _remember(self, info: ImageInfo, probed_at: float):
+        self._entries[info.url] = (info, probed_at)
+        self._entries.move_to_end(info.url)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, url: str) -> Optional[ImageInfo]:
+        entry = self._entries.get(url)
+        if entry is None:
+            row = self.conn.execute(
+                "SELECT status, kind, width, height, probedAt FROM image_probes WHERE url = ?", (url,)
+            ).fetchone()
+            if not row:
+                return None
+            entry = (ImageInfo(url, *row[:4]), row[4])
+        info, probed_at = entry
+        if not self._fresh(info, probed_at):
+            self._entries.pop(url, None)
+            return None
+        self._remember(info, probed_at)
+        return info
+
+    def put_many(self, infos: Sequence[ImageInfo]):
+        now = time.time()
+        for info in infos:
+            self._remember(info, now)
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO image_probes (url, status, kind, width, height, probedAt) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(info.url, info.status, info.kind, info.width, info.height, now) for info in infos]
+            )
+
+    def purge_expired(self) -> int:
+        """Delete rows older than the longest TTL"""
+        cutoff = time.time() - max(self.ttl_seconds, self.negative_ttl_seconds)
+        with self.conn:
+            cursor = self.conn.execute("DELETE FROM image_probes WHERE probedAt < ?", (cutoff,))
+        return cursor.rowcount
+
+class ImageProber:
+    def __init__(self, session, cache: Optional[ProbeCache] = None,
+                 concurrency: int = 16, per_host_limit: int = 4, counter=None):
+        self.session = session
+        self.cache = cache
+        # Optional metrics.Counter with a result label
+        self.counter = counter
+        self.per_host_limit = per_host_limit
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        # Concurrent probes of the same URL share one request
+        self._pending: Dict[str, asyncio.Future] = {}
+        self.probes = 0
+        self.cache_hits = 0
+        self.bytes_read = 0
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        host = urlparse(url).netloc.lower()
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.per_host_limit)
+        return self._host_semaphores[host]
+
+    async def _read_range(self, url: str, start: int) -> Tuple[Optional[str], bytes]:
+        """(content type, up to PROBE_BYTES from offset start); raises on HTTP errors
+
+        Past the start, a server that ignores Range yields no bytes.
+        """
+        headers = {'Range': f'bytes={start}-{start + PROBE_BYTES - 1}', 'Accept-Encoding': 'identity'}
+        async with self.session.get(url, headers=headers, timeout=PROBE_TIMEOUT) as response:
+            response.raise_for_status()
+            if start and response.status != 206:
+                # Only the start of the file can be had from a server that ignores Range
+                response.close()
+                return response.content_type, b''
+            data = bytearray()
+            async for chunk in response.content.iter_chunked(PROBE_BYTES):
+                data.extend(chunk)
+                if len(data) >= PROBE_BYTES:
+                    break
+            if not response.content.at_eof():
+                # A server ignoring Range would send the whole image otherwise
+                response.close()
+            self.bytes_read += len(data)
+            return response.content_type, bytes(data[:PROBE_BYTES])
+
+    async def _fetch(self, url: str) -> ImageInfo:
+        self.probes += 1
+        try:
+            async with self._host_semaphore(url), self._semaphore:
+                content_type, data = await self._read_range(url, 0)
+                header = parse_image_header(data)
+                if header and header[0] == 'jpeg' and header[1] is None:
+                    # The frame header is further in; read from the segment that holds it
+                    size, pos = _jpeg_scan(data, 0, 2)
+                    for _ in range(MAX_JPEG_READS):
+                        if size or pos is None:
+                            break
+                        _, more = await self._read_range(url, pos)
+                        if not more:
+                            break
+                        size, pos = _jpeg_scan(more, pos, pos)
+                    if size:
+                        header = ('jpeg', *size)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.debug(f"Image probe failed for {url}: {e}")
+            return ImageInfo(url, 'error', error=str(e) or type(e).__name__)
+        except Exception as e:
+            # A malformed candidate (bad URL, odd encoding) only rules itself out
+            logger.warning(f"Image probe failed for {url}: {type(e).__name__}: {e}")
+            return ImageInfo(url, 'error', error=str(e) or type(e).__name__)
+
+        if header and header[1] is not None:
+            return ImageInfo(url, 'ok', *header)
+        if header or (content_type or '').startswith('image/'):
+            # SVG, AVIF, a JPEG we couldn't size: an image, but not one we can rank
+            kind = header[0] if header else content_type.split('/', 1)[1]
+            return ImageInfo(url, 'unknown', kind)
+        return ImageInfo(url, 'not_image', error=content_type)
+
+    async def probe(self, url: str) -> ImageInfo:
+        if self.cache:
+            info = self.cache.get(url)
+            if info:
+                self.cache_hits += 1
+                if self.counter:
+                    self.counter.inc(result='cached')
+                return info
+        if url in self._pending:
+            return await asyncio.shield(self._pending[url])
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[url] = future
+        info = None
+        try:
+            info = await self._fetch(url)
+            if self.counter:
+                self.counter.inc(result=info.status)
+            if self.cache:
+                self.cache.put_many([info])
+        finally:
+            if info is None:
+                # Cancelled: the probes waiting on this one get an error, not None
+                info = ImageInfo(url, 'error', error='cancelled')
+            future.set_result(info)
+            del self._pending[url]
+        return info
+
+    async def probe_many(self, urls: Sequence[str]) -> List[ImageInfo]:
+        return list(await asyncio.gather(*(self.probe(url) for url in urls)))
+
+    async def choose(self, candidates: Sequence[str]) -> Optional[ImageInfo]:
+        """The best usable candidate, earlier ones winning ties
+
+        Without one, the first image in a format we can't size (AVIF, HEIC)
+        is taken, since that is usually a photo; SVGs are usually logos.
+        """
+        if not candidates:
+            return None
+        best = fallback = None
+        for info in await self.probe_many(candidates):
+            if info.usable and (best is None or info.score > best.score):
+                best = info
+            elif (info.status == 'unknown' and fallback is None
+                  and 'svg' not in (info.kind or '')):
+                fallback = info
+        return best or fallback
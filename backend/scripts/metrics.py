@@ -0,0 +1,201 @@
+"""
+Prometheus metrics for the ingestion pipeline
+
+A small in-process registry of counters, gauges and histograms rendered in the
+Prometheus text exposition format (0.0.4), so the parser needs no client
+library. A one-shot run writes the metrics to a file for node_exporter's
+textfile collector; the daemon can also serve them over HTTP on a local port.
+"""
+
+import logging
+import os
+import tempfile
+import time
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds: HTTP fetches and scrapes, from a cached 304 to a slow origin
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# Seconds: CPU-bound steps (parsing, per-entry image extraction, DB writes)
+FAST_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, object]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}',
+                *self.samples()]
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+                for key, value in sorted(self.values.items())]
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        self.values[self._key(labels)] = value
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: non-cumulative bucket counts (last one is +Inf), sum
+        self.series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+        counts, total = series
+        counts[bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, (counts, total) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float('inf')), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(float(bound))}"')
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total[0])}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path: str):
+        """Write atomically, as the textfile collector may read at any moment"""
+        target = Path(path)
+        fd, tmp_path = tempfile.mkstemp(dir=target.parent, prefix=f'.{target.name}.')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as handle:
+                handle.write(self.render())
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, target)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    async def serve(self, host: str, port: int) -> web.AppRunner:
+        """Serve /metrics until the returned runner is cleaned up"""
+        async def handle(request):
+            return web.Response(body=self.render().encode('utf-8'), headers={'Content-Type': CONTENT_TYPE})
+
+        app = web.Application()
+        app.router.add_get('/metrics', handle)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+        return runner
+
+class IngestMetrics:
+    """Every metric the RSS parser records
+
+    Counters are labelled by feed id. Histograms cost a series per bucket, so
+    fetch times are labelled by host and the CPU-bound steps not at all.
+    """
+
+    def __init__(self, registry: Registry = None):
+        self.registry = registry or Registry()
+        add = self.registry.register
+
+        self.fetch_seconds = add(Histogram(
+            'newshub_feed_fetch_seconds', 'Feed download time, request to last byte, by host', ['host']))
+        self.fetches = add(Counter(
+            'newshub_feed_fetches_total', 'Feed fetches by HTTP status (error: no response)', ['feed', 'status']))
+        self.fetch_bytes = add(Counter(
+            'newshub_feed_fetch_bytes_total', 'Feed body bytes downloaded', ['feed']))
+        self.parse_seconds = add(Histogram(
+            'newshub_feed_parse_seconds', 'CPU time parsing and normalising one feed body',
+            buckets=FAST_BUCKETS))
+        self.entries_seen = add(Counter(
+            'newshub_feed_entries_seen_total', 'Feed entries read', ['feed']))
+        self.entries_new = add(Counter(
+            'newshub_feed_entries_new_total', 'Feed entries stored as new articles', ['feed']))
+        self.image_seconds = add(Histogram(
+            'newshub_image_extraction_seconds', 'Time to find one article image, by method', ['method'],
+            FAST_BUCKETS + (2.5, 5, 10)))
+        self.images_found = add(Counter(
+            'newshub_images_found_total', 'Article images found, by method', ['method']))
+        self.scrapes = add(Counter(
+            'newshub_page_scrapes_total', 'Article pages scraped for an image (cache hits included)', ['feed']))
+        self.image_probes = add(Counter(
+            'newshub_image_probes_total', 'Candidate images probed, by result (cached: answered from the cache)',
+            ['result']))
+        self.db_write_seconds = add(Histogram(
+            'newshub_db_write_seconds', 'Time to store one feed\'s new articles', buckets=FAST_BUCKETS))
+        self.feeds_processed = add(Counter(
+            'newshub_feeds_processed_total', 'Feeds processed, by outcome', ['result']))
+        self.hosts_circuit_open = add(Gauge(
+            'newshub_hosts_circuit_open', 'Feed hosts whose circuit breaker is open or half-open'))
+        self.run_seconds = add(Gauge(
+            'newshub_run_duration_seconds', 'Duration of the last one-shot run'))
+        self.last_success = add(Gauge(
+            'newshub_last_success_timestamp_seconds', 'Unix time a feed was last processed successfully'))
+
+    def feed_succeeded(self):
+        self.feeds_processed.inc(result='ok')
+        self.last_success.set(time.time())
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate story detection across feeds
+
+Each article gets a MinHash signature over the words of its cleaned title and
+description: 32 minima of 16-bit hashes, 64 bytes. The share of positions two
+signatures agree on estimates the Jaccard similarity of their word sets, which
+stays high when a wire story is republished with a source suffix, a reworded
+word or a shortened description.
+
+The index is LSH banding in SQLite: the signature is cut into 8 bands of 4
+minima, each band an indexed integer column of article_signatures. Two
+articles become candidates when any band matches exactly, which for Jaccard
+0.8 happens 97% of the time and for unrelated stories almost never. Each band
+reads at most MAX_BUCKET_CANDIDATES rows, so a lookup costs the same whatever
+the table size. Candidates are then checked against the full signature.
+
+Duplicates are kept, grouped under the clusterId of the first article seen;
+articles with no match start their own cluster. Only the last window_hours of
+signatures are matched against, and older ones are pruned as ingestion runs.
+
+Usage:
+  python scripts/near_duplicates.py [--clusters 20]
+  python scripts/near_duplicates.py --backfill
+"""
+
+import argparse
+import hashlib
+import logging
+import operator
+import re
+import sqlite3
+import struct
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from newshub_db import add_db_argument, connect
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_SIZE = 32
+BANDS = 8
+DEFAULT_WINDOW_HOURS = 72.0
+DEFAULT_MIN_SIMILARITY = 0.7
+# Headlines shorter than this collide too easily to be worth matching
+MIN_FEATURES = 4
+PRUNE_INTERVAL_SECONDS = 3600
+# Newest rows read per band: words common to many stories make some buckets
+# grow with the corpus, and a true duplicate is recent and usually shares
+# several bands anyway
+MAX_BUCKET_CANDIDATES = 32
+
+WORD_PATTERN = re.compile(r'\w+')
+STOPWORDS = frozenset("""
+a about after all also an and are as at be been but by can could for from had has have he her his how
+i if in into is it its just more new no not of on or our out over says said she so than that the their
+them there they this to up was we were what when which who will with would you your
+""".split())
+
+# One 64-byte blake2b digest per word gives all 32 16-bit hash values at once
+_HASHES = struct.Struct(f'<{SIGNATURE_SIZE}H')
+# Each band is 4 minima, 8 bytes: read straight off the signature as an int64
+_BAND_KEYS = struct.Struct(f'<{BANDS}q')
+
+BAND_COLUMNS = [f'band{band}' for band in range(BANDS)]
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS article_signatures (
+    id integer PRIMARY KEY,
+    articleId varchar NOT NULL,
+    clusterId varchar NOT NULL,
+    signature blob NOT NULL,
+    seenAt real NOT NULL,
+    {', '.join(f'{column} integer NOT NULL' for column in BAND_COLUMNS)}
+);
+CREATE INDEX IF NOT EXISTS article_signatures_seen ON article_signatures (seenAt);
+""" + ''.join(f"CREATE INDEX IF NOT EXISTS article_signatures_{column} ON article_signatures ({column});\n"
+              for column in BAND_COLUMNS)
+
+# One bounded walk down each band's index, newest first
+LOOKUP_SQL = ' UNION ALL '.join(f"""
+    SELECT * FROM (
+        SELECT id, clusterId, signature FROM article_signatures
+        WHERE {column} = ? AND seenAt >= ? ORDER BY id DESC LIMIT {MAX_BUCKET_CANDIDATES}
+    )""" for column in BAND_COLUMNS)
+INSERT_SQL = f"""
+    INSERT INTO article_signatures (articleId, clusterId, signature, seenAt, {', '.join(BAND_COLUMNS)})
+    VALUES (?, ?, ?, ?, {', '.join('?' * BANDS)})
+"""
+
+def features(text: str) -> set:
+    """The distinct lower-cased words of text, minus stopwords and single characters"""
+    return {word for word in WORD_PATTERN.findall(text.lower()) if len(word) > 1 and word not in STOPWORDS}
+
+def signature(title: str, description: Optional[str] = None) -> Optional[bytes]:
+    """MinHash signature of an article, or None when it has too few words to compare"""
+    words = features(f'{title} {description or ""}')
+    if len(words) < MIN_FEATURES:
+        return None
+    blake2b, unpack = hashlib.blake2b, _HASHES.unpack
+    minima = map(min, *[unpack(blake2b(word.encode()).digest()) for word in words])
+    return _HASHES.pack(*minima)
+
+def similarity(first: bytes, second: bytes) -> float:
+    """Estimated Jaccard similarity: the share of minima two signatures agree on"""
+    return sum(map(operator.eq, _HASHES.unpack(first), _HASHES.unpack(second))) / SIGNATURE_SIZE
+
+def band_keys(signature: bytes) -> Tuple[int, ...]:
+    return _BAND_KEYS.unpack(signature)
+
+@dataclass
+class Cluster:
+    cluster_id: str
+    articles: int
+    feeds: int
+    title: str
+
+class DuplicateIndex:
+    """Assigns cluster ids against the signatures of recent articles"""
+
+    def __init__(self, conn: sqlite3.Connection, window_hours: float = DEFAULT_WINDOW_HOURS,
+                 min_similarity: float = DEFAULT_MIN_SIMILARITY):
+        self.conn = conn
+        self.window_seconds = window_hours * 3600
+        self.min_similarity = min_similarity
+        self._next_prune = 0.0
+
+    def ensure_schema(self):
+        """Create the signature table and articles.clusterId (mirrored in article.entity.ts)"""
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(articles)")}
+        with self.conn:
+            if 'clusterId' not in columns:
+                self.conn.execute("ALTER TABLE articles ADD COLUMN clusterId varchar")
+            self.conn.executescript(SCHEMA)
+
+    def find(self, signature: bytes, now: Optional[float] = None) -> Optional[Tuple[str, float]]:
+        """The cluster of a recent article close enough to signature, with its similarity
+
+        Rows are read lazily and the first close match wins: any article that
+        similar belongs to the same story, and a burst of copies of one story
+        would otherwise have every band full of candidates to score.
+        """
+        now = time.time() if now is None else now
+        cutoff = now - self.window_seconds
+        checked = set()
+        for row_id, cluster_id, candidate in self.conn.execute(
+            LOOKUP_SQL, [value for key in band_keys(signature) for value in (key, cutoff)]
+        ):
+            # Close duplicates turn up once per band they share
+            if row_id in checked:
+                continue
+            checked.add(row_id)
+            score = similarity(signature, candidate)
+            if score >= self.min_similarity:
+                return cluster_id, score
+        return None
+
+    def cluster_for(self, article_id: str, signature: Optional[bytes], now: Optional[float] = None) -> str:
+        """Cluster id for a new article, without recording it; see record"""
+        if signature is None:
+            return article_id
+        now = time.time() if now is None else now
+        if now >= self._next_prune:
+            self.prune(now)
+        match = self.find(signature, now)
+        if not match:
+            return article_id
+        logger.debug(f"Article {article_id} joins cluster {match[0]} (similarity {match[1]:.2f})")
+        return match[0]
+
+    def record(self, article_id: str, cluster_id: str, signature: Optional[bytes], now: Optional[float] = None):
+        """Record a stored article's signature for later lookups
+
+        Runs in the caller's transaction, so articles saved in the same batch
+        already see each other.
+        """
+        if signature is not None:
+            now = time.time() if now is None else now
+            self.conn.execute(INSERT_SQL, (article_id, cluster_id, signature, now, *band_keys(signature)))
+
+    def assign(self, article_id: str, signature: Optional[bytes], now: Optional[float] = None) -> str:
+        """cluster_for and record in one, for articles already stored"""
+        now = time.time() if now is None else now
+        cluster_id = self.cluster_for(article_id, signature, now)
+        self.record(article_id, cluster_id, signature, now)
+        return cluster_id
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """Forget signatures that have left the window"""
+        now = time.time() if now is None else now
+        self._next_prune = now + PRUNE_INTERVAL_SECONDS
+        return self.conn.execute("DELETE FROM article_signatures WHERE seenAt < ?",
+                                 (now - self.window_seconds,)).rowcount
+
+def backfill(conn: sqlite3.Connection, index: DuplicateIndex, batch_size: int = 1000) -> int:
+    """Cluster articles created within the window that have no clusterId yet, oldest first"""
+    cutoff = f"-{int(index.window_seconds)} seconds"
+    rows = conn.execute("""
+        SELECT id, title, description, (julianday(createdAt) - 2440587.5) * 86400 FROM articles
+        WHERE clusterId IS NULL AND createdAt >= datetime('now', ?)
+        ORDER BY createdAt, rowid
+    """, (cutoff,)).fetchall()
+    for start in range(0, len(rows), batch_size):
+        with conn:
+            conn.executemany("UPDATE articles SET clusterId = ? WHERE id = ?", [
+                (index.assign(article_id, signature(title, description), created), article_id)
+                for article_id, title, description, created in rows[start:start + batch_size]
+            ])
+    return len(rows)
+
+def largest_clusters(conn: sqlite3.Connection, limit: int, window_hours: float) -> List[Cluster]:
+    """Clusters with more than one article created within the window, largest first"""
+    return [Cluster(*row) for row in conn.execute("""
+        SELECT a.clusterId, COUNT(*), COUNT(DISTINCT a.feedId),
+               (SELECT title FROM articles WHERE id = a.clusterId)
+        FROM articles a
+        WHERE a.clusterId IS NOT NULL AND a.createdAt >= datetime('now', ?)
+        GROUP BY a.clusterId HAVING COUNT(*) > 1
+        ORDER BY COUNT(*) DESC LIMIT ?
+    """, (f"-{int(window_hours * 3600)} seconds", limit))]
+
+def main():
+    parser = argparse.ArgumentParser(description='Near-duplicate article clusters')
+    add_db_argument(parser)
+    parser.add_argument('--window-hours', type=float, default=DEFAULT_WINDOW_HOURS,
+                        help='How far back articles are matched against')
+    parser.add_argument('--min-similarity', type=float, default=DEFAULT_MIN_SIMILARITY,
+                        help='Estimated Jaccard similarity that makes two articles duplicates')
+    parser.add_argument('--backfill', action='store_true',
+                        help='Cluster articles in the window stored before clustering existed')
+    parser.add_argument('--clusters', type=int, default=20, help='Largest clusters to list')
+    parser.add_argument('--verbose', '-v', action='store_true', help='Verbose logging')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    conn = connect(args.db)
+    try:
+        index = DuplicateIndex(conn, args.window_hours, args.min_similarity)
+        index.ensure_schema()
+        if args.backfill:
+            start = time.perf_counter()
+            count = backfill(conn, index)
+            logger.info(f"Clustered {count} articles in {time.perf_counter() - start:.1f}s")
+
+        print(f"Largest clusters in the last {args.window_hours:g} hours:")
+        for cluster in largest_clusters(conn, args.clusters, args.window_hours):
+            print(f"  {cluster.articles} articles from {cluster.feeds} feeds: {cluster.title or cluster.cluster_id}")
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+SQLite connections for every NewsHub Python script
+
+The path is resolved the way the NestJS backend resolves it:
+- an explicit path wins
+- then $NEWSHUB_DATABASE_PATH
+- then backend/newshub.sqlite
+
+Relative paths are taken from the backend directory, the backend's working
+directory, so scripts find the same file wherever they are run from.
+
+Writers switch the database to WAL, so the ingester and the API no longer block
+each other, and wait out short locks instead of failing with "database is
+locked". Reporting scripts get read-only connections that never take a write
+lock.
+
+Articles past retention live in a second file, newshub-archive.sqlite by
+default, which retention.py and the ingester attach as the `archive` schema.
+"""
+
+import hashlib
+import os
+import sqlite3
+from pathlib import Path
+from typing import Optional
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_DB_NAME = 'newshub.sqlite'
+DB_PATH_ENV = 'NEWSHUB_DATABASE_PATH'
+ARCHIVE_PATH_ENV = 'NEWSHUB_ARCHIVE_PATH'
+ARCHIVE_SCHEMA = 'archive'
+
+BUSY_TIMEOUT_MS = 5000
+# Negative cache_size is in KiB
+CACHE_SIZE_KIB = 64 * 1024
+MMAP_SIZE_BYTES = 256 * 1024 * 1024
+
+def resolve_db_path(db_path: Optional[str] = None) -> Path:
+    """Absolute database path from db_path, $NEWSHUB_DATABASE_PATH or the default"""
+    path = Path(db_path or os.environ.get(DB_PATH_ENV) or DEFAULT_DB_NAME).expanduser()
+    if not path.is_absolute():
+        path = BACKEND_DIR / path
+    return path
+
+def resolve_archive_path(db_path: Optional[str] = None, archive_path: Optional[str] = None) -> Path:
+    """The archive database: archive_path, $NEWSHUB_ARCHIVE_PATH, or <database>-archive next to the database"""
+    path = archive_path or os.environ.get(ARCHIVE_PATH_ENV)
+    if not path:
+        db = resolve_db_path(db_path)
+        return db.with_name(f"{db.stem}-archive{db.suffix}")
+    path = Path(path).expanduser()
+    return path if path.is_absolute() else BACKEND_DIR / path
+
+def attach_archive(conn: sqlite3.Connection, db_path: Optional[str] = None,
+                   archive_path: Optional[str] = None, create: bool = False) -> bool:
+    """ATTACH the archive database as `archive`; False when it doesn't exist and create is off"""
+    if ARCHIVE_SCHEMA in {row[1] for row in conn.execute("PRAGMA database_list")}:
+        return True
+    path = resolve_archive_path(db_path, archive_path)
+    if not create and not path.exists():
+        return False
+    conn.execute(f"ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}", (str(path),))
+    return True
+
+def apply_pragmas(conn: sqlite3.Connection, readonly: bool = False):
+    """Per-connection tuning; journal_mode=WAL is stored in the file and sticks"""
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KIB}")
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE_BYTES}")
+    if readonly:
+        conn.execute("PRAGMA query_only = ON")
+        return
+    conn.execute("PRAGMA journal_mode = WAL")
+    # Safe with WAL: a power loss can only drop the last commits, never corrupt
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA temp_store = MEMORY")
+
+def connect(db_path: Optional[str] = None, readonly: bool = False) -> sqlite3.Connection:
+    """Open a tuned connection; readonly ones fail if the database doesn't exist"""
+    path = resolve_db_path(db_path)
+    if readonly:
+        conn = sqlite3.connect(f"{path.as_uri()}?mode=ro", uri=True,
+                               timeout=BUSY_TIMEOUT_MS / 1000)
+    else:
+        conn = sqlite3.connect(str(path), timeout=BUSY_TIMEOUT_MS / 1000)
+    apply_pragmas(conn, readonly)
+    return conn
+
+def add_db_argument(parser):
+    """The --db option every script shares"""
+    parser.add_argument('--db', default=None,
+                        help=f'Database path (default: ${DB_PATH_ENV} or backend/{DEFAULT_DB_NAME})')
+
+def typeorm_index_name(table: str, *columns: str, where: Optional[str] = None) -> str:
+    """The name TypeORM gives @Index(columns) on table, so a script-created index is the entity's own"""
+    key = f"{table.replace('.', '_')}_{'_'.join(sorted(columns))}"
+    if where:
+        key += f"_{where}"
+    return 'IDX_' + hashlib.sha1(key.encode()).hexdigest()[:26]
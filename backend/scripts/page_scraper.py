@@ -0,0 +1,154 @@
+"""
+Article-page image scraper for the RSS parser and the image retrofitter
+
+og:image and twitter:image live in <head>, so pages are streamed and reading
+stops at </head>. Only scrapers with body-level patterns read further, and then
+only up to a capped number of bytes. Results, including "no image", are cached
+in SQLite under the link's canonical URL, so an article is never scraped twice
+within the TTL whichever tracking parameters or proxy its link came with.
+"""
+
+import asyncio
+import logging
+import sqlite3
+import time
+from typing import Dict, Optional, Tuple
+
+from canonical_urls import canonical_url
+from image_extraction import SiteScraper, extract_page_image, find_scraper
+
+logger = logging.getLogger(__name__)
+
+# Refusals that say "not now" rather than "no page": rate limiting, bot blocks, request timeouts
+RETRYABLE_STATUSES = frozenset((403, 408, 429))
+
+class ScrapeCache:
+    """scraped_images table: canonical article URL -> image URL (NULL when none was found)"""
+
+    def __init__(self, conn: sqlite3.Connection, ttl_seconds: int = 7 * 24 * 3600,
+                 negative_ttl_seconds: int = 24 * 3600):
+        self.conn = conn
+        self.ttl_seconds = ttl_seconds
+        # Pages without an image are retried sooner, publishers add them late
+        self.negative_ttl_seconds = negative_ttl_seconds
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS scraped_images (
+                    url TEXT PRIMARY KEY,
+                    imageUrl TEXT,
+                    scrapedAt REAL NOT NULL
+                )
+            """)
+
+    def get(self, url: str) -> Tuple[bool, Optional[str]]:
+        """Return (hit, image_url); a hit with image_url None is a cached miss"""
+        row = self.conn.execute(
+            "SELECT imageUrl, scrapedAt FROM scraped_images WHERE url = ?", (url,)
+        ).fetchone()
+        if not row:
+            return False, None
+        image_url, scraped_at = row
+        ttl = self.ttl_seconds if image_url else self.negative_ttl_seconds
+        if time.time() - scraped_at > ttl:
+            return False, None
+        return True, image_url
+
+    def put(self, url: str, image_url: Optional[str]):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO scraped_images (url, imageUrl, scrapedAt) VALUES (?, ?, ?)",
+                (url, image_url, time.time())
+            )
+
+    def purge_expired(self) -> int:
+        """Delete entries older than the longest TTL"""
+        cutoff = time.time() - max(self.ttl_seconds, self.negative_ttl_seconds)
+        with self.conn:
+            cursor = self.conn.execute("DELETE FROM scraped_images WHERE scrapedAt < ?", (cutoff,))
+        return cursor.rowcount
+
+class PageImageScraper:
+    CHUNK_SIZE = 8192
+
+    def __init__(self, session, cache: Optional[ScrapeCache] = None,
+                 max_head_bytes: int = 256 * 1024, max_body_bytes: int = 512 * 1024):
+        self.session = session
+        self.cache = cache
+        self.max_head_bytes = max_head_bytes
+        self.max_body_bytes = max_body_bytes
+        # Concurrent scrapes of the same URL share one request
+        self._pending: Dict[str, asyncio.Future] = {}
+        self.pages_fetched = 0
+        self.bytes_read = 0
+
+    async def scrape(self, article_url: str, scraper: Optional[SiteScraper] = None) -> Tuple[bool, Optional[str]]:
+        """Return (definitive, image_url) for article_url, from the cache when possible
+
+        A result is definitive when it came from the cache or could be cached;
+        after a timeout or a server error the page is worth trying again.
+        """
+        if not article_url:
+            return True, None
+
+        key = canonical_url(article_url)
+        if self.cache:
+            hit, image_url = self.cache.get(key)
+            if hit:
+                return True, image_url
+
+        if key in self._pending:
+            return await asyncio.shield(self._pending[key])
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        cacheable, image_url = False, None
+        try:
+            cacheable, image_url = await self._fetch_image(article_url, scraper or find_scraper(article_url))
+            if self.cache and cacheable:
+                self.cache.put(key, image_url)
+        finally:
+            future.set_result((cacheable, image_url))
+            del self._pending[key]
+        return cacheable, image_url
+
+    async def _fetch_image(self, article_url: str,
+                           scraper: Optional[SiteScraper]) -> Tuple[bool, Optional[str]]:
+        """Return (cacheable, image_url); timeouts, refusals and server errors aren't cached"""
+        try:
+            async with self.session.get(article_url) as response:
+                if response.status != 200:
+                    return response.status < 500 and response.status not in RETRYABLE_STATUSES, None
+                self.pages_fetched += 1
+                encoding = response.charset or 'utf-8'
+                buffer = bytearray()
+                head_end = -1
+
+                async for chunk in response.content.iter_chunked(self.CHUNK_SIZE):
+                    # Re-scan a few bytes so a tag split across chunks is still found
+                    search_from = max(0, len(buffer) - 6)
+                    buffer.extend(chunk)
+                    head_end = bytes(buffer[search_from:]).lower().find(b'</head>')
+                    if head_end != -1:
+                        head_end += search_from
+                        break
+                    if len(buffer) >= self.max_head_bytes:
+                        break
+
+                head = buffer if head_end == -1 else buffer[:head_end]
+                image_url = extract_page_image(head.decode(encoding, errors='replace'), article_url)
+                if image_url or not scraper or not scraper.patterns:
+                    self.bytes_read += len(buffer)
+                    return True, image_url
+
+                # Body-level patterns: keep reading, but never past the cap
+                async for chunk in response.content.iter_chunked(self.CHUNK_SIZE):
+                    buffer.extend(chunk)
+                    if len(buffer) >= self.max_body_bytes:
+                        break
+                self.bytes_read += len(buffer)
+                body = buffer[:self.max_body_bytes].decode(encoding, errors='replace')
+                return True, extract_page_image(body, article_url, scraper.patterns)
+
+        except Exception as e:
+            logger.debug(f"Error scraping image from {article_url}: {str(e)}")
+            return False, None
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Article retention: move old articles to a compressed archive database
+
+Articles created more than --days ago that nobody has bookmarked are moved, in
+batches of --batch-size, to the articles table of the archive database
+(resolve_archive_path: newshub-archive.sqlite next to the database by default).
+The archive row keeps every column except description and content. Those two
+are stored together as one zlib-compressed body, which decompress_body reads
+back. Rows stay reachable by id, url and canonicalUrl: the ingester checks the
+archive before storing an article, so an archived story isn't ingested again,
+and `show` prints one.
+
+Each batch copies its rows with INSERT OR IGNORE and then deletes them, in one
+transaction. In WAL mode a transaction over two files is atomic per file only,
+so a crash in between can leave a row in both; the next run just deletes it.
+The bookmark check is repeated inside the transaction, so an article
+bookmarked while the batch was chosen stays.
+
+Deleted rows leave free pages. With auto_vacuum=INCREMENTAL they are returned
+to the filesystem --vacuum-step pages at a time, each step a short write that
+the API and the ingester barely notice. A database created without it only
+reuses the pages for new articles. `enable-incremental-vacuum` switches it
+once with a full VACUUM and reindexes search, since VACUUM renumbers the
+rowids articles_fts points at. Run it with the ingester and the API stopped.
+
+feed_stats and the search index follow the deletions through their triggers,
+so both cover the articles still in the main database.
+
+Usage:
+  python scripts/retention.py run --days 90 [--dry-run] [--json]
+  python scripts/retention.py show ARTICLE_ID_OR_URL
+  python scripts/retention.py enable-incremental-vacuum
+"""
+
+import argparse
+import json
+import logging
+import sqlite3
+import sys
+import time
+import zlib
+from dataclasses import asdict, dataclass
+from typing import List, Optional, Tuple
+
+from newshub_db import (ARCHIVE_SCHEMA, add_db_argument, attach_archive, connect, resolve_archive_path,
+                        typeorm_index_name)
+from search_index import rebuild as rebuild_search_index
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+VACUUM_STEP_PAGES = 2000
+COMPRESSION_LEVEL = 6
+# Stored compressed in the archive's body column
+BODY_COLUMNS = ('description', 'content')
+AUTO_VACUUM_INCREMENTAL = 2
+BOOKMARK_INDEX = typeorm_index_name('bookmarks', 'articleId')
+
+def compress_body(description: Optional[str], content: Optional[str]) -> bytes:
+    return zlib.compress(json.dumps([description, content], ensure_ascii=False).encode(), COMPRESSION_LEVEL)
+
+def decompress_body(body: bytes) -> Tuple[Optional[str], Optional[str]]:
+    description, content = json.loads(zlib.decompress(body))
+    return description, content
+
+class BodyCompressor:
+    """compress_body as an SQL function, counting bytes in and out"""
+
+    def __init__(self):
+        self.raw_bytes = 0
+        self.compressed_bytes = 0
+
+    def __call__(self, description: Optional[str], content: Optional[str]) -> bytes:
+        body = compress_body(description, content)
+        self.raw_bytes += len((description or '').encode()) + len((content or '').encode())
+        self.compressed_bytes += len(body)
+        return body
+
+@dataclass
+class DbSize:
+    page_size: int
+    pages: int
+    free_pages: int
+    # Bytes of pages holding articles, their indexes and the search index; None without dbstat
+    articles_bytes: Optional[int]
+
+    @property
+    def file_bytes(self) -> int:
+        return self.page_size * self.pages
+
+@dataclass
+class RetentionRun:
+    days: float
+    archived: int = 0
+    raw_bytes: int = 0
+    compressed_bytes: int = 0
+    articles_bytes_before: Optional[int] = None
+    articles_bytes_after: Optional[int] = None
+    file_bytes_before: int = 0
+    file_bytes_after: int = 0
+    free_bytes_left: int = 0
+    reclaimed_bytes: int = 0
+    archive_bytes: int = 0
+    incremental_vacuum: bool = False
+    seconds: float = 0.0
+
+def hot_columns(conn: sqlite3.Connection) -> List[Tuple[str, str]]:
+    """(name, declared type) of every main.articles column"""
+    return [(row[1], row[2]) for row in conn.execute("PRAGMA main.table_info(articles)")]
+
+def has_bookmarks(conn: sqlite3.Connection) -> bool:
+    row = conn.execute("SELECT 1 FROM main.sqlite_master WHERE type = 'table' AND name = 'bookmarks'").fetchone()
+    return row is not None
+
+def ensure_archive_schema(conn: sqlite3.Connection, db_path: Optional[str] = None,
+                          archive_path: Optional[str] = None) -> List[str]:
+    """Attach (creating) the archive and mirror articles' columns in it; returns the columns copied as-is"""
+    attach_archive(conn, db_path, archive_path, create=True)
+    if not conn.execute(f"PRAGMA {ARCHIVE_SCHEMA}.page_count").fetchone()[0]:
+        # Only takes effect before the first table is created
+        conn.execute(f"PRAGMA {ARCHIVE_SCHEMA}.auto_vacuum = INCREMENTAL")
+    conn.execute(f"PRAGMA {ARCHIVE_SCHEMA}.journal_mode = WAL")
+
+    columns = [(name, kind) for name, kind in hot_columns(conn) if name not in BODY_COLUMNS]
+    existing = {row[1] for row in conn.execute(f"PRAGMA {ARCHIVE_SCHEMA}.table_info(articles)")}
+    with conn:
+        if not existing:
+            definitions = ', '.join(f'"{name}" {kind}' for name, kind in columns if name != 'id')
+            conn.execute(f"""
+                CREATE TABLE {ARCHIVE_SCHEMA}.articles (
+                    id varchar PRIMARY KEY NOT NULL, {definitions}, body BLOB, archivedAt datetime NOT NULL
+                )
+            """)
+        else:
+            # Columns added to articles since the archive was created
+            for name, kind in columns:
+                if name not in existing:
+                    conn.execute(f'ALTER TABLE {ARCHIVE_SCHEMA}.articles ADD COLUMN "{name}" {kind}')
+        for column in ('url', 'canonicalUrl'):
+            if column in dict(columns):
+                conn.execute(f'CREATE INDEX IF NOT EXISTS {ARCHIVE_SCHEMA}.articles_{column} ON articles ("{column}")')
+        if has_bookmarks(conn):
+            # Mirrored as @Index(['articleId']) in bookmark.entity.ts
+            conn.execute(f'CREATE INDEX IF NOT EXISTS main."{BOOKMARK_INDEX}" ON bookmarks (articleId)')
+    return [name for name, _ in columns]
+
+def db_size(conn: sqlite3.Connection, schema: str = 'main', articles: bool = True) -> DbSize:
+    """Page counts of schema; with articles, also what articles takes, which reads every page"""
+    page_size = conn.execute(f"PRAGMA {schema}.page_size").fetchone()[0]
+    pages = conn.execute(f"PRAGMA {schema}.page_count").fetchone()[0]
+    free_pages = conn.execute(f"PRAGMA {schema}.freelist_count").fetchone()[0]
+    if not articles:
+        return DbSize(page_size, pages, free_pages, None)
+    try:
+        articles_bytes = conn.execute(f"""
+            SELECT COALESCE(SUM(pgsize), 0) FROM dbstat(?)
+            WHERE name IN (SELECT name FROM {schema}.sqlite_master WHERE tbl_name = 'articles' OR name LIKE 'articles_fts%')
+        """, (schema,)).fetchone()[0]
+    except sqlite3.OperationalError:
+        # SQLite built without SQLITE_ENABLE_DBSTAT_VTAB
+        articles_bytes = None
+    return DbSize(page_size, pages, free_pages, articles_bytes)
+
+def archive_articles(conn: sqlite3.Connection, columns: List[str], days: float, batch_size: int = BATCH_SIZE,
+                     limit: Optional[int] = None, dry_run: bool = False) -> Tuple[int, BodyCompressor]:
+    """Move articles older than days and not bookmarked to the archive; returns (moved, compressor)"""
+    compressor = BodyCompressor()
+    conn.create_function('archive_body', 2, compressor, deterministic=True)
+    eligible = "a.createdAt < datetime('now', ?) AND a.bookmarkCount = 0"
+    if has_bookmarks(conn):
+        eligible += " AND NOT EXISTS (SELECT 1 FROM main.bookmarks b WHERE b.articleId = a.id)"
+    cutoff = f"-{days} days"
+    if dry_run:
+        count = conn.execute(f"SELECT COUNT(*) FROM main.articles a WHERE {eligible}", (cutoff,)).fetchone()[0]
+        return min(count, limit) if limit else count, compressor
+
+    quoted = ', '.join(f'"{name}"' for name in columns)
+    selected = ', '.join(f'a."{name}"' for name in columns)
+    moved = 0
+    while limit is None or moved < limit:
+        size = batch_size if limit is None else min(batch_size, limit - moved)
+        rowids = [row[0] for row in conn.execute(
+            f"SELECT a.rowid FROM main.articles a WHERE {eligible} ORDER BY a.createdAt LIMIT ?", (cutoff, size)
+        )]
+        if not rowids:
+            break
+        placeholders = ','.join('?' * len(rowids))
+        with conn:
+            conn.execute(f"""
+                INSERT OR IGNORE INTO {ARCHIVE_SCHEMA}.articles ({quoted}, body, archivedAt)
+                SELECT {selected}, archive_body(a.description, a.content), datetime('now')
+                FROM main.articles a WHERE a.rowid IN ({placeholders}) AND {eligible}
+            """, (*rowids, cutoff))
+            cursor = conn.execute(f"""
+                DELETE FROM main.articles WHERE rowid IN (
+                    SELECT a.rowid FROM main.articles a WHERE a.rowid IN ({placeholders}) AND {eligible}
+                )
+            """, (*rowids, cutoff))
+        moved += cursor.rowcount
+        logger.debug(f"Archived {moved} articles")
+    return moved, compressor
+
+def reclaim(conn: sqlite3.Connection, step_pages: int = VACUUM_STEP_PAGES) -> bool:
+    """Return free pages to the filesystem a step at a time; False when auto_vacuum isn't incremental"""
+    if conn.execute("PRAGMA main.auto_vacuum").fetchone()[0] != AUTO_VACUUM_INCREMENTAL:
+        return False
+    while conn.execute("PRAGMA main.freelist_count").fetchone()[0]:
+        # Each step is its own short write transaction
+        conn.execute(f"PRAGMA main.incremental_vacuum({int(step_pages)})").fetchall()
+    # The file only shrinks once the WAL is checkpointed into it
+    conn.execute("PRAGMA main.wal_checkpoint(TRUNCATE)").fetchall()
+    return True
+
+def enable_incremental_vacuum(conn: sqlite3.Connection):
+    """One-off full VACUUM switching the database to auto_vacuum=INCREMENTAL"""
+    if conn.execute("PRAGMA main.auto_vacuum").fetchone()[0] == AUTO_VACUUM_INCREMENTAL:
+        logger.info("auto_vacuum is already incremental")
+        return
+    start = time.perf_counter()
+    conn.execute("PRAGMA main.auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM main")
+    logger.info(f"Vacuumed in {time.perf_counter() - start:.1f}s; reindexing search for the new rowids")
+    rebuild_search_index(conn)
+
+def find_archived(conn: sqlite3.Connection, key: str) -> Optional[dict]:
+    """An archived article by id, url or canonicalUrl, with description and content restored"""
+    cursor = conn.execute(f"""
+        SELECT * FROM {ARCHIVE_SCHEMA}.articles WHERE id = ?1 OR url = ?1 OR canonicalUrl = ?1 LIMIT 1
+    """, (key,))
+    row = cursor.fetchone()
+    if not row:
+        return None
+    article = dict(zip((column[0] for column in cursor.description), row))
+    article['description'], article['content'] = decompress_body(article.pop('body'))
+    return article
+
+def run(conn: sqlite3.Connection, days: float, batch_size: int = BATCH_SIZE, limit: Optional[int] = None,
+        vacuum: bool = True, vacuum_step: int = VACUUM_STEP_PAGES, dry_run: bool = False,
+        db_path: Optional[str] = None, archive_path: Optional[str] = None) -> RetentionRun:
+    start = time.perf_counter()
+    # A dry run creates nothing
+    columns = []
+    if not dry_run:
+        columns = ensure_archive_schema(conn, db_path, archive_path)
+    report = RetentionRun(days=days)
+    before = db_size(conn)
+    report.articles_bytes_before, report.file_bytes_before = before.articles_bytes, before.file_bytes
+
+    report.archived, compressor = archive_articles(conn, columns, days, batch_size, limit, dry_run)
+    report.raw_bytes, report.compressed_bytes = compressor.raw_bytes, compressor.compressed_bytes
+    if vacuum and not dry_run:
+        report.incremental_vacuum = reclaim(conn, vacuum_step)
+
+    after = db_size(conn)
+    report.articles_bytes_after, report.file_bytes_after = after.articles_bytes, after.file_bytes
+    report.free_bytes_left = after.free_pages * after.page_size
+    report.reclaimed_bytes = before.file_bytes - after.file_bytes
+    if attach_archive(conn, db_path, archive_path):
+        report.archive_bytes = db_size(conn, ARCHIVE_SCHEMA, articles=False).file_bytes
+    report.seconds = round(time.perf_counter() - start, 3)
+    return report
+
+def mb(value: Optional[int]) -> str:
+    return 'n/a' if value is None else f"{value / 1e6:.1f} MB"
+
+def main():
+    parser = argparse.ArgumentParser(description='NewsHub article retention and archive')
+    add_db_argument(parser)
+    parser.add_argument('--archive', default=None,
+                        help='Archive database path (default: $NEWSHUB_ARCHIVE_PATH or <database>-archive.sqlite)')
+    parser.add_argument('--verbose', '-v', action='store_true', help='Verbose logging')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='Archive old articles and reclaim their space')
+    run_parser.add_argument('--days', type=float, default=90, help='Archive articles created longer ago than this')
+    run_parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Articles moved per transaction')
+    run_parser.add_argument('--limit', type=int, default=None, help='Move at most this many articles')
+    run_parser.add_argument('--no-vacuum', dest='vacuum', action='store_false',
+                            help='Leave freed pages for new articles instead of returning them')
+    run_parser.add_argument('--vacuum-step', type=int, default=VACUUM_STEP_PAGES,
+                            help='Pages returned per incremental vacuum step')
+    run_parser.add_argument('--dry-run', action='store_true', help='Only count the articles that would move')
+    run_parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    show_parser = commands.add_parser('show', help='Print an archived article')
+    show_parser.add_argument('key', help='Article id, URL or canonical URL')
+
+    commands.add_parser('enable-incremental-vacuum',
+                        help='Full VACUUM switching to auto_vacuum=INCREMENTAL (stop the ingester and API first)')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    conn = connect(args.db)
+    try:
+        if args.command == 'enable-incremental-vacuum':
+            enable_incremental_vacuum(conn)
+            return
+        if args.command == 'show':
+            if not attach_archive(conn, args.db, args.archive):
+                sys.exit(f"No archive at {resolve_archive_path(args.db, args.archive)}")
+            article = find_archived(conn, args.key)
+            if not article:
+                sys.exit(f"{args.key} is not archived")
+            json.dump(article, sys.stdout, ensure_ascii=False, indent=2)
+            print()
+            return
+
+        report = run(conn, args.days, args.batch_size, args.limit, args.vacuum, args.vacuum_step,
+                     args.dry_run, args.db, args.archive)
+    finally:
+        conn.close()
+
+    if args.json:
+        json.dump(asdict(report), sys.stdout, indent=2)
+        print()
+        return
+    if args.dry_run:
+        logger.info(f"{report.archived} articles are older than {args.days:g} days and not bookmarked (dry run)")
+        return
+    ratio = report.raw_bytes / report.compressed_bytes if report.compressed_bytes else 0
+    logger.info(f"Archived {report.archived} articles older than {args.days:g} days in {report.seconds:.1f}s, "
+                f"bodies {mb(report.raw_bytes)} -> {mb(report.compressed_bytes)} ({ratio:.1f}x)")
+    logger.info(f"articles and indexes: {mb(report.articles_bytes_before)} -> {mb(report.articles_bytes_after)}; "
+                f"database file: {mb(report.file_bytes_before)} -> {mb(report.file_bytes_after)}, "
+                f"{mb(report.reclaimed_bytes)} reclaimed; archive: {mb(report.archive_bytes)}")
+    if not report.incremental_vacuum and args.vacuum:
+        logger.info(f"auto_vacuum isn't incremental, so {mb(report.free_bytes_left)} of free pages stay in the "
+                    f"file for new articles; run enable-incremental-vacuum once to return them")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Full-text search over articles with SQLite FTS5
+
+articles_fts is an external-content FTS5 table on articles: it stores only the
+index and reads title/description/content back from articles by rowid. Triggers
+keep it in step with every writer, the ingester and the API alike. Updates to
+other columns (viewCount, imageUrl...) don't touch it.
+
+TypeORM's synchronize rebuilds a table when its entity changes, which drops
+these triggers and can renumber rowids, and so can a full VACUUM. Whenever
+ensure_search_index() finds a trigger missing it recreates them and rebuilds
+the index; it also rebuilds when the index's row count or highest rowid no
+longer matches articles, which is how a renumbering with the triggers intact
+shows.
+
+Usage:
+  python scripts/search_index.py backfill
+  python scripts/search_index.py search "climate policy" --limit 10 [--json]
+"""
+
+import argparse
+import json
+import logging
+import re
+import sqlite3
+import time
+from dataclasses import asdict, dataclass
+from typing import List, Optional
+
+from newshub_db import add_db_argument, connect
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'articles_fts'
+
+# Column weights for bm25(): a title hit outranks a description hit outranks a body hit
+TITLE_WEIGHT, DESCRIPTION_WEIGHT, CONTENT_WEIGHT = 10.0, 5.0, 1.0
+
+# bm25 has to score every match before it can sort; past this many matches
+# (a near-stopword query) results are ordered newest first instead, which
+# FTS5 can answer by walking the doclist backwards and stopping at the page
+RANKED_MATCH_LIMIT = 10000
+
+SCHEMA = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+    title, description, content,
+    content='articles', content_rowid='rowid',
+    tokenize='porter unicode61 remove_diacritics 2'
+);
+"""
+
+TRIGGERS = {
+    f'{FTS_TABLE}_ai': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON articles BEGIN
+            INSERT INTO {FTS_TABLE} (rowid, title, description, content)
+            VALUES (new.rowid, new.title, new.description, new.content);
+        END
+    """,
+    f'{FTS_TABLE}_ad': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON articles BEGIN
+            INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, title, description, content)
+            VALUES ('delete', old.rowid, old.title, old.description, old.content);
+        END
+    """,
+    f'{FTS_TABLE}_au': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF title, description, content
+        ON articles BEGIN
+            INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, title, description, content)
+            VALUES ('delete', old.rowid, old.title, old.description, old.content);
+            INSERT INTO {FTS_TABLE} (rowid, title, description, content)
+            VALUES (new.rowid, new.title, new.description, new.content);
+        END
+    """,
+}
+
+@dataclass
+class SearchResult:
+    id: str
+    title: str
+    url: str
+    image_url: Optional[str]
+    published_at: Optional[str]
+    category_id: int
+    feed_id: int
+    score: Optional[float]
+    snippet: str
+
+@dataclass
+class SearchPage:
+    """Mirrors the page ArticlesService.search returns"""
+    articles: List[SearchResult]
+    total: int
+    page: int
+    limit: int
+    total_pages: int
+
+def ensure_search_index(conn: sqlite3.Connection) -> bool:
+    """Create the index and triggers if needed; returns True when it had to rebuild"""
+    existing = {row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger') AND name LIKE ?",
+        (f'{FTS_TABLE}%',)
+    )}
+    if FTS_TABLE in existing and all(name in existing for name in TRIGGERS):
+        if _covers_articles(conn):
+            return False
+        logger.warning(f"{FTS_TABLE} is out of step with articles (rowids renumbered?), rebuilding it")
+
+    with conn:
+        conn.executescript(SCHEMA)
+        for sql in TRIGGERS.values():
+            conn.execute(sql)
+    # A fresh index is empty; one that lost its triggers has missed writes
+    rebuild(conn)
+    return True
+
+def _covers_articles(conn: sqlite3.Connection) -> bool:
+    """Whether the index holds as many rows as articles, up to the same highest rowid
+
+    The docsize shadow table has one row per indexed rowid; querying the FTS
+    table itself would read articles, the external content.
+    """
+    indexed = conn.execute(f"SELECT COUNT(*), MAX(id) FROM {FTS_TABLE}_docsize").fetchone()
+    return indexed == conn.execute("SELECT COUNT(*), MAX(rowid) FROM articles").fetchone()
+
+def rebuild(conn: sqlite3.Connection):
+    """Reindex every article from the articles table"""
+    start = time.perf_counter()
+    with conn:
+        conn.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')")
+    count = conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+    logger.info(f"Indexed {count} articles in {time.perf_counter() - start:.1f}s")
+
+def optimize(conn: sqlite3.Connection):
+    """Merge the index's b-trees; worth running after a large backfill"""
+    with conn:
+        conn.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+
+def match_query(text: str) -> str:
+    """FTS5 query matching every word of free text
+
+    Quoting each word keeps user input from being read as FTS5 syntax. The
+    porter tokenizer already matches other forms of a word; prefix queries
+    ("clim*") are left to raw mode because short prefixes expand to
+    thousands of terms.
+    """
+    return ' '.join(f'"{word}"' for word in re.findall(r'\w+', text))
+
+def search(conn: sqlite3.Connection, text: str, page: int = 1, limit: int = 20,
+           category_id: Optional[int] = None, raw: bool = False) -> SearchPage:
+    """Active articles matching text, best bm25 score first
+
+    raw passes text through as an FTS5 query (phrases, OR, NEAR, prefixes,
+    column filters). Without a category filter the total comes from the index
+    alone and pages are cut before inactive articles are dropped, so both can
+    overcount by the (rare) hidden articles that match. Results past
+    RANKED_MATCH_LIMIT matches come newest first with a score of None.
+    """
+    query = text if raw else match_query(text)
+    if not query:
+        return SearchPage([], 0, page, limit, 0)
+
+    offset = (page - 1) * limit
+    score = f"bm25({FTS_TABLE}, {TITLE_WEIGHT}, {DESCRIPTION_WEIGHT}, {CONTENT_WEIGHT})"
+    if category_id is None:
+        # The index alone answers both steps; articles is only read for the page
+        matches = f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH ?"
+        params = [query]
+    else:
+        matches = (f"FROM {FTS_TABLE} JOIN articles a ON a.rowid = {FTS_TABLE}.rowid "
+                   f"WHERE {FTS_TABLE} MATCH ? AND a.isActive = 1 AND a.categoryId = ?")
+        params = [query, category_id]
+
+    total = conn.execute(f"SELECT COUNT(*) {matches}", params).fetchone()[0]
+    if total <= RANKED_MATCH_LIMIT:
+        page_rows = conn.execute(
+            f"SELECT {FTS_TABLE}.rowid, {score} AS score {matches} ORDER BY score LIMIT ? OFFSET ?",
+            [*params, limit, offset]
+        ).fetchall()
+    else:
+        page_rows = conn.execute(
+            f"SELECT {FTS_TABLE}.rowid, NULL {matches} ORDER BY {FTS_TABLE}.rowid DESC LIMIT ? OFFSET ?",
+            [*params, limit, offset]
+        ).fetchall()
+    if not page_rows:
+        return SearchPage([], total, page, limit, -(-total // limit))
+
+    # Snippets and article fields for the page only; FTS5 looks the rowids up directly
+    scores = {rowid: page_score for rowid, page_score in page_rows}
+    placeholders = ','.join('?' * len(scores))
+    details = {row[0]: row[1:] for row in conn.execute(f"""
+        SELECT {FTS_TABLE}.rowid, a.id, a.title, a.url, a.imageUrl, a.publishedAt, a.categoryId, a.feedId,
+               snippet({FTS_TABLE}, -1, '<mark>', '</mark>', '…', 24)
+        FROM {FTS_TABLE} JOIN articles a ON a.rowid = {FTS_TABLE}.rowid
+        WHERE {FTS_TABLE} MATCH ? AND {FTS_TABLE}.rowid IN ({placeholders}) AND a.isActive = 1
+    """, [query, *scores])}
+    rows = [(*details[rowid][:7], scores[rowid], details[rowid][7])
+            for rowid, _ in page_rows if rowid in details]
+
+    return SearchPage(
+        articles=[SearchResult(*row) for row in rows],
+        total=total,
+        page=page,
+        limit=limit,
+        total_pages=-(-total // limit),
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description='NewsHub full-text search index')
+    add_db_argument(parser)
+    parser.add_argument('--verbose', '-v', action='store_true', help='Verbose logging')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('backfill', help='Create the index if needed and (re)index every article')
+    commands.add_parser('optimize', help='Merge index segments')
+
+    search_parser = commands.add_parser('search', help='Search articles')
+    search_parser.add_argument('query', help='Words to search for')
+    search_parser.add_argument('--page', type=int, default=1)
+    search_parser.add_argument('--limit', type=int, default=20)
+    search_parser.add_argument('--category', type=int, help='Only this category ID')
+    search_parser.add_argument('--raw', action='store_true', help='Treat the query as FTS5 syntax')
+    search_parser.add_argument('--json', action='store_true', help='Print the result page as JSON')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    conn = connect(args.db)
+    try:
+        if args.command == 'backfill':
+            if not ensure_search_index(conn):
+                rebuild(conn)
+            optimize(conn)
+        elif args.command == 'optimize':
+            optimize(conn)
+        elif args.command == 'search':
+            ensure_search_index(conn)
+            start = time.perf_counter()
+            result = search(conn, args.query, args.page, args.limit, args.category, args.raw)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if args.json:
+                print(json.dumps(asdict(result), ensure_ascii=False, indent=2))
+            else:
+                print(f"{result.total} matches ({elapsed_ms:.1f} ms), page {result.page}/{result.total_pages}")
+                for article in result.articles:
+                    relevance = f"{-article.score:.3f}" if article.score is not None else "newest"
+                    print(f"  [{relevance}] {article.title}")
+                    print(f"      {article.snippet}")
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -3,19 +3,21 @@
 Seed script to populate initial categories and RSS feeds for NewsHub
 """
 
-import sqlite3
 import logging
 from datetime import datetime
+from typing import Optional
+
+from newshub_db import connect
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def seed_database():
+def seed_database(db_path: Optional[str] = None):
     """Populate the database with initial categories and RSS feeds"""
     try:
         # Connect to database
-        conn = sqlite3.connect('newshub.sqlite')
+        conn = connect(db_path)
         cursor = conn.cursor()
         
         # Check if data already exists
@@ -40,11 +42,10 @@ def seed_database():
         ]
         
         logger.info("Inserting categories...")
-        for category in categories:
-            cursor.execute('''
-                INSERT INTO categories (slug, name, description, color)
-                VALUES (?, ?, ?, ?)
-            ''', category)
+        cursor.executemany('''
+            INSERT INTO categories (slug, name, description, color)
+            VALUES (?, ?, ?, ?)
+        ''', categories)
         
         # Get category IDs for feeds
         cursor.execute('SELECT id, slug FROM categories')
@@ -83,11 +84,10 @@ def seed_database():
         ]
         
         logger.info("Inserting RSS feeds...")
-        for feed in feeds:
-            cursor.execute('''
-                INSERT INTO feeds (name, url, description, isActive, categoryId)
-                VALUES (?, ?, ?, ?, ?)
-            ''', feed)
+        cursor.executemany('''
+            INSERT INTO feeds (name, url, description, isActive, categoryId)
+            VALUES (?, ?, ?, ?, ?)
+        ''', feeds)
         
         # Commit changes
         conn.commit()
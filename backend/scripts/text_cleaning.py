@@ -0,0 +1,143 @@
+"""
+HTML-to-text cleaning for feed titles, descriptions and content
+
+Comments and script/style bodies are dropped, tags vanish, every HTML entity is
+decoded and runs of spaces, tabs, newlines and non-breaking spaces collapse to a
+single space. Tags go in one compiled substitution; entities are decoded with
+one str.replace per distinct entity, since a feed body repeats a handful of
+them, and collapsing is a short str.replace chain. Only `<` followed by a
+letter, `/`, `!` or `?` opens a tag, as in a browser; a bare `<` ("a < b") is
+text.
+
+With max_length set the input is cleaned in chunks, each cut just after a `>`
+outside comments and scripts, and cleaning stops once enough text is kept, so a
+multi-megabyte content:encoded blob costs about what we keep of it. No chunk is
+cleaned twice, and the result is the same as cleaning the whole input and
+truncating.
+"""
+
+import re
+from html import unescape
+from typing import Optional, Tuple
+
+SKIPPED_PATTERN = re.compile(r'<!--.*?(?:-->|$)|<(script|style)\b[^>]*>.*?(?:</\1\s*>|$)',
+                             re.DOTALL | re.IGNORECASE)
+# Case is spelled out: a literal '<' lets the search skip ahead, IGNORECASE would not
+SKIPPED_START_PATTERN = re.compile(r'<(?:!--|[sS][cCtT][rRyY][iIlL][pPeE])')
+TAG_PATTERN = re.compile(r'<[a-zA-Z/!?][^>]*>')
+
+# Named and numeric references, with the optional trailing ; that html.unescape also accepts
+ENTITY_PATTERN = re.compile(r'&(?:#[0-9]{1,7}|#[xX][0-9a-fA-F]{1,6}|[a-zA-Z][a-zA-Z0-9]{1,31});?')
+# A decoded entity containing one of these could complete another entity when
+# replaced in place (&amp;lt; or &&#35;38;), so such text is decoded in one pass
+ENTITY_CHARS_PATTERN = re.compile(r'[&#;0-9A-Za-z]')
+
+# Whitespace that collapses; str.split() would also take rarer Unicode spaces
+COLLAPSED_WHITESPACE = ('\n', '\t', '\r', '\xa0', '\x0b', '\x0c')
+
+# Feeds reuse a handful of entities, so decoded ones are memoised
+_decoded_entities = {}
+MAX_CACHED_ENTITIES = 4096
+
+# Longest entity worth keeping whole when cutting a chunk (&CounterClockwiseContourIntegral;)
+MAX_ENTITY_LENGTH = 34
+
+# Smallest chunk cleaned at a time when max_length is set
+MIN_CHUNK_SIZE = 256
+
+def _unescape_entity(entity: str) -> str:
+    decoded = _decoded_entities.get(entity)
+    if decoded is None:
+        decoded = unescape(entity)
+        if len(_decoded_entities) < MAX_CACHED_ENTITIES:
+            _decoded_entities[entity] = decoded
+    return decoded
+
+def _decode_entity(match: re.Match) -> str:
+    return _unescape_entity(match.group())
+
+def _drop_markup(html: str) -> str:
+    if '<' not in html:
+        return html
+    if SKIPPED_START_PATTERN.search(html):
+        html = SKIPPED_PATTERN.sub('', html)
+    return TAG_PATTERN.sub('', html)
+
+def _decode_entities(text: str) -> str:
+    if '&' not in text:
+        return text
+    entities = set(ENTITY_PATTERN.findall(text))
+    ampersand = '&amp;' in entities
+    entities.discard('&amp;')
+    replacements = []
+    for entity in entities:
+        decoded = _unescape_entity(entity)
+        if entity[-1] != ';' or ENTITY_CHARS_PATTERN.search(decoded):
+            return ENTITY_PATTERN.sub(_decode_entity, text)
+        replacements.append((entity, decoded))
+    for entity, decoded in replacements:
+        text = text.replace(entity, decoded)
+    # Last, so the '&' it leaves behind is never read as the start of an entity
+    return text.replace('&amp;', '&') if ampersand else text
+
+def _collapse(text: str) -> str:
+    for whitespace in COLLAPSED_WHITESPACE:
+        if whitespace in text:
+            text = text.replace(whitespace, ' ')
+    while '  ' in text:
+        text = text.replace('  ', ' ')
+    return text.strip()
+
+def _markup_chunk(html: str, start: int, size: int) -> Tuple[int, str]:
+    """End of the chunk from start and its text with comments, scripts and tags dropped
+
+    The chunk ends just after a '>', so no tag is cut, and never inside or at
+    the end of a comment or script: a comment between '<a' and 'href>' still
+    leaves one tag once it is dropped.
+    """
+    end = html.find('>', start + size) + 1 or len(html)
+    if not SKIPPED_START_PATTERN.search(html, start, end):
+        return end, TAG_PATTERN.sub('', html[start:end])
+    while end < len(html):
+        skipped = None
+        for skipped in SKIPPED_PATTERN.finditer(html, start, end):
+            pass
+        if skipped is None or skipped.end() < end:
+            break
+        end = html.find('>', SKIPPED_PATTERN.match(html, skipped.start()).end()) + 1 or len(html)
+    return end, TAG_PATTERN.sub('', SKIPPED_PATTERN.sub('', html[start:end]))
+
+def html_to_text(html: str, max_length: Optional[int] = None) -> str:
+    """Plain text of an HTML fragment, at most max_length characters"""
+    if not html:
+        return ""
+    if max_length is None:
+        return _collapse(_decode_entities(_drop_markup(html)))
+
+    size = max(max_length, MIN_CHUNK_SIZE)
+    pieces = []
+    kept = 0
+    carried = ''
+    start = 0
+    while start < len(html):
+        end, text = _markup_chunk(html, start, size)
+        text = carried + text
+        carried = ''
+        if end < len(html):
+            # An entity at the end may be finished by the next chunk
+            entity_start = text.rfind('&', max(0, len(text) - MAX_ENTITY_LENGTH))
+            if entity_start != -1 and ';' not in text[entity_start:]:
+                text, carried = text[:entity_start], text[entity_start:]
+        text = _decode_entities(text)
+        pieces.append(text)
+        kept += len(text)
+        start = end
+        missing = max_length - kept
+        if missing <= 0:
+            text = _collapse(''.join(pieces))
+            if len(text) >= max_length:
+                return text[:max_length].rstrip()
+            missing = max_length - len(text)
+        # Size the next chunk for the missing text at the text-to-markup ratio so far, plus an eighth
+        size = max(missing * start // kept * 9 // 8 if kept else 2 * start, MIN_CHUNK_SIZE)
+    return _collapse(''.join(pieces))[:max_length].rstrip()
@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+"""
+Local article thumbnails, so listing pages don't hot-link publisher originals
+
+Each pass takes the image URLs of articles that have no thumbnail yet, newest
+first, downloads each URL once and renders a fixed-size WebP (or JPEG) in a
+process pool. Thumbnails are content-addressed: the file is named after the
+SHA-256 of the original, so the same picture behind different URLs (wire
+photos, CDN variants) is rendered and stored once. articles.thumbnailPath
+holds the path relative to the thumbnail directory, which the API serves at
+/api/thumbnails/.
+
+The directory is bounded: after a pass the least recently assigned thumbnails
+are deleted until it is under --max-cache-mb. Their articles get an empty
+thumbnailPath and the frontend falls back to imageUrl; a new article with the
+same image brings the thumbnail back. URLs that fail are retried on later
+passes, MAX_ATTEMPTS times.
+
+Rendering needs Pillow (pip install pillow), with libwebp for WebP output.
+
+Usage (e.g. from cron after the parser):
+  python scripts/thumbnails.py [--limit 2000] [--format webp] [--size 640x360] [--max-cache-mb 2048]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import io
+import logging
+import multiprocessing
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+
+from http_transport import BodyTooLarge, HttpTransport, TransportConfig
+from newshub_db import BACKEND_DIR, add_db_argument, connect, typeorm_index_name
+
+try:
+    from PIL import Image, ImageOps, features
+    HAS_PIL = True
+except ImportError:
+    HAS_PIL = False
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_DIR_ENV = 'NEWSHUB_THUMBNAIL_DIR'
+DEFAULT_THUMBNAIL_DIR = 'thumbnails'
+# Originals past this are skipped rather than buffered
+MAX_SOURCE_BYTES = 25 * 1024 * 1024
+MAX_ATTEMPTS = 3
+RETRY_SECONDS = 6 * 3600
+# Eviction goes a little below the bound so the next pass doesn't evict again at once
+EVICT_TO = 0.9
+FLUSH_EVERY = 100
+
+FORMATS = {
+    'webp': ('WEBP', 'webp', {'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'optimize': True, 'progressive': True}),
+}
+
+PENDING_WHERE = '"imageUrl" IS NOT NULL AND "thumbnailPath" IS NULL'
+PENDING_INDEX = typeorm_index_name('articles', 'imageUrl', where=PENDING_WHERE)
+# Eviction looks articles up by path; NULLs stay out so the pending query can't pick this index
+PATH_WHERE = '"thumbnailPath" IS NOT NULL'
+PATH_INDEX = typeorm_index_name('articles', 'thumbnailPath', where=PATH_WHERE)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS thumbnail_files (
+    path TEXT PRIMARY KEY,
+    sourceHash TEXT NOT NULL,
+    bytes INTEGER NOT NULL,
+    sourceWidth INTEGER,
+    sourceHeight INTEGER,
+    createdAt REAL NOT NULL,
+    lastUsedAt REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS thumbnail_files_last_used ON thumbnail_files (lastUsedAt);
+CREATE TABLE IF NOT EXISTS thumbnail_sources (
+    url TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    path TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    fetchedAt REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS thumbnail_sources_path ON thumbnail_sources (path);
+"""
+
+@dataclass
+class ThumbnailConfig:
+    width: int = 640
+    height: int = 360
+    format: str = 'webp'
+    quality: int = 75
+    max_cache_bytes: int = 2 * 1024 ** 3
+
+    def relative_path(self, source_hash: str) -> str:
+        extension = FORMATS[self.format][1]
+        return f"{source_hash[:2]}/{source_hash}-{self.width}x{self.height}.{extension}"
+
+@dataclass
+class ThumbnailRun:
+    urls: int = 0
+    downloaded: int = 0
+    rendered: int = 0
+    # Different URLs whose bytes were already rendered, and URLs thumbnailed by an earlier pass
+    shared: int = 0
+    failed: int = 0
+    articles: int = 0
+    evicted: int = 0
+    bytes_downloaded: int = 0
+    bytes_written: int = 0
+    seconds: float = 0.0
+    # Summed worker CPU time spent rendering
+    render_seconds: float = 0.0
+    workers: int = 1
+
+    @property
+    def images_per_second(self) -> float:
+        return self.rendered / self.seconds if self.seconds else 0.0
+
+    @property
+    def images_per_core_second(self) -> float:
+        return self.rendered / self.render_seconds if self.render_seconds else 0.0
+
+def resolve_thumbnail_dir(directory: Optional[str] = None) -> Path:
+    """Absolute thumbnail directory from directory, $NEWSHUB_THUMBNAIL_DIR or backend/thumbnails"""
+    path = Path(directory or os.environ.get(THUMBNAIL_DIR_ENV) or DEFAULT_THUMBNAIL_DIR).expanduser()
+    if not path.is_absolute():
+        path = BACKEND_DIR / path
+    return path
+
+def render_thumbnail(data: bytes, dest: str, config: ThumbnailConfig) -> Tuple[int, int, int, float]:
+    """Write config's thumbnail of the image in data to dest; runs in the worker processes
+
+    Returns the source width and height, the bytes written and the CPU seconds spent.
+    """
+    start = time.process_time()
+    size = (config.width, config.height)
+    with Image.open(io.BytesIO(data)) as image:
+        source_size = image.size
+        # JPEGs decode straight to the smallest 1/2, 1/4 or 1/8 scale still covering size
+        image.draft('RGB', size)
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        else:
+            image = image.convert('RGB')
+        thumbnail = ImageOps.fit(image, size, Image.Resampling.LANCZOS)
+
+    pil_format, _, options = FORMATS[config.format]
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    # Written aside and renamed, so the API never serves half a file
+    temporary = f"{dest}.{os.getpid()}.tmp"
+    thumbnail.save(temporary, pil_format, quality=config.quality, **options)
+    os.replace(temporary, dest)
+    return source_size[0], source_size[1], os.path.getsize(dest), time.process_time() - start
+
+def ensure_schema(conn: sqlite3.Connection):
+    """Add articles.thumbnailPath, its indexes and the bookkeeping tables"""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(articles)")}
+    with conn:
+        if 'thumbnailPath' not in columns:
+            conn.execute("ALTER TABLE articles ADD COLUMN thumbnailPath varchar")
+        conn.executescript(SCHEMA)
+        # Named as TypeORM names the entity's @Index declarations, so schema sync keeps them.
+        # The partial index holds only articles still waiting, so a pass never scans the rest
+        conn.execute(f'CREATE INDEX IF NOT EXISTS "{PENDING_INDEX}" ON articles (imageUrl) WHERE {PENDING_WHERE}')
+        conn.execute(f'CREATE INDEX IF NOT EXISTS "{PATH_INDEX}" ON articles (thumbnailPath) WHERE {PATH_WHERE}')
+
+def pending_urls(conn: sqlite3.Connection, limit: int, now: float) -> List[str]:
+    """Image URLs of articles without a thumbnail, newest articles first, skipping recent failures"""
+    rows = conn.execute(f"""
+        SELECT imageUrl FROM articles
+        WHERE {PENDING_WHERE}
+          AND imageUrl NOT IN (SELECT url FROM thumbnail_sources WHERE status = 'error' AND fetchedAt > ?)
+        GROUP BY imageUrl
+        ORDER BY MAX(rowid) DESC
+        LIMIT ?
+    """, (now - RETRY_SECONDS, limit)).fetchall()
+    return [row[0] for row in rows]
+
+def evict(conn: sqlite3.Connection, directory: Path, max_bytes: int) -> Tuple[int, int]:
+    """Delete the least recently used thumbnails until the total is under max_bytes; returns (files, bytes)"""
+    total = conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM thumbnail_files").fetchone()[0]
+    if total <= max_bytes:
+        return 0, 0
+    target = int(max_bytes * EVICT_TO)
+    victims, freed = [], 0
+    for path, size in conn.execute("SELECT path, bytes FROM thumbnail_files ORDER BY lastUsedAt"):
+        if total - freed <= target:
+            break
+        victims.append((path,))
+        freed += size
+
+    with conn:
+        # An empty path means "had one, evicted": the article isn't pending again
+        conn.executemany("UPDATE articles SET thumbnailPath = '' WHERE thumbnailPath = ?", victims)
+        conn.executemany("UPDATE thumbnail_sources SET status = 'evicted', path = NULL WHERE path = ?", victims)
+        conn.executemany("DELETE FROM thumbnail_files WHERE path = ?", victims)
+    # Files go after the commit, so no article ever points at a missing one
+    for path, in victims:
+        try:
+            (directory / path).unlink()
+        except FileNotFoundError:
+            pass
+    return len(victims), freed
+
+class Thumbnailer:
+    """One pass: download pending images, render them in a process pool, record the results"""
+
+    def __init__(self, conn: sqlite3.Connection, directory: Path, config: ThumbnailConfig,
+                 workers: Optional[int] = None, concurrency: int = 16, per_host_limit: int = 4):
+        self.conn = conn
+        self.directory = directory
+        self.config = config
+        self.workers = workers or os.cpu_count() or 1
+        # Each download in flight holds up to MAX_SOURCE_BYTES in memory
+        self.concurrency = max(concurrency, self.workers)
+        self.per_host_limit = per_host_limit
+        self.transport = None
+        self._executor = None
+        self._semaphore = None
+        # Renders in flight by source hash, so identical bytes are rendered once
+        self._renders: Dict[str, asyncio.Future] = {}
+        self._results = []
+        self.run_stats = ThumbnailRun(workers=self.workers)
+
+    def _known(self, url: str) -> Optional[str]:
+        """The thumbnail an earlier pass made for url, if it is still on disk"""
+        row = self.conn.execute("""
+            SELECT f.path FROM thumbnail_sources s JOIN thumbnail_files f ON f.path = s.path
+            WHERE s.url = ? AND s.status = 'ok'
+        """, (url,)).fetchone()
+        return row[0] if row else None
+
+    async def _render(self, source_hash: str, data: bytes) -> str:
+        relative = self.config.relative_path(source_hash)
+        dest = self.directory / relative
+        exists = self.conn.execute("SELECT 1 FROM thumbnail_files WHERE path = ?", (relative,)).fetchone()
+        if exists and dest.exists():
+            self.run_stats.shared += 1
+            return relative
+        if source_hash in self._renders:
+            self.run_stats.shared += 1
+            return await asyncio.shield(self._renders[source_hash])
+
+        future = asyncio.get_running_loop().create_future()
+        self._renders[source_hash] = future
+        try:
+            width, height, written, cpu_seconds = await asyncio.get_running_loop().run_in_executor(
+                self._executor, render_thumbnail, data, str(dest), self.config)
+            self.run_stats.rendered += 1
+            self.run_stats.bytes_written += written
+            self.run_stats.render_seconds += cpu_seconds
+            now = time.time()
+            with self.conn:
+                self.conn.execute("""
+                    INSERT OR REPLACE INTO thumbnail_files
+                        (path, sourceHash, bytes, sourceWidth, sourceHeight, createdAt, lastUsedAt)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, (relative, source_hash, written, width, height, now, now))
+            future.set_result(relative)
+        except BaseException as e:
+            future.set_exception(e)
+            # Waiters get the exception; mark it retrieved for the case there are none
+            future.exception()
+            raise
+        finally:
+            del self._renders[source_hash]
+        return relative
+
+    async def _thumbnail(self, url: str):
+        stats = self.run_stats
+        known = self._known(url)
+        if known:
+            stats.shared += 1
+            self._record(url, known)
+            return
+        try:
+            async with self._semaphore:
+                async with self.transport.get(url) as response:
+                    response.raise_for_status()
+                    data = await self.transport.read_body(response, MAX_SOURCE_BYTES)
+                stats.downloaded += 1
+                stats.bytes_downloaded += len(data)
+                path = await self._render(hashlib.sha256(data).hexdigest(), data)
+        except (aiohttp.ClientError, asyncio.TimeoutError, BodyTooLarge, ValueError) as e:
+            self._record(url, None, f"download: {e}")
+        except Exception as e:
+            # Pillow raises OSError subclasses, DecompressionBombError and more for bad images
+            self._record(url, None, f"render: {type(e).__name__}: {e}")
+        else:
+            self._record(url, path)
+
+    def _record(self, url: str, path: Optional[str], error: Optional[str] = None):
+        if error:
+            logger.debug(f"No thumbnail for {url}: {error}")
+        self._results.append((url, path, error))
+        if len(self._results) >= FLUSH_EVERY:
+            self.flush()
+
+    def flush(self):
+        """Point the waiting articles at their thumbnails in one transaction"""
+        results, self._results = self._results, []
+        now = time.time()
+        stats = self.run_stats
+        with self.conn:
+            for url, path, error in results:
+                if path:
+                    self.conn.execute("UPDATE thumbnail_files SET lastUsedAt = ? WHERE path = ?", (now, path))
+                    self.conn.execute("""
+                        INSERT OR REPLACE INTO thumbnail_sources (url, status, path, attempts, error, fetchedAt)
+                        VALUES (?, 'ok', ?, 0, NULL, ?)
+                    """, (url, path, now))
+                    stats.articles += self.conn.execute(
+                        f"UPDATE articles SET thumbnailPath = ? WHERE imageUrl = ? AND {PENDING_WHERE}",
+                        (path, url)
+                    ).rowcount
+                    continue
+                stats.failed += 1
+                self.conn.execute("""
+                    INSERT INTO thumbnail_sources (url, status, attempts, error, fetchedAt)
+                    VALUES (?, 'error', 1, ?, ?)
+                    ON CONFLICT (url) DO UPDATE SET
+                        status = 'error', path = NULL, attempts = attempts + 1,
+                        error = excluded.error, fetchedAt = excluded.fetchedAt
+                """, (url, error[:500], now))
+                # Out of attempts: stop retrying, the articles keep their hot-linked image
+                self.conn.execute(f"""
+                    UPDATE articles SET thumbnailPath = ''
+                    WHERE imageUrl = ? AND {PENDING_WHERE}
+                      AND (SELECT attempts FROM thumbnail_sources WHERE url = ?) >= ?
+                """, (url, url, MAX_ATTEMPTS))
+
+    async def run(self, limit: int) -> ThumbnailRun:
+        start = time.perf_counter()
+        urls = pending_urls(self.conn, limit, time.time())
+        self.run_stats.urls = len(urls)
+        if urls:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self.transport = HttpTransport(TransportConfig(
+                user_agent='NewsHub Thumbnailer 1.0',
+                limit=self.concurrency,
+                limit_per_host=self.per_host_limit,
+                total_timeout=60.0,
+                max_body_bytes=MAX_SOURCE_BYTES,
+            ))
+            # spawn, as in the parser: the event loop's threads shouldn't be forked
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+            try:
+                await self.transport.open()
+                await asyncio.gather(*(self._thumbnail(url) for url in urls))
+            finally:
+                self.flush()
+                await self.transport.close()
+                self._executor.shutdown()
+        self.run_stats.evicted, _ = evict(self.conn, self.directory, self.config.max_cache_bytes)
+        self.run_stats.seconds = round(time.perf_counter() - start, 3)
+        return self.run_stats
+
+def parse_size(value: str) -> Tuple[int, int]:
+    width, _, height = value.lower().partition('x')
+    try:
+        return int(width), int(height)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected WIDTHxHEIGHT, got {value!r}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Render local thumbnails for article images')
+    add_db_argument(parser)
+    defaults = ThumbnailConfig()
+    parser.add_argument('--dir', default=None,
+                        help=f'Thumbnail directory (default: ${THUMBNAIL_DIR_ENV} or backend/{DEFAULT_THUMBNAIL_DIR})')
+    parser.add_argument('--limit', type=int, default=2000, help='Image URLs to process in this pass')
+    parser.add_argument('--size', type=parse_size, default=(defaults.width, defaults.height),
+                        help='Thumbnail size, WIDTHxHEIGHT (cropped to fill)')
+    parser.add_argument('--format', choices=sorted(FORMATS), default=defaults.format)
+    parser.add_argument('--quality', type=int, default=defaults.quality)
+    parser.add_argument('--max-cache-mb', type=int, default=defaults.max_cache_bytes // 1024 ** 2,
+                        help='Evict the least recently used thumbnails past this total size')
+    parser.add_argument('--workers', type=int, default=None, help='Render processes (default: CPU count)')
+    parser.add_argument('--concurrency', type=int, default=16, help='Image downloads in flight')
+    parser.add_argument('--per-host', type=int, default=4, help='Image downloads in flight per host')
+    parser.add_argument('--evict-only', action='store_true', help='Only enforce --max-cache-mb')
+    parser.add_argument('--verbose', '-v', action='store_true', help='Verbose logging')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    config = ThumbnailConfig(args.size[0], args.size[1], args.format, args.quality,
+                             args.max_cache_mb * 1024 ** 2)
+    directory = resolve_thumbnail_dir(args.dir)
+    conn = connect(args.db)
+    try:
+        ensure_schema(conn)
+        if args.evict_only:
+            files, freed = evict(conn, directory, config.max_cache_bytes)
+            logger.info(f"Evicted {files} thumbnails, {freed / 1024 ** 2:.1f} MiB")
+            return
+        if not HAS_PIL:
+            parser.error("rendering thumbnails needs Pillow: pip install pillow")
+        if config.format == 'webp' and not features.check('webp'):
+            parser.error("this Pillow build has no WebP support; use --format jpeg")
+
+        run = asyncio.run(Thumbnailer(conn, directory, config, args.workers,
+                                      args.concurrency, args.per_host).run(args.limit))
+        logger.info(f"Thumbnails: {run.urls} image URLs, {run.rendered} rendered, {run.shared} shared, "
+                    f"{run.failed} failed, {run.articles} articles updated, {run.evicted} evicted "
+                    f"in {run.seconds:.1f}s")
+        logger.info(f"Downloaded {run.bytes_downloaded / 1024 ** 2:.1f} MiB, wrote {run.bytes_written / 1024 ** 2:.1f} MiB; "
+                    f"{run.images_per_second:.1f} images/s with {run.workers} workers, "
+                    f"{run.images_per_core_second:.1f} images/s per core")
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Trending articles, precomputed by a batch job
+
+Each article scores (1 + views + BOOKMARK_WEIGHT * bookmarks), halved for every
+half-life since it was published. Stored in log space, relative to a fixed
+epoch instead of to "now":
+
+    score = ln(1 + views + w * bookmarks) + published_epoch / tau,  tau = half_life / ln 2
+
+that value never changes as time passes; only the counters move it. So a pass
+only rescores the articles whose counters changed, which triggers on articles
+record in trending_dirty, and the ordering stays exact. Articles older than the
+window drop out of the candidate set.
+
+Each pass rewrites trending_articles, the few dozen rows the API reads: the
+overall top N under categoryId 0 and, optionally, the top N of every category.
+TypeORM leaves tables it doesn't know about alone, but a table rebuild drops the
+triggers; a pass that finds them missing rescores the whole window. So does a
+pass whose half-life, bookmark weight or window differs from the ones stored in
+trending_settings with the scores: a wider window needs articles already pruned.
+
+Usage (e.g. every few minutes from cron):
+  python scripts/trending.py [--per-category 10] [--full]
+"""
+
+import argparse
+import logging
+import math
+import sqlite3
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from date_parsing import to_db_datetime
+from newshub_db import add_db_argument, connect
+
+logger = logging.getLogger(__name__)
+
+# Keeps the stored log-space scores small; any fixed instant would do
+REFERENCE_EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp()
+ALL_CATEGORIES = 0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trending_dirty (
+    articleId varchar PRIMARY KEY NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS trending_scores (
+    articleId varchar PRIMARY KEY NOT NULL,
+    categoryId integer NOT NULL,
+    publishedEpoch real NOT NULL,
+    score real NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS trending_scores_published ON trending_scores (publishedEpoch);
+CREATE INDEX IF NOT EXISTS trending_scores_score ON trending_scores (score);
+CREATE INDEX IF NOT EXISTS trending_scores_category ON trending_scores (categoryId, score);
+CREATE TABLE IF NOT EXISTS trending_articles (
+    categoryId integer NOT NULL,
+    rank integer NOT NULL,
+    articleId varchar NOT NULL,
+    score real NOT NULL,
+    computedAt datetime NOT NULL,
+    PRIMARY KEY (categoryId, rank)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS trending_settings (
+    name varchar PRIMARY KEY NOT NULL,
+    value varchar NOT NULL
+) WITHOUT ROWID;
+"""
+
+# Every change that can move an article's score or its eligibility
+TRIGGERS = {
+    'trending_dirty_ai': """
+        CREATE TRIGGER IF NOT EXISTS trending_dirty_ai AFTER INSERT ON articles BEGIN
+            INSERT OR IGNORE INTO trending_dirty (articleId) VALUES (new.id);
+        END
+    """,
+    'trending_dirty_au': """
+        CREATE TRIGGER IF NOT EXISTS trending_dirty_au
+        AFTER UPDATE OF viewCount, bookmarkCount, isActive, categoryId, publishedAt ON articles BEGIN
+            INSERT OR IGNORE INTO trending_dirty (articleId) VALUES (new.id);
+        END
+    """,
+    'trending_dirty_ad': """
+        CREATE TRIGGER IF NOT EXISTS trending_dirty_ad AFTER DELETE ON articles BEGIN
+            INSERT OR IGNORE INTO trending_dirty (articleId) VALUES (old.id);
+        END
+    """,
+}
+
+# Seconds since the Unix epoch of publishedAt, or createdAt for undated articles
+PUBLISHED_EPOCH = "(julianday(COALESCE(a.publishedAt, a.createdAt)) - 2440587.5) * 86400"
+
+@dataclass
+class TrendingConfig:
+    half_life_hours: float = 24.0
+    bookmark_weight: float = 5.0
+    window_days: float = 7.0
+    top_n: int = 50
+    per_category: int = 0
+
+    @property
+    def tau(self) -> float:
+        return self.half_life_hours * 3600 / math.log(2)
+
+    def settings(self) -> dict:
+        """What stored scores depend on; a change means rescoring everything"""
+        # As floats, so 7 and 7.0 compare equal
+        return {'half_life_hours': str(float(self.half_life_hours)),
+                'bookmark_weight': str(float(self.bookmark_weight)),
+                'window_days': str(float(self.window_days))}
+
+@dataclass
+class TrendingRun:
+    full: bool
+    rescored: int
+    pruned: int
+    candidates: int
+    seconds: float
+
+def ensure_schema(conn: sqlite3.Connection) -> bool:
+    """Create the tables and triggers; returns True when the triggers had to be (re)created"""
+    existing = {row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'trending_dirty_%'"
+    )}
+    with conn:
+        conn.executescript(SCHEMA)
+        if all(name in existing for name in TRIGGERS):
+            return False
+        for sql in TRIGGERS.values():
+            conn.execute(sql)
+    return True
+
+def _register_functions(conn: sqlite3.Connection, config: TrendingConfig):
+    bookmark_weight, tau = config.bookmark_weight, config.tau
+
+    def trending_score(views, bookmarks, published_epoch):
+        engagement = 1 + max(views or 0, 0) + bookmark_weight * max(bookmarks or 0, 0)
+        return math.log(engagement) + (published_epoch - REFERENCE_EPOCH) / tau
+
+    conn.create_function('trending_score', 3, trending_score, deterministic=True)
+
+def _settings_changed(conn: sqlite3.Connection, config: TrendingConfig) -> bool:
+    stored = dict(conn.execute("SELECT name, value FROM trending_settings"))
+    if stored == config.settings():
+        return False
+    if stored:
+        logger.info(f"Scoring settings changed from {stored} to {config.settings()}; rescoring everything")
+    return True
+
+def _rescore(conn: sqlite3.Connection, source: str, where: str, params: dict) -> int:
+    """Recompute trending_scores for the articles source/where select"""
+    cursor = conn.execute(f"""
+        INSERT OR REPLACE INTO trending_scores (articleId, categoryId, publishedEpoch, score)
+        SELECT id, categoryId, published, trending_score(viewCount, bookmarkCount, published)
+        FROM (
+            SELECT a.id, a.categoryId, a.viewCount, a.bookmarkCount, {PUBLISHED_EPOCH} AS published
+            FROM {source}
+            WHERE a.isActive = 1 {where}
+        )
+        WHERE published >= :cutoff
+    """, params)
+    return cursor.rowcount
+
+def _materialise(conn: sqlite3.Connection, config: TrendingConfig, now: datetime):
+    """Rewrite trending_articles from the candidate scores"""
+    # Stored scores are relative to REFERENCE_EPOCH; shift them to "now" so the
+    # published value reads as engagement * 2^(-age / half-life)
+    now_offset = (now.timestamp() - REFERENCE_EPOCH) / config.tau
+    computed_at = to_db_datetime(now)
+    lists = [(ALL_CATEGORIES, conn.execute(
+        "SELECT articleId, score FROM trending_scores ORDER BY score DESC LIMIT ?", (config.top_n,)
+    ).fetchall())]
+    if config.per_category > 0:
+        # Each list is a short walk down (categoryId, score)
+        for (category_id,) in conn.execute("SELECT id FROM categories").fetchall():
+            lists.append((category_id, conn.execute(
+                "SELECT articleId, score FROM trending_scores WHERE categoryId = ? ORDER BY score DESC LIMIT ?",
+                (category_id, config.per_category)
+            ).fetchall()))
+
+    conn.execute("DELETE FROM trending_articles")
+    conn.executemany("""
+        INSERT INTO trending_articles (categoryId, rank, articleId, score, computedAt)
+        VALUES (?, ?, ?, ?, ?)
+    """, [(category_id, rank, article_id, math.exp(score - now_offset), computed_at)
+          for category_id, ranked in lists
+          for rank, (article_id, score) in enumerate(ranked, 1)])
+
+def run_pass(conn: sqlite3.Connection, config: TrendingConfig, full: bool = False,
+             now: Optional[datetime] = None) -> TrendingRun:
+    """Rescore changed (or, with full, all recent) articles and rewrite trending_articles"""
+    start = time.perf_counter()
+    now = now or datetime.now(timezone.utc)
+    cutoff = now - timedelta(days=config.window_days)
+
+    # Missed writes or changed weights invalidate the stored scores
+    full = ensure_schema(conn) or full or _settings_changed(conn, config)
+    _register_functions(conn, config)
+
+    params = {'cutoff': cutoff.timestamp()}
+    # One write transaction: counters bumped meanwhile wait, and stay dirty for the next pass
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        if full:
+            conn.execute("DELETE FROM trending_scores")
+            # Slightly wider than the window so publishedAt's index does the narrowing
+            params['cutoff_text'] = to_db_datetime(cutoff - timedelta(days=1))
+            rescored = _rescore(conn, 'articles a', """
+                AND (a.publishedAt >= :cutoff_text OR (a.publishedAt IS NULL AND a.createdAt >= :cutoff_text))
+            """, params)
+            conn.execute("DELETE FROM trending_settings")
+            conn.executemany("INSERT INTO trending_settings (name, value) VALUES (?, ?)",
+                             config.settings().items())
+        else:
+            # Deactivated, deleted or re-dated articles must leave; the rest are re-added below
+            conn.execute("DELETE FROM trending_scores WHERE articleId IN (SELECT articleId FROM trending_dirty)")
+            # CROSS JOIN keeps SQLite walking the few dirty ids rather than scanning articles
+            rescored = _rescore(conn, 'trending_dirty d CROSS JOIN articles a ON a.id = d.articleId', '', params)
+        conn.execute("DELETE FROM trending_dirty")
+
+        pruned = conn.execute("DELETE FROM trending_scores WHERE publishedEpoch < :cutoff", params).rowcount
+        _materialise(conn, config, now)
+
+    candidates = conn.execute("SELECT COUNT(*) FROM trending_scores").fetchone()[0]
+    return TrendingRun(full, rescored, pruned, candidates, round(time.perf_counter() - start, 3))
+
+def main():
+    parser = argparse.ArgumentParser(description='Recompute the trending_articles table')
+    add_db_argument(parser)
+    defaults = TrendingConfig()
+    parser.add_argument('--half-life-hours', type=float, default=defaults.half_life_hours,
+                        help='Hours for a score to halve')
+    parser.add_argument('--bookmark-weight', type=float, default=defaults.bookmark_weight,
+                        help='Views one bookmark is worth')
+    parser.add_argument('--window-days', type=float, default=defaults.window_days,
+                        help='Only articles published this recently can trend')
+    parser.add_argument('--top', type=int, default=defaults.top_n, help='Overall trending articles to keep')
+    parser.add_argument('--per-category', type=int, default=defaults.per_category,
+                        help='Trending articles to keep per category (0 = none)')
+    parser.add_argument('--full', action='store_true', help='Rescore every article in the window')
+    parser.add_argument('--verbose', '-v', action='store_true', help='Verbose logging')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    config = TrendingConfig(args.half_life_hours, args.bookmark_weight, args.window_days,
+                            args.top, args.per_category)
+    conn = connect(args.db)
+    try:
+        run = run_pass(conn, config, args.full)
+    finally:
+        conn.close()
+    logger.info(f"{'Full' if run.full else 'Incremental'} pass: rescored {run.rescored}, "
+                f"pruned {run.pruned}, {run.candidates} candidates in {run.seconds}s")
+
+if __name__ == "__main__":
+    main()
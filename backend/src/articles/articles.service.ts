@@ -1,6 +1,6 @@
-import { Injectable, NotFoundException } from '@nestjs/common';
+import { Injectable, Logger, NotFoundException } from '@nestjs/common';
 import { InjectRepository } from '@nestjs/typeorm';
-import { Repository, SelectQueryBuilder } from 'typeorm';
+import { In, Not, Repository, SelectQueryBuilder } from 'typeorm';
 import { Article } from '../database/entities/article.entity';
 import { Category } from '../database/entities/category.entity';
 
@@ -14,6 +14,8 @@ export interface PaginationQuery {
 
 @Injectable()
 export class ArticlesService {
+  private readonly logger = new Logger(ArticlesService.name);
+
   constructor(
     @InjectRepository(Article)
     private readonly articleRepository: Repository<Article>,
@@ -92,6 +94,49 @@ export class ArticlesService {
   }
 
   async findTrending(limit = 10) {
+    // scripts/trending.py materialises the time-decayed ranking (categoryId 0 = all categories)
+    const ranked: { articleId: string }[] = await this.articleRepository
+      .query(
+        'SELECT articleId FROM trending_articles WHERE categoryId = 0 ORDER BY rank LIMIT ?',
+        [limit],
+      )
+      .catch(error => {
+        // The job hasn't created the table yet; any other failure is a real error
+        if (/no such table/i.test(String(error?.message))) {
+          return [];
+        }
+        throw error;
+      });
+
+    if (ranked.length) {
+      const ids = ranked.map(row => row.articleId);
+      const articles = await this.articleRepository.find({
+        where: { id: In(ids), isActive: true },
+        relations: ['category', 'feed'],
+      });
+      const byId = new Map(articles.map(article => [article.id, article]));
+      const trending = ids.map(id => byId.get(id)).filter(Boolean);
+      if (trending.length >= limit) {
+        return trending;
+      }
+
+      // The job keeps only its top rows (trending.py --top): rank the rest by raw counters
+      const rest = await this.articleRepository.find({
+        where: { id: Not(In(ids)), isActive: true },
+        relations: ['category', 'feed'],
+        order: { bookmarkCount: 'DESC', viewCount: 'DESC' },
+        take: limit - trending.length,
+      });
+      if (rest.length) {
+        this.logger.warn(
+          `trending_articles has ${ranked.length} rows for a limit of ${limit}; ` +
+            `${rest.length} articles ranked by raw counters instead (raise trending.py --top)`,
+        );
+      }
+      return [...trending, ...rest];
+    }
+
+    // The job hasn't run yet: rank by raw counters
     return this.articleRepository.find({
       where: { isActive: true },
       relations: ['category', 'feed'],
@@ -13,9 +13,13 @@ import { Category } from './category.entity';
 
 @Entity('articles')
 @Index(['url'], { unique: true })
+@Index(['canonicalUrl'], { unique: true })
 @Index(['publishedAt'])
 @Index(['title'])
 @Index(['createdAt'])
+@Index(['clusterId'])
+@Index(['imageUrl'], { where: '"imageUrl" IS NOT NULL AND "thumbnailPath" IS NULL' })
+@Index(['thumbnailPath'], { where: '"thumbnailPath" IS NOT NULL' })
 export class Article {
   @PrimaryGeneratedColumn('uuid')
   id: string;
@@ -32,9 +36,19 @@ export class Article {
   @Column({ unique: true })
   url: string;
 
+  // Dedup key maintained by scripts/canonical_urls.py: the URL without
+  // tracking parameters, proxies or other per-publisher variations
+  @Column({ nullable: true })
+  canonicalUrl?: string;
+
   @Column({ nullable: true })
   imageUrl?: string;
 
+  // Local thumbnail of imageUrl written by scripts/thumbnails.py, relative to
+  // the thumbnail directory served at /api/thumbnails/; empty once evicted
+  @Column({ nullable: true })
+  thumbnailPath?: string;
+
   @Column({ nullable: true })
   author?: string;
 
@@ -53,6 +67,11 @@ export class Article {
   @Column({ default: true })
   isActive: boolean;
 
+  // Near-duplicate group assigned by scripts/feed-parser.py: the id of the
+  // first article of the story, which is its own cluster
+  @Column({ nullable: true })
+  clusterId?: string;
+
   @CreateDateColumn()
   createdAt: Date;
 
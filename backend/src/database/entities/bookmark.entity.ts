@@ -14,6 +14,8 @@ import { Article } from './article.entity';
 @Entity('bookmarks')
 @Unique(['userId', 'articleId'])
 @Index(['userId'])
+// Lets scripts/retention.py check an article for bookmarks without a scan
+@Index(['articleId'])
 @Index(['createdAt'])
 export class Bookmark {
   @PrimaryGeneratedColumn('uuid')
@@ -41,6 +41,16 @@ export class Feed {
   @Column({ default: 30 })
   fetchIntervalMinutes: number;
 
+  // Conditional GET validators maintained by scripts/feed-parser.py
+  @Column({ nullable: true })
+  etag?: string;
+
+  @Column({ nullable: true })
+  lastModified?: string;
+
+  @Column({ nullable: true })
+  contentHash?: string;
+
   @CreateDateColumn()
   createdAt: Date;
 
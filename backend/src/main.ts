@@ -2,13 +2,15 @@ import 'reflect-metadata';
 import { NestFactory } from '@nestjs/core';
 import { ValidationPipe } from '@nestjs/common';
 import { ConfigService } from '@nestjs/config';
+import { NestExpressApplication } from '@nestjs/platform-express';
+import { resolve } from 'path';
 import { SwaggerModule, DocumentBuilder } from '@nestjs/swagger';
 import { AppModule } from './app.module';
 import helmet from 'helmet';
 import compression from 'compression';
 
 async function bootstrap() {
-  const app = await NestFactory.create(AppModule);
+  const app = await NestFactory.create<NestExpressApplication>(AppModule);
   const configService = app.get(ConfigService);
 
   // Security middleware
@@ -36,6 +38,16 @@ async function bootstrap() {
   // Global prefix
   app.setGlobalPrefix('api');
 
+  // Article thumbnails from scripts/thumbnails.py; the files are content-addressed,
+  // so a path never changes content and can be cached for good
+  app.useStaticAssets(resolve(configService.get('NEWSHUB_THUMBNAIL_DIR', 'thumbnails')), {
+    prefix: '/api/thumbnails/',
+    immutable: true,
+    maxAge: '365d',
+    // helmet's same-origin default would block the frontend on its own domain
+    setHeaders: (res) => res.setHeader('Cross-Origin-Resource-Policy', 'cross-origin'),
+  });
+
   // Swagger API Documentation
   const config = new DocumentBuilder()
     .setTitle('NewsHub API')
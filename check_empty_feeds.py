@@ -1,34 +1,21 @@
 #!/usr/bin/env python3
-import sqlite3
+import sys
+from pathlib import Path
 
-conn = sqlite3.connect('./backend/newshub.sqlite')
-cursor = conn.cursor()
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'backend' / 'scripts'))
+from feed_stats import connect_stats, feed_stats
 
-print("Feeds with no articles:")
-cursor.execute('''
-    SELECT f.id, f.name, COUNT(a.id) as article_count 
-    FROM feeds f 
-    LEFT JOIN articles a ON f.id = a.feedId 
-    GROUP BY f.id, f.name 
-    HAVING article_count = 0
-''')
+conn = connect_stats()
+feeds = feed_stats(conn)
 
-rows = cursor.fetchall()
-for row in rows:
-    print(f'ID {row[0]}: {row[1]} - {row[2]} articles')
+print("Feeds with no articles:")
+for feed in feeds:
+    if not feed.articles:
+        print(f'ID {feed.feed_id}: {feed.name} - {feed.articles} articles')
 
 print("\nFeeds with articles but no images:")
-cursor.execute('''
-    SELECT f.id, f.name, COUNT(a.id) as total_articles,
-           COUNT(CASE WHEN a.imageUrl IS NULL OR a.imageUrl = '' THEN 1 END) as no_images
-    FROM feeds f 
-    JOIN articles a ON f.id = a.feedId 
-    GROUP BY f.id, f.name 
-    HAVING COUNT(CASE WHEN a.imageUrl IS NOT NULL AND a.imageUrl != '' THEN 1 END) = 0
-''')
-
-rows = cursor.fetchall()
-for row in rows:
-    print(f'ID {row[0]}: {row[1]} - {row[2]} articles, {row[3]} without images')
+for feed in feeds:
+    if feed.articles and not feed.with_images:
+        print(f'ID {feed.feed_id}: {feed.name} - {feed.articles} articles, {feed.articles} without images')
 
 conn.close()
@@ -1,25 +1,17 @@
 #!/usr/bin/env python3
-import sqlite3
+import sys
+from pathlib import Path
 
-conn = sqlite3.connect('./backend/newshub.sqlite')
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'backend' / 'scripts'))
+from feed_stats import category_stats, connect_stats
+
+conn = connect_stats()
 cursor = conn.cursor()
 
 print("Image statistics by category:")
-cursor.execute("""
-    SELECT c.name as category, 
-           COUNT(CASE WHEN a.imageUrl IS NOT NULL AND a.imageUrl != '' THEN 1 END) as with_images, 
-           COUNT(a.id) as total 
-    FROM articles a 
-    JOIN categories c ON a.categoryId = c.id 
-    GROUP BY c.id, c.name 
-    ORDER BY c.name
-""")
-
-rows = cursor.fetchall()
-for row in rows:
-    category, with_images, total = row
-    percentage = (100 * with_images / total) if total > 0 else 0
-    print(f"{category}: {with_images} with images / {total} total articles ({percentage:.1f}%)")
+for category in category_stats(conn):
+    print(f"{category.name}: {category.with_images} with images / {category.articles} total articles "
+          f"({category.image_pct:.1f}%)")
 
 print("\nSample articles with images by category:")
 cursor.execute("""
@@ -2,6 +2,8 @@ import React from 'react';
 import { Link } from 'react-router-dom';
 import { Article } from '../../types';
 
+const THUMBNAIL_BASE_URL = `${import.meta.env.VITE_API_URL || '/api'}/thumbnails`;
+
 interface ArticleCardProps {
   article: Article;
 }
@@ -26,10 +28,17 @@ const ArticleCard: React.FC<ArticleCardProps> = ({ article }) => {
       <div className="h-48 bg-gray-200 dark:bg-gray-700 rounded-t-lg overflow-hidden">
         {article.imageUrl ? (
           <img
-            src={article.imageUrl}
+            src={article.thumbnailPath ? `${THUMBNAIL_BASE_URL}/${article.thumbnailPath}` : article.imageUrl}
             alt={article.title}
             className="w-full h-full object-cover"
+            loading="lazy"
             onError={(e) => {
+              // A missing thumbnail falls back to the original image before giving up
+              if (article.thumbnailPath && !e.currentTarget.dataset.fallback) {
+                e.currentTarget.dataset.fallback = 'original';
+                e.currentTarget.src = article.imageUrl!;
+                return;
+              }
               e.currentTarget.src = '';
               e.currentTarget.style.display = 'none';
             }}
@@ -46,6 +46,7 @@ export interface Article {
   content?: string;
   url: string;
   imageUrl?: string;
+  thumbnailPath?: string;
   author?: string;
   publishedAt?: string;
   viewCount: number;
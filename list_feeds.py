@@ -1,7 +1,11 @@
 #!/usr/bin/env python3
-import sqlite3
+import sys
+from pathlib import Path
 
-conn = sqlite3.connect('./backend/newshub.sqlite')
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'backend' / 'scripts'))
+from newshub_db import connect
+
+conn = connect(readonly=True)
 cursor = conn.cursor()
 
 print("All feeds with IDs:")
@@ -6,190 +6,301 @@ Updates existing articles without images by trying to extract them using enhance
 
 import sqlite3
 import asyncio
-import aiohttp
+import argparse
 import logging
-import re
-from urllib.parse import urlparse, urljoin
-from typing import Optional
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+# Share the image extraction engine with the RSS parser
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'backend' / 'scripts'))
+from image_extraction import SITE_SCRAPERS, is_valid_image_url
+from http_transport import HttpTransport, TransportConfig
+from newshub_db import add_db_argument, connect, resolve_db_path
+from page_scraper import PageImageScraper, ScrapeCache
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+class TokenBucket:
+    """Allows `rate` requests per second on average, with bursts up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: int = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
 class ImageRetrofitter:
-    def __init__(self, db_path: str = "./backend/newshub.sqlite"):
-        self.db_path = db_path
+    def __init__(self, db_path: Optional[str] = None, domains: Optional[List[str]] = None,
+                 concurrency: int = 10, rate_per_host: float = 1.0, burst: int = 1,
+                 batch_size: int = 50):
+        self.db_path = str(resolve_db_path(db_path))
         self.session = None
+        self.transport = None
+        self.page_scraper = None
+        self.conn = None
+        # An empty list means every domain; the default is the sites with a registered scraper
+        self.domains = sorted(SITE_SCRAPERS) if domains is None else domains
+        self.concurrency = concurrency
+        self.rate_per_host = rate_per_host
+        self.burst = burst
+        self.batch_size = batch_size
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._pending_updates = []
+        self._pending_attempts = []
+        self.updated_count = 0
+        self.processed_count = 0
+        self._remaining = None
         
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession(
-            timeout=aiohttp.ClientTimeout(total=30),
-            headers={'User-Agent': 'NewsHub Image Retrofitter 1.0'}
-        )
+        # The token buckets pace each host, so a couple of pooled connections suffice
+        self.transport = HttpTransport(TransportConfig(
+            user_agent='NewsHub Image Retrofitter 1.0',
+            limit=max(self.concurrency, 1),
+            limit_per_host=max(self.burst, 2)
+        ))
+        self.session = await self.transport.open()
+        self.page_scraper = PageImageScraper(self.session, ScrapeCache(self.get_db_connection()))
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.session:
-            await self.session.close()
+        if self.transport:
+            await self.transport.close()
+            self.session = None
+        if self.conn:
+            # Keep whatever finished before an interruption
+            self.flush()
+            self.conn.close()
+            self.conn = None
+
+    def get_db_connection(self) -> sqlite3.Connection:
+        """Single connection for the run, with the checkpoint table in place"""
+        if self.conn is None:
+            self.conn = connect(self.db_path)
+            with self.conn:
+                self.conn.execute("""
+                    CREATE TABLE IF NOT EXISTS image_retrofit_attempts (
+                        articleId TEXT PRIMARY KEY,
+                        attemptedAt REAL NOT NULL
+                    )
+                """)
+        return self.conn
 
-    def get_articles_without_images(self, limit: int = 10) -> list:
-        """Get articles that don't have images"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def reset_checkpoint(self):
+        """Forget which articles were already tried"""
+        conn = self.get_db_connection()
+        with conn:
+            conn.execute("DELETE FROM image_retrofit_attempts")
+
+    def get_articles_without_images(self, limit: int = 10, domains: Optional[List[str]] = None,
+                                    before: Optional[Tuple[str, str]] = None) -> list:
+        """Get articles that don't have images and haven't been tried yet, newest first
+
+        before is the (createdAt, id) of the last article of the previous page.
+        """
+        conn = self.get_db_connection()
+        domains = self.domains if domains is None else domains
+        
+        params = []
+        page_filter = ""
+        if before:
+            page_filter = "AND (a.createdAt < ? OR (a.createdAt = ? AND a.id < ?))"
+            params.extend([before[0], before[0], before[1]])
+        domain_filter = ""
+        if domains:
+            clauses = []
+            for domain in domains:
+                clauses.append("a.url LIKE ? OR a.url LIKE ?")
+                params.extend([f"%://{domain}/%", f"%.{domain}/%"])
+            domain_filter = "AND (" + " OR ".join(clauses) + ")"
         
-        cursor.execute("""
-            SELECT a.id, a.title, a.url, f.name as feed_name, f.url as feed_url
+        cursor = conn.execute(f"""
+            SELECT a.id, a.title, a.url, f.name as feed_name, f.url as feed_url, a.createdAt
             FROM articles a
             JOIN feeds f ON a.feedId = f.id
+            LEFT JOIN image_retrofit_attempts r ON r.articleId = a.id
             WHERE (a.imageUrl IS NULL OR a.imageUrl = '')
-            AND f.name IN ('TechCrunch', 'The Verge', 'Science Daily', 'ESPN', 'Hacker News')
-            ORDER BY a.createdAt DESC
+            AND r.articleId IS NULL
+            {page_filter}
+            {domain_filter}
+            ORDER BY a.createdAt DESC, a.id DESC
             LIMIT ?
-        """, (limit,))
+        """, (*params, limit))
         
-        articles = cursor.fetchall()
-        conn.close()
-        return articles
+        return cursor.fetchall()
 
     def update_article_image(self, article_id: str, image_url: str) -> bool:
         """Update article with image URL"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        conn = self.get_db_connection()
         
         try:
-            cursor.execute("""
-                UPDATE articles 
-                SET imageUrl = ?, updatedAt = datetime('now')
-                WHERE id = ?
-            """, (image_url, article_id))
-            
-            conn.commit()
+            with conn:
+                cursor = conn.execute("""
+                    UPDATE articles 
+                    SET imageUrl = ?, updatedAt = datetime('now')
+                    WHERE id = ?
+                """, (image_url, article_id))
             return cursor.rowcount > 0
         except Exception as e:
             logger.error(f"Error updating article {article_id}: {str(e)}")
             return False
-        finally:
-            conn.close()
+
+    def flush(self) -> bool:
+        """Write queued image updates and checkpoint entries in one transaction
+
+        On failure they stay queued for the next flush and False is returned.
+        """
+        if not self._pending_attempts:
+            return True
+        conn = self.get_db_connection()
+        try:
+            with conn:
+                cursor = conn.executemany("""
+                    UPDATE articles 
+                    SET imageUrl = ?, updatedAt = datetime('now')
+                    WHERE id = ? AND (imageUrl IS NULL OR imageUrl = '')
+                """, self._pending_updates)
+                self.updated_count += max(cursor.rowcount, 0)
+                conn.executemany(
+                    "INSERT OR REPLACE INTO image_retrofit_attempts (articleId, attemptedAt) VALUES (?, ?)",
+                    self._pending_attempts
+                )
+        except sqlite3.Error as e:
+            logger.error(f"Error writing image updates: {str(e)}")
+            return False
+        self._pending_updates = []
+        self._pending_attempts = []
+        return True
 
     def is_valid_image_url(self, url: str) -> bool:
         """Validate if URL looks like an image"""
-        if not url:
-            return False
-            
-        # Check if URL has image extension
-        image_extensions = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg', '.bmp')
-        url_lower = url.lower()
-        
-        # Direct image file check
-        if any(url_lower.endswith(ext) for ext in image_extensions):
-            return True
-            
-        # Check for common image URL patterns
-        if any(pattern in url_lower for pattern in ['image', 'img', 'photo', 'picture']):
-            return True
-            
-        return False
+        return is_valid_image_url(url)
 
-    async def extract_image_from_article_page(self, article_url: str, feed_name: str) -> Optional[str]:
-        """Extract image from article page based on site-specific patterns"""
-        try:
-            async with self.session.get(article_url) as response:
-                if response.status != 200:
-                    return None
-                
-                content = await response.text()
-                
-                # Common meta tag patterns that work for most sites
-                meta_patterns = [
-                    r'<meta property="og:image" content="([^"]+)"',
-                    r'<meta name="twitter:image" content="([^"]+)"',
-                    r'<meta property="twitter:image" content="([^"]+)"',
-                    r'<meta name="twitter:image:src" content="([^"]+)"',
-                ]
-                
-                # Site-specific patterns
-                if 'techcrunch.com' in article_url.lower():
-                    site_patterns = [
-                        r'<img[^>]+class="[^"]*wp-post-image[^"]*"[^>]+src="([^"]+)"',
-                        r'<img[^>]+class="[^"]*featured-image[^"]*"[^>]+src="([^"]+)"',
-                        r'<img[^>]+data-src="([^"]+)"[^>]*class="[^"]*featured[^"]*"',
-                    ]
-                elif 'theverge.com' in article_url.lower():
-                    site_patterns = [
-                        r'<img[^>]+data-original="([^"]+)"',
-                        r'<img[^>]+class="[^"]*duet--article--lede-image[^"]*"[^>]+src="([^"]+)"',
-                        r'<source[^>]+srcset="([^"\s]+)"[^>]*media="[^"]*min-width',
-                    ]
-                elif 'sciencedaily.com' in article_url.lower():
-                    site_patterns = [
-                        r'<img[^>]+id="story_image"[^>]+src="([^"]+)"',
-                        r'<img[^>]+class="[^"]*story-image[^"]*"[^>]+src="([^"]+)"',
-                        r'<img[^>]+alt="[^"]*"[^>]+src="([^"]+)"[^>]*width="[^"]*"[^>]*height="[^"]*"',
-                    ]
-                elif 'espn.com' in article_url.lower():
-                    site_patterns = [
-                        r'<img[^>]+class="[^"]*media-wrapper_image[^"]*"[^>]+src="([^"]+)"',
-                        r'<picture[^>]*>.*?<img[^>]+src="([^"]+)"',
-                    ]
-                else:
-                    site_patterns = []
-                
-                # Try all patterns
-                all_patterns = meta_patterns + site_patterns
-                
-                for pattern in all_patterns:
-                    match = re.search(pattern, content, re.IGNORECASE | re.DOTALL)
-                    if match:
-                        image_url = match.group(1)
-                        # Clean up the URL
-                        if image_url.startswith('//'):
-                            image_url = 'https:' + image_url
-                        elif image_url.startswith('/'):
-                            parsed_url = urlparse(article_url)
-                            image_url = f"{parsed_url.scheme}://{parsed_url.netloc}{image_url}"
-                        
-                        if self.is_valid_image_url(image_url):
-                            return image_url
-                
-        except Exception as e:
-            logger.debug(f"Error extracting image from {article_url}: {str(e)}")
-        
-        return None
+    async def extract_image_from_article_page(self, article_url: str, feed_name: str) -> Tuple[bool, Optional[str]]:
+        """Extract image from article page based on site-specific patterns; returns (definitive, image_url)"""
+        return await self.page_scraper.scrape(article_url)
 
-    async def process_articles(self, limit: int = 20):
-        """Process articles without images and try to find images for them"""
-        articles = self.get_articles_without_images(limit)
+    def get_bucket(self, article_url: str) -> TokenBucket:
+        host = urlparse(article_url).netloc.lower()
+        if host not in self._buckets:
+            self._buckets[host] = TokenBucket(self.rate_per_host, self.burst)
+        return self._buckets[host]
+
+    async def process_article(self, article: tuple, semaphore: asyncio.Semaphore):
+        article_id, title, article_url, feed_name, feed_url, _ = article
         
-        if not articles:
-            logger.info("No articles without images found")
+        # Wait for the host's token before taking a slot, so a slow host
+        # doesn't hold slots that other hosts could use
+        await self.get_bucket(article_url).acquire()
+        async with semaphore:
+            logger.debug(f"Processing: {title[:60]}... from {feed_name}")
+            definitive, image_url = await self.extract_image_from_article_page(article_url, feed_name)
+        
+        if image_url:
+            logger.info(f"✅ Added image: {image_url[:80]}...")
+            self._pending_updates.append((image_url, article_id))
+        elif definitive:
+            logger.debug(f"❌ No image found for: {title[:60]}...")
+        else:
+            # Timeouts and server errors aren't checkpointed, so the next run retries them
+            logger.debug(f"⏳ Page unavailable, will retry: {title[:60]}...")
             return
+        self._pending_attempts.append((article_id, time.time()))
         
-        logger.info(f"Processing {len(articles)} articles without images...")
+        if len(self._pending_attempts) >= self.batch_size:
+            self.flush()
+
+    async def process_stream(self, domains: List[str], semaphore: asyncio.Semaphore, page_size: int):
+        """Work through the image-less articles of one domain (or all of them) page by page"""
+        # Pages follow createdAt, since articles left for a retry stay unchecked
+        before = None
+        while True:
+            page_limit = page_size if self._remaining is None else min(page_size, self._remaining)
+            if page_limit <= 0:
+                return
+            articles = self.get_articles_without_images(page_limit, domains, before)
+            if not articles:
+                return
+            last = articles[-1]
+            before = (last[5], last[0])
+            if self._remaining is not None:
+                self._remaining -= len(articles)
+            self.processed_count += len(articles)
+            
+            label = ', '.join(domains) or 'all domains'
+            logger.info(f"Processing {len(articles)} articles without images from {label}...")
+            await asyncio.gather(*(self.process_article(article, semaphore) for article in articles))
+            if not self.flush():
+                # Keep what is queued for the flush on exit rather than scraping pages that can't be saved
+                logger.error(f"Stopping {label}: image updates could not be written")
+                return
+
+    async def process_articles(self, limit: Optional[int] = None, page_size: int = 100):
+        """Process articles without images and try to find images for them"""
+        self._remaining = limit
+        self.processed_count = 0
+        self.updated_count = 0
+        semaphore = asyncio.Semaphore(self.concurrency)
         
-        updated_count = 0
+        # One stream per domain so every host makes progress under its own rate limit
+        streams = [[domain] for domain in self.domains] or [[]]
         
         async with self:
-            for article_id, title, article_url, feed_name, feed_url in articles:
-                logger.info(f"Processing: {title[:60]}... from {feed_name}")
-                
-                image_url = await self.extract_image_from_article_page(article_url, feed_name)
-                
-                if image_url:
-                    if self.update_article_image(article_id, image_url):
-                        logger.info(f"✅ Added image: {image_url[:80]}...")
-                        updated_count += 1
-                    else:
-                        logger.error(f"❌ Failed to update article {article_id}")
-                else:
-                    logger.debug(f"❌ No image found for: {title[:60]}...")
-                
-                # Small delay to be respectful
-                await asyncio.sleep(1)
+            await asyncio.gather(*(self.process_stream(domains, semaphore, page_size) for domains in streams))
         
-        logger.info(f"Completed! Updated {updated_count} articles with images")
+        if not self.processed_count:
+            logger.info("No articles without images found")
+            return
+        
+        logger.info(f"Completed! Processed {self.processed_count} articles, "
+                    f"updated {self.updated_count} with images")
 
 async def main():
-    retrofitter = ImageRetrofitter()
-    await retrofitter.process_articles(limit=30)  # Process 30 articles
+    parser = argparse.ArgumentParser(description='NewsHub image retrofit')
+    add_db_argument(parser)
+    parser.add_argument('--domains', nargs='+',
+                        help='Article domains to retrofit (default: sites with a registered scraper)')
+    parser.add_argument('--all-domains', action='store_true', help='Retrofit articles from every domain')
+    parser.add_argument('--limit', type=int, help='Maximum number of articles to process')
+    parser.add_argument('--concurrency', type=int, default=10, help='Maximum page fetches in flight')
+    parser.add_argument('--rate', type=float, default=1.0, help='Requests per second per host')
+    parser.add_argument('--burst', type=int, default=1, help='Requests a host may receive back to back')
+    parser.add_argument('--batch-size', type=int, default=50, help='Articles per write transaction')
+    parser.add_argument('--reset-checkpoint', action='store_true',
+                        help='Retry articles attempted by earlier runs')
+    parser.add_argument('--verbose', '-v', action='store_true', help='Verbose logging')
+    
+    args = parser.parse_args()
+    
+    if args.verbose:
+        logging.getLogger().setLevel(logging.DEBUG)
+    
+    retrofitter = ImageRetrofitter(
+        args.db,
+        domains=[] if args.all_domains else args.domains,
+        concurrency=args.concurrency,
+        rate_per_host=args.rate,
+        burst=args.burst,
+        batch_size=args.batch_size
+    )
+    if args.reset_checkpoint:
+        retrofitter.reset_checkpoint()
+    await retrofitter.process_articles(limit=args.limit)
 
 if __name__ == "__main__":
     asyncio.run(main())